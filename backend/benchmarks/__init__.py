@@ -0,0 +1,21 @@
+import os
+import sys
+
+# The benchmarks never connect to a database, but the database modules of the API
+# and the simulation engine read their connection settings at import time.
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DATABASE", "ferntree_benchmarks")
+# Keep the local load profile store of the benchmarks apart from the engine's and
+# check its version on every run, the cases switch between synthetic datasets
+os.environ.setdefault(
+    "PROFILE_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), "results", "profile_store"),
+)
+os.environ.setdefault("PROFILE_STORE_MAX_AGE", "0")
+
+# The simulation engine imports its components relative to its own directory
+SIM_DIR: str = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "src", "sim", "ferntree")
+)
+if SIM_DIR not in sys.path:
+    sys.path.insert(0, SIM_DIR)
@@ -0,0 +1,234 @@
+import asyncio
+import os
+from functools import lru_cache
+from typing import Any, Callable
+
+from components.ctrl.battery_ctrl import BatteryCtrl
+from components.ctrl.heating_ctrl import HeatingCtrl
+from components.dev.heating_dev import HeatingDev
+from components.dev.heating_sys import HeatingSys
+from components.dev.sf_house import SfHouse
+from components.host.sim_host import SimHost
+from components.models.thermal_model import ThermalModel
+from sim_builder import SimBuilder
+
+from benchmarks import SIM_DIR
+from benchmarks.fake_db import FakeDbClient, FakeMongoClient
+from src.database.models import (
+    EnergyKPIs,
+    FinFormData,
+    ModelDataOut,
+    PVMonthlyGen,
+    SimResultsEval,
+)
+from src.utils.sim_funcs import calc_energy_kpis, calc_fin_results, calc_pv_monthly_gen
+
+# A benchmark case is a setup function that is called before each repetition and
+# returns the function to be timed. Setup work is not included in the timings.
+BenchmarkCase = Callable[[], Callable[[], Any]]
+
+TIMEBASES: list[int] = [3600, 900, 60]
+FLEET_SIZES: list[int] = [1, 10, 25]
+
+THERMAL_MODEL_DATASET: str = os.path.join(
+    SIM_DIR, "components", "models", "data", "3R2C_model_params_heat_demand.csv"
+)
+
+
+class SkipBenchmark(Exception):
+    """Raised by the setup of a benchmark case that cannot run in this environment."""
+
+    pass
+
+
+def build_sim(db_client: FakeDbClient, heating: bool = False) -> SimHost:
+    """Build a simulation with the local database client.
+
+    Args:
+        db_client (FakeDbClient): The local database client
+        heating (bool): Add a heating system to the house
+
+    Returns:
+        SimHost: The simulation host
+
+    """
+    # Without stage cache, repetitions would reuse the outputs of the first one
+    sim: SimHost = SimBuilder(
+        "bench_sim", "bench_model", db_client, stage_cache=False
+    ).build_simulation()
+    if heating:
+        sim.house.add_component(build_heating_sys(sim), "heating")
+
+    return sim
+
+
+def build_heating_sys(sim: SimHost) -> HeatingSys:
+    """Build a heating system with a heat pump for a single-family house.
+
+    Args:
+        sim (SimHost): The simulation host
+
+    Returns:
+        HeatingSys: The heating system
+
+    """
+    if not os.path.isfile(THERMAL_MODEL_DATASET):
+        raise SkipBenchmark(f"Thermal model dataset not found: {THERMAL_MODEL_DATASET}")
+
+    heating: HeatingSys = HeatingSys(sim)
+    heating.thermal_model = ThermalModel(
+        sim,
+        {
+            "yoc": 1985,
+            "heated_area": 150,
+            "renovation": 2,
+            "annual_heat_demand_primary": None,
+            "factor_net_primary_heat_demand": 1.0,
+            "hot_water_demand": 10.0,
+        },
+    )
+    heating.heating_ctrl = HeatingCtrl(sim, {"temp_setpoint": 20.0, "deadband": 1.0})
+    heating.heating_dev = HeatingDev(
+        sim, {"type": "heatpump", "P_heat_th_max": 10.0, "cop": 3.5}
+    )
+
+    return heating
+
+
+def sim_run_case(timebase: int, greedy: bool, heating: bool = False) -> BenchmarkCase:
+    """Benchmark of SimHost.run_simulation for a single house."""
+
+    def setup() -> Callable[[], Any]:
+        sim: SimHost = build_sim(FakeDbClient(timebase, greedy), heating)
+        return sim.run_simulation
+
+    return setup
+
+
+def sim_fleet_case(n_houses: int) -> BenchmarkCase:
+    """Benchmark of building and running the simulations of a fleet of houses."""
+
+    def setup() -> Callable[[], Any]:
+        db_clients: list[FakeDbClient] = [
+            FakeDbClient(seed=seed) for seed in range(n_houses)
+        ]
+
+        def run_fleet() -> None:
+            for db_client in db_clients:
+                build_sim(db_client).run_simulation()
+
+        return run_fleet
+
+    return setup
+
+
+def battery_ctrl_case(greedy: bool) -> BenchmarkCase:
+    """Benchmark of BatteryCtrl.set_battery_power over a year with hourly timebase."""
+
+    def setup() -> Callable[[], Any]:
+        sim: SimHost = build_sim(FakeDbClient(greedy=greedy))
+        sim.startup()
+        house: SfHouse = sim.house
+        ctrl: BatteryCtrl = house.components["battery"].battery_ctrl
+
+        def run_ctrl() -> None:
+            soc: float = 1.0
+            for t in range(sim.timesteps):
+                sim.current_timestep = t
+                _, soc, _, _ = ctrl.set_battery_power(soc, 10.0, 10.0)
+
+        return run_ctrl
+
+    return setup
+
+
+def heat_demand_case() -> Callable[[], Any]:
+    """Benchmark of HeatingSys.create_heat_demand_profiles with hourly timebase."""
+    sim: SimHost = build_sim(FakeDbClient())
+    heating: HeatingSys = build_heating_sys(sim)
+    return heating.create_heat_demand_profiles
+
+
+@lru_cache(maxsize=1)
+def sim_results() -> list[dict[str, float]]:
+    """Timeseries results of an hourly simulation, as stored in the database."""
+    db_client: FakeDbClient = FakeDbClient(keep_results=True)
+    build_sim(db_client).run_simulation()
+    return db_client.results
+
+
+@lru_cache(maxsize=1)
+def sim_results_eval() -> SimResultsEval:
+    """Evaluated results of an hourly simulation."""
+    energy_kpis: EnergyKPIs = asyncio.run(calc_energy_kpis(sim_results()))
+    pv_monthly_gen: list[PVMonthlyGen] = asyncio.run(calc_pv_monthly_gen(sim_results()))
+    return SimResultsEval(
+        model_id="bench_model", energy_kpis=energy_kpis, pv_monthly_gen=pv_monthly_gen
+    )
+
+
+def energy_kpis_case() -> Callable[[], Any]:
+    """Benchmark of calc_energy_kpis for an hourly simulation."""
+    results: list[dict[str, float]] = sim_results()
+    return lambda: asyncio.run(calc_energy_kpis(results))
+
+
+def pv_monthly_gen_case() -> Callable[[], Any]:
+    """Benchmark of calc_pv_monthly_gen for an hourly simulation."""
+    results: list[dict[str, float]] = sim_results()
+    return lambda: asyncio.run(calc_pv_monthly_gen(results))
+
+
+def fin_results_case() -> Callable[[], Any]:
+    """Benchmark of calc_fin_results for an hourly simulation."""
+    model_data: ModelDataOut = ModelDataOut(
+        user_id="bench_user",
+        model_name="Benchmark",
+        location="Freiburg",
+        roof_incl=30,
+        roof_azimuth=0,
+        electr_cons=4000.0,
+        peak_power=8.0,
+        battery_cap=10.0,
+        model_id="bench_model",
+    )
+    db_client: FakeMongoClient = FakeMongoClient(model_data, sim_results_eval())
+    fin_data: FinFormData = FinFormData(
+        model_id="bench_model",
+        electr_price=45.0,
+        feed_in_tariff=8.0,
+        pv_price=1500.0,
+        battery_price=650.0,
+        useful_life=20,
+        module_deg=0.5,
+        inflation=3.0,
+        op_cost=1.0,
+        down_payment=25.0,
+        pay_off_rate=10.0,
+        interest_rate=5.0,
+    )
+    return lambda: asyncio.run(calc_fin_results(db_client, fin_data))  # type: ignore
+
+
+def all_cases() -> dict[str, BenchmarkCase]:
+    """Returns all benchmark cases by name."""
+    cases: dict[str, BenchmarkCase] = {}
+
+    for timebase in TIMEBASES:
+        for greedy in [True, False]:
+            strategy: str = "greedy" if greedy else "fill_level"
+            cases[f"sim_run[{timebase}s-{strategy}]"] = sim_run_case(timebase, greedy)
+    cases["sim_run[3600s-greedy-heating]"] = sim_run_case(3600, True, heating=True)
+
+    for n_houses in FLEET_SIZES:
+        cases[f"sim_fleet[{n_houses}]"] = sim_fleet_case(n_houses)
+
+    cases["battery_ctrl[greedy]"] = battery_ctrl_case(greedy=True)
+    cases["battery_ctrl[fill_level]"] = battery_ctrl_case(greedy=False)
+    cases["heating_sys[heat_demand_profiles]"] = heat_demand_case
+
+    cases["api[calc_energy_kpis]"] = energy_kpis_case
+    cases["api[calc_pv_monthly_gen]"] = pv_monthly_gen_case
+    cases["api[calc_fin_results]"] = fin_results_case
+
+    return cases
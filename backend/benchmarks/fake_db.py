@@ -0,0 +1,187 @@
+from typing import Any, Optional
+
+import numpy as np
+
+from src.database.models import ModelDataOut, SimResultsEval
+
+
+def synthetic_weather(timebase: int, seed: int = 0) -> tuple[list[float], list[float]]:
+    """Create a synthetic weather year with a daily and seasonal cycle.
+
+    Args:
+        timebase (int): Timebase of the weather data in seconds
+        seed (int): Seed of the random number generator
+
+    Returns:
+        tuple[list[float], list[float]]: Ambient temperature in degree Celsius and
+        solar irradiance on the inclined plane in W/m2
+
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    timesteps: int = 365 * 24 * 3600 // timebase
+    hours: np.ndarray = np.arange(timesteps) * timebase / 3600
+    hour_of_day: np.ndarray = hours % 24
+    season: np.ndarray = np.cos(2 * np.pi * (hours / 24 - 172) / 365)
+
+    T_amb: np.ndarray = (
+        10.0
+        + 10.0 * season
+        + 5.0 * np.sin(2 * np.pi * (hour_of_day - 9) / 24)
+        + rng.normal(0, 1, timesteps)
+    )
+    G_i: np.ndarray = np.clip(
+        (600.0 + 300.0 * season)
+        * np.sin(np.pi * (hour_of_day - 6) / 12)
+        * rng.uniform(0.3, 1.0, timesteps),
+        0.0,
+        None,
+    )
+
+    return T_amb.tolist(), G_i.tolist()
+
+
+def synthetic_load_profile(timebase: int, seed: int = 0) -> list[float]:
+    """Create a synthetic load profile normalised to 1kWh annual consumption.
+
+    Args:
+        timebase (int): Timebase of the load profile in seconds
+        seed (int): Seed of the random number generator
+
+    Returns:
+        list[float]: Normalised load profile
+
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    timesteps: int = 365 * 24 * 3600 // timebase
+    hour_of_day: np.ndarray = (np.arange(timesteps) * timebase / 3600) % 24
+    profile: np.ndarray = (
+        0.3
+        + 0.4 * np.exp(-((hour_of_day - 7) ** 2) / 2)
+        + 0.6 * np.exp(-((hour_of_day - 19) ** 2) / 4)
+    ) * rng.uniform(0.5, 1.5, timesteps)
+
+    return (profile / profile.sum()).tolist()
+
+
+class FakeDbClient:
+    """Local stand-in for the pyMongoClient of the simulation engine.
+    Serves a synthetic simulation config and load profile and counts the results
+    written by the simulation instead of sending them to the database.
+    """
+
+    def __init__(
+        self,
+        timebase: int = 3600,
+        greedy: bool = True,
+        battery_cap: float = 10.0,
+        seed: int = 0,
+        keep_results: bool = False,
+    ) -> None:
+        """Initializes a new instance of the FakeDbClient class.
+
+        Args:
+            timebase (int): Timebase of the simulation in seconds
+            greedy (bool): Use greedy battery control instead of fill levels
+            battery_cap (float): Capacity of the battery in kWh
+            seed (int): Seed of the synthetic weather and load profile
+            keep_results (bool): Keep the written results as timestep documents
+
+        """
+        self.timebase: int = timebase
+        self.seed: int = seed
+        self.batch_size: int = 1000
+        self.rows_written: int = 0
+        self.keep_results: bool = keep_results
+        self.results: list[dict[str, float]] = []
+
+        # Hourly weather data like PVGIS, resampled by the simulation
+        T_amb, G_i = synthetic_weather(3600, seed)
+        self.sim_config: dict[str, Any] = {
+            "timebase": timebase,
+            "timezone": "Europe/Berlin",
+            "T_amb": T_amb,
+            "G_i": G_i,
+            "system_settings": {
+                "baseload": {"annual_consumption": 4000.0, "profile_id": 1},
+                "pv": {"roof_tilt": 30, "roof_azimuth": 0, "peak_power": 8.0},
+                "battery": {
+                    "capacity": battery_cap,
+                    "max_power": battery_cap,
+                    "soc_init": battery_cap * 0.1,
+                    "battery_ctrl": {
+                        "planning_horizon": 1,
+                        "useable_capacity": 0.8,
+                        "greedy": greedy,
+                        "opt_fill": False,
+                    },
+                },
+            },
+        }
+
+    def load_config(self) -> dict[str, Any]:
+        """Returns the synthetic simulation config."""
+        return self.sim_config
+
+    def get_load_profile(self, profile_id: int) -> np.ndarray:
+        """Returns a synthetic hourly load profile for the given profile id."""
+        return np.array(synthetic_load_profile(3600, self.seed + profile_id))
+
+    def get_profile_versions(self) -> list[str]:
+        """Returns the version of the synthetic load profiles."""
+        return [f"synthetic-{self.seed}"]
+
+    def get_load_profiles(
+        self, dataset_versions: list[str]
+    ) -> dict[int, tuple[str, np.ndarray]]:
+        """Returns the synthetic load profiles with the ids 0 to 9."""
+        return {
+            profile_id: (dataset_versions[0], self.get_load_profile(profile_id))
+            for profile_id in range(10)
+        }
+
+    def write_timeseries_data_to_db(self, results: np.ndarray) -> None:
+        """Counts the rows of a batch of results instead of writing them."""
+        self.rows_written += len(results)
+        if self.keep_results:
+            fields: tuple[str, ...] = results.dtype.names or ()
+            self.results.extend(dict(zip(fields, row)) for row in results.tolist())
+
+    def shutdown(self) -> None:
+        """Nothing to shut down for the local client."""
+        pass
+
+
+class FakeMongoClient:
+    """Local stand-in for the async MongoClient of the API layer. Serves documents
+    from in-memory collections.
+    """
+
+    def __init__(
+        self,
+        model_data: ModelDataOut,
+        sim_results_eval: Optional[SimResultsEval] = None,
+    ) -> None:
+        """Initializes a new instance of the FakeMongoClient class.
+
+        Args:
+            model_data (ModelDataOut): The model served by the client
+            sim_results_eval (SimResultsEval, optional): The evaluated sim results
+                of the model
+
+        """
+        self.model_data: ModelDataOut = model_data
+        self.collections: dict[str, dict[str, dict[str, Any]]] = {}
+        if sim_results_eval is not None:
+            self.collections["sim_results_eval"] = {
+                model_data.model_id: sim_results_eval.model_dump()
+            }
+
+    async def fetch_model_by_id(self, model_id: str) -> ModelDataOut:
+        """Returns the model served by the client."""
+        return self.model_data
+
+    async def fetch_document(
+        self, collection: str, model_id: str
+    ) -> Optional[dict[str, Any]]:
+        """Returns a document of an in-memory collection."""
+        return self.collections.get(collection, {}).get(model_id)
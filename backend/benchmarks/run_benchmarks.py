@@ -0,0 +1,216 @@
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from benchmarks.cases import BenchmarkCase, SkipBenchmark, all_cases
+
+# Set up logger
+LOGGERNAME: str = "benchmarks"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(filename)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger: logging.Logger = logging.getLogger(LOGGERNAME)
+
+# Default threshold for the slowdown of a benchmark compared to the baseline [%]
+MAX_SLOWDOWN: float = 10.0
+
+
+def run_case(name: str, case: BenchmarkCase, repeat: int) -> Optional[dict[str, Any]]:
+    """Run a benchmark case and collect timing statistics.
+
+    Args:
+        name (str): Name of the benchmark case
+        case (BenchmarkCase): Setup function of the benchmark case
+        repeat (int): Number of timed repetitions
+
+    Returns:
+        Optional[dict[str, Any]]: Timing statistics in seconds, None if the case
+        was skipped
+
+    """
+    timings: list[float] = []
+    for _ in range(repeat):
+        try:
+            func: Callable[[], Any] = case()
+        except SkipBenchmark as ex:
+            logger.info(f"{name}: skipped ({ex})")
+            return None
+
+        start_time: float = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+
+    stats: dict[str, Any] = {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "repeat": repeat,
+    }
+    logger.info(
+        f"{name}: median {stats['median']:.4f} s, min {stats['min']:.4f} s "
+        f"({repeat} runs)"
+    )
+
+    return stats
+
+
+def run_benchmarks(pattern: str, repeat: int) -> dict[str, Any]:
+    """Run all benchmark cases matching the pattern.
+
+    Args:
+        pattern (str): Glob pattern for the names of the benchmark cases
+        repeat (int): Number of timed repetitions per case
+
+    Returns:
+        dict[str, Any]: Environment metadata and timing statistics per case
+
+    """
+    # The simulation logs every run, which would distort the timings
+    logging.getLogger("ferntree").setLevel(logging.WARNING)
+    logging.getLogger("fastapi_logger").setLevel(logging.WARNING)
+
+    results: dict[str, Any] = {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "benchmarks": {},
+    }
+
+    for name, case in all_cases().items():
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        stats: Optional[dict[str, Any]] = run_case(name, case, repeat)
+        if stats is not None:
+            results["benchmarks"][name] = stats
+
+    return results
+
+
+def compare_results(
+    baseline: dict[str, Any], current: dict[str, Any], max_slowdown: float
+) -> list[str]:
+    """Compare the median timings of two benchmark runs.
+
+    Args:
+        baseline (dict[str, Any]): Results of the baseline run
+        current (dict[str, Any]): Results of the current run
+        max_slowdown (float): Maximum allowed slowdown in percent
+
+    Returns:
+        list[str]: Names of the benchmarks that slowed down more than allowed
+
+    """
+    regressions: list[str] = []
+
+    logger.info("")
+    logger.info(f"{'Benchmark':<40} {'Baseline':>10} {'Current':>10} {'Change':>8}")
+    for name, stats in current["benchmarks"].items():
+        baseline_stats: Optional[dict[str, Any]] = baseline["benchmarks"].get(name)
+        if baseline_stats is None:
+            logger.info(f"{name:<40} {'-':>10} {stats['median']:>10.4f} {'new':>8}")
+            continue
+
+        change: float = (stats["median"] / baseline_stats["median"] - 1) * 100
+        flag: str = ""
+        if change > max_slowdown:
+            regressions.append(name)
+            flag = " <-- REGRESSION"
+        logger.info(
+            f"{name:<40} {baseline_stats['median']:>10.4f} "
+            f"{stats['median']:>10.4f} {change:>+7.1f}%{flag}"
+        )
+    logger.info("")
+
+    if regressions:
+        logger.error(
+            f"{len(regressions)} benchmark(s) slowed down by more than "
+            f"{max_slowdown:.1f}%: {', '.join(regressions)}"
+        )
+    else:
+        logger.info(f"No benchmark slowed down by more than {max_slowdown:.1f}%.")
+
+    return regressions
+
+
+def load_results(path: str) -> dict[str, Any]:
+    """Load benchmark results from a JSON file."""
+    with open(path) as f:
+        results: dict[str, Any] = json.load(f)
+    return results
+
+
+def save_results(results: dict[str, Any], path: str) -> None:
+    """Save benchmark results to a JSON file."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Benchmark results saved to {path}")
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Benchmarks for the simulation engine and the API layer."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "run", help="run the benchmarks"
+    )
+    run_parser.add_argument(
+        "-k", "--filter", default="*", help="glob pattern for benchmark names"
+    )
+    run_parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="timed repetitions per benchmark"
+    )
+    run_parser.add_argument("-s", "--save", help="save results as JSON baseline")
+    run_parser.add_argument("-b", "--baseline", help="compare against JSON baseline")
+
+    compare_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "compare", help="compare two saved benchmark results"
+    )
+    compare_parser.add_argument("baseline", help="JSON results of the baseline run")
+    compare_parser.add_argument("current", help="JSON results of the current run")
+
+    for subparser in [run_parser, compare_parser]:
+        subparser.add_argument(
+            "--max-slowdown",
+            type=float,
+            default=MAX_SLOWDOWN,
+            help="fail if a benchmark slows down by more than this percentage",
+        )
+
+    args: argparse.Namespace = parser.parse_args()
+
+    baseline: Optional[dict[str, Any]] = None
+    if args.command == "run":
+        current: dict[str, Any] = run_benchmarks(args.filter, args.repeat)
+        if args.save:
+            save_results(current, args.save)
+        if args.baseline:
+            baseline = load_results(args.baseline)
+    else:
+        baseline = load_results(args.baseline)
+        current = load_results(args.current)
+
+    if baseline is not None:
+        if compare_results(baseline, current, args.max_slowdown):
+            sys.exit(1)
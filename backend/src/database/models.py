@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
@@ -180,13 +181,16 @@ class SimDataIn(BaseModel):
     Attributes:
         model_id (str): The ID of the model being simulated.
         run_time (str): The timestamp when the simulation is run.
-        T_amb (list[float]): Ambient temperature data.
-        G_i (list[float]): Solar irradiance data.
+        T_amb (list[float]): Ambient temperature data of one year (hourly).
+        G_i (list[float]): Solar irradiance data of one year (hourly).
         coordinates (dict[str, str]): Geographical coordinates.
         timezone (str): The timezone of the location.
-        timebase (int): The time step of the simulation in seconds.
+        timebase (int): The time step of the simulation in seconds, the weather
+            data is resampled to it by the simulation.
         planning_horizon (int): The planning horizon for the simulation.
         system_settings (SystemSettings): The energy system settings.
+        memo_key (Optional[str]): Hash of the inputs and the engine version, models
+            with the same memo key share the simulation results.
 
     """
 
@@ -199,6 +203,7 @@ class SimDataIn(BaseModel):
     timebase: int
     planning_horizon: int
     system_settings: SystemSettings
+    memo_key: Optional[str] = None
 
     class Config:
         """Pydantic model configuration."""
@@ -206,6 +211,28 @@ class SimDataIn(BaseModel):
         protected_namespaces = ()
 
 
+class SimInputs(BaseModel):
+    """Represents the prepared location data of a simulation, fetched in the
+    background when a model is submitted.
+
+    Attributes:
+        fingerprint (str): Hash of the model fields the data depends on.
+        T_amb (list[float]): Ambient temperature data of one year (hourly).
+        G_i (list[float]): Solar irradiance data of one year (hourly).
+        coordinates (dict[str, str]): Geographical coordinates.
+        timezone (str): The timezone of the location.
+        created_at (datetime): When the data was prepared, expires after a while.
+
+    """
+
+    fingerprint: str
+    T_amb: list[float]
+    G_i: list[float]
+    coordinates: dict[str, str]
+    timezone: str
+    created_at: datetime
+
+
 class SimDataOut(SimDataIn):
     """Represents sim data to be sent out to frontend, extending SimDataIn.
 
@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timedelta
 from typing import Any, Optional, Union
 
 import certifi
@@ -10,6 +11,8 @@ from motor.motor_asyncio import (
     AsyncIOMotorCursor,
     AsyncIOMotorDatabase,
 )
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from pymongo.results import DeleteResult, InsertOneResult, UpdateResult
 from pymongo.server_api import ServerApi
 
@@ -18,8 +21,10 @@ from src.database.models import (
     FinResults,
     ModelDataOut,
     SimDataIn,
+    SimInputs,
     SimResultsEval,
 )
+from src.utils.metrics import track_mongodb_operation
 
 # Use certifi to get the path of the CA file
 ca: str = certifi.where()
@@ -28,6 +33,13 @@ ca: str = certifi.where()
 load_dotenv("./.env")
 MONGODB_URI: str = os.environ["MONGODB_URI"]
 MONGODB_DATABASE: str = os.environ["MONGODB_DATABASE"]
+# Connection pool of the client: connections kept open and upper limit
+MONGODB_MIN_POOL_SIZE: int = int(os.environ.get("MONGODB_MIN_POOL_SIZE", 2))
+MONGODB_MAX_POOL_SIZE: int = int(os.environ.get("MONGODB_MAX_POOL_SIZE", 50))
+# Milliseconds an idle connection is kept in the pool
+MONGODB_MAX_IDLE_TIME_MS: int = int(os.environ.get("MONGODB_MAX_IDLE_TIME_MS", 300000))
+# Wire protocol compression, e.g. "zstd,snappy,zlib" if the packages are installed
+MONGODB_COMPRESSORS: str = os.environ.get("MONGODB_COMPRESSORS", "zlib")
 
 
 class MongoClient:
@@ -41,13 +53,32 @@ class MongoClient:
     def __init__(self) -> None:
         """Initialize the MongoClient with the MongoDB connection.
 
-        Uses environment variables for the MongoDB URI and database name.
+        Uses environment variables for the MongoDB URI, database name and the
+        settings of the connection pool. No connection is opened until the first
+        operation, see connect().
         """
         self.client: AsyncIOMotorClient = AsyncIOMotorClient(
-            MONGODB_URI, server_api=ServerApi("1"), tlsCAFile=ca
+            MONGODB_URI,
+            server_api=ServerApi("1"),
+            tlsCAFile=ca,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+            compressors=MONGODB_COMPRESSORS,
         )
         self.db: AsyncIOMotorDatabase = self.client[MONGODB_DATABASE]
 
+    async def connect(self) -> None:
+        """Connect to the database, so the first request doesn't wait for the
+        server selection and the connection handshake.
+        """
+        await self.client.admin.command("ping")
+
+    def close(self) -> None:
+        """Close all connections of the client."""
+        self.client.close()
+
+    @track_mongodb_operation("check_user_exists")
     async def check_user_exists(self, user_id: str) -> bool:
         """Check if a user with the given ID exists in the database.
 
@@ -64,6 +95,7 @@ class MongoClient:
 
         return user is not None
 
+    @track_mongodb_operation("insert_model")
     async def insert_model(self, model: dict[str, Any]) -> str:
         """Insert a new model into the database.
 
@@ -75,11 +107,10 @@ class MongoClient:
 
         """
         db_collection: AsyncIOMotorCollection = self.db["models"]
-        await db_collection.create_index("user_id", unique=False)
-
         result: InsertOneResult = await db_collection.insert_one(model)
         return str(result.inserted_id)
 
+    @track_mongodb_operation("fetch_models")
     async def fetch_models(self, user_id: str) -> list[ModelDataOut]:
         """Fetch all models associated with a given user ID.
 
@@ -101,6 +132,7 @@ class MongoClient:
 
         return models
 
+    @track_mongodb_operation("update_sim_id_of_model")
     async def update_sim_id_of_model(self, model_id: str, sim_id: str) -> bool:
         """Update the simulation ID of a specific model.
 
@@ -121,6 +153,7 @@ class MongoClient:
 
         return acknowledged
 
+    @track_mongodb_operation("delete_model")
     async def delete_model(self, model_id: str) -> bool:
         """Delete a model and all associated documents from various collections.
 
@@ -137,9 +170,9 @@ class MongoClient:
             query_model_id
         )
 
+        # Simulations may be shared with other models, they are deleted once no
+        # model refers to them, see evict_unreferenced_simulations()
         collections: list[str] = [
-            "simulations",
-            "sim_results_ts",
             "sim_results_eval",
             "finances",
             "fin_results",
@@ -153,6 +186,7 @@ class MongoClient:
 
         return acknowledged
 
+    @track_mongodb_operation("fetch_model_by_id")
     async def fetch_model_by_id(self, model_id: str) -> ModelDataOut:
         """Fetch a specific model by its ID.
 
@@ -175,6 +209,7 @@ class MongoClient:
         else:
             return ModelDataOut(**model, model_id=str(model["_id"]))
 
+    @track_mongodb_operation("fetch_document")
     async def fetch_document(
         self, collection: str, model_id: str
     ) -> Optional[dict[str, Any]]:
@@ -194,6 +229,20 @@ class MongoClient:
 
         return doc
 
+    @track_mongodb_operation("delete_document")
+    async def delete_document(self, collection: str, model_id: str) -> None:
+        """Delete the document of a given model ID from a specified collection.
+
+        Args:
+            collection (str): Name of the collection to delete the document from.
+            model_id (str): ID of the model.
+
+        """
+        query: dict[str, str] = {"model_id": model_id}
+        db_collection: AsyncIOMotorCollection = self.db[collection]
+        await db_collection.delete_many(query)
+
+    @track_mongodb_operation("insert_document")
     async def insert_document(
         self,
         collection: str,
@@ -222,19 +271,227 @@ class MongoClient:
         query: dict[str, str] = {"model_id": model_id}
         db_collection: AsyncIOMotorCollection = self.db[collection]
 
-        await db_collection.create_index("model_id", unique=True)
-
-        result: UpdateResult = await db_collection.replace_one(
-            query, document.model_dump(), upsert=True
+        # Return the id of the document also if it was replaced, not only if it was
+        # inserted
+        result: Optional[dict[str, Any]] = await db_collection.find_one_and_replace(
+            query,
+            document.model_dump(),
+            projection={"_id": True},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
         )
 
-        if not result.acknowledged:
+        if result is None:
             raise RuntimeError(
                 "Failed to insert or update the document in the database."
             )
 
-        return str(result.upserted_id)
+        return str(result["_id"])
+
+    @track_mongodb_operation("fetch_profile_version")
+    async def fetch_profile_version(self, profile_id: int) -> Optional[str]:
+        """Fetch the version of the load profile a simulation would use: the newest
+        published document of the profile ID.
+
+        Args:
+            profile_id (int): The ID of the load profile.
+
+        Returns:
+            Optional[str]: The dataset version and checksum of the profile, or None
+                            if the profile has no versioned documents.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["loadprofiles"]
+        doc: Optional[dict[str, Any]] = await db_collection.find_one(
+            {"profile_id": profile_id},
+            projection={"dataset_version": True, "checksum": True},
+            sort=[("published_at", DESCENDING)],
+        )
+        if doc is None or "dataset_version" not in doc:
+            return None
+        return f"{doc['dataset_version']}:{doc.get('checksum')}"
+
+    @track_mongodb_operation("fetch_simulation_state")
+    async def fetch_simulation_state(self, memo_key: str) -> Optional[dict[str, Any]]:
+        """Fetch the state of the simulation with the given memo key and stamp its
+        last use, so it isn't evicted while it is being reused.
+
+        Args:
+            memo_key (str): Hash of the simulation inputs and the engine version.
+
+        Returns:
+            Optional[dict[str, Any]]: The ID (_id), claim time (claimed_at) and, if
+                            completed, completion time (completed_at) of the
+                            simulation, or None if no simulation with these inputs
+                            exists.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["simulations"]
+        doc: Optional[dict[str, Any]] = await db_collection.find_one_and_update(
+            {"memo_key": memo_key},
+            {"$set": {"last_used_at": datetime.now().isoformat()}},
+            projection={"_id": True, "claimed_at": True, "completed_at": True},
+        )
+        return doc
+
+    @track_mongodb_operation("claim_simulation")
+    async def claim_simulation(self, sim_input_data: SimDataIn) -> Optional[str]:
+        """Claim the run of a simulation by inserting its inputs. The memo key is
+        unique, so only one run of the same inputs can claim it, across all API
+        workers.
+
+        Args:
+            sim_input_data (SimDataIn): The simulation inputs with memo key.
+
+        Returns:
+            Optional[str]: The simulation ID, or None if another run has claimed the
+                            memo key.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["simulations"]
+        doc: dict[str, Any] = sim_input_data.model_dump()
+        doc["claimed_at"] = doc["last_used_at"] = datetime.now().isoformat()
+        try:
+            result: InsertOneResult = await db_collection.insert_one(doc)
+        except DuplicateKeyError:
+            return None
+        return str(result.inserted_id)
+
+    @track_mongodb_operation("release_simulation")
+    async def release_simulation(self, sim_id: str) -> bool:
+        """Release the claim of an incomplete simulation, e.g. after it failed or
+        its run went stale, so the inputs can be claimed again.
+
+        Args:
+            sim_id (str): The simulation ID.
+
+        Returns:
+            bool: True if the simulation was released, False if it has completed or
+                    was released by another run.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["simulations"]
+        result: DeleteResult = await db_collection.delete_one(
+            {"_id": ObjectId(sim_id), "completed_at": {"$exists": False}}
+        )
+        return bool(result.deleted_count == 1)
+
+    @track_mongodb_operation("complete_simulation")
+    async def complete_simulation(self, sim_id: str) -> None:
+        """Mark a simulation as completed, so its results can be reused.
+
+        Args:
+            sim_id (str): The simulation ID.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["simulations"]
+        now: str = datetime.now().isoformat()
+        await db_collection.update_one(
+            {"_id": ObjectId(sim_id)},
+            {"$set": {"completed_at": now, "last_used_at": now}},
+        )
+
+    @track_mongodb_operation("fetch_sim_timeseries")
+    async def fetch_sim_timeseries(self, sim_id: str) -> Optional[dict[str, Any]]:
+        """Fetch the timeseries results of a simulation. The results are stored in
+        chunks of timesteps, which are joined in order.
+
+        Args:
+            sim_id (str): The simulation ID.
+
+        Returns:
+            Optional[dict[str, Any]]: The results document with the timeseries of all
+                                      chunks, or None if not found.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["sim_results_ts"]
+        chunks: list[dict[str, Any]] = (
+            await db_collection.find({"sim_id": sim_id})
+            .sort("chunk", ASCENDING)
+            .to_list(length=None)
+        )
+        if not chunks:
+            return None
+
+        doc: dict[str, Any] = chunks[0]
+        doc["timeseries"] = [
+            timestep for chunk in chunks for timestep in chunk.get("timeseries", [])
+        ]
+        return doc
+
+    @track_mongodb_operation("evict_unreferenced_simulations")
+    async def evict_unreferenced_simulations(self, grace: float = 3600) -> int:
+        """Delete the simulations and results that no model refers to anymore.
+        Simulations used within the grace period are kept, as they may still be
+        running or be reused by a model that isn't pointed to them yet.
+
+        Args:
+            grace (float, optional): Grace period in seconds. Defaults to 3600.
+
+        Returns:
+            int: The number of deleted simulations.
+
+        """
+        referenced: list[str] = [
+            sim_id
+            for sim_id in await self.db["models"].distinct("sim_id")
+            if sim_id and ObjectId.is_valid(sim_id)
+        ]
+        cutoff: str = (datetime.now() - timedelta(seconds=grace)).isoformat()
+
+        # Simulations without last use were stored before their use was recorded
+        result: DeleteResult = await self.db["simulations"].delete_many(
+            {
+                "_id": {"$nin": [ObjectId(sim_id) for sim_id in referenced]},
+                "$or": [
+                    {"last_used_at": {"$lt": cutoff}},
+                    {"last_used_at": {"$exists": False}, "run_time": {"$lt": cutoff}},
+                ],
+            }
+        )
+
+        # Delete the results of the simulations that no longer exist
+        kept: list[str] = [
+            str(sim_id) for sim_id in await self.db["simulations"].distinct("_id")
+        ]
+        await self.db["sim_results_ts"].delete_many(
+            {"sim_id": {"$nin": referenced + kept}, "run_time": {"$lt": cutoff}}
+        )
+        return int(result.deleted_count)
+
+    @track_mongodb_operation("fetch_sim_inputs")
+    async def fetch_sim_inputs(self, fingerprint: str) -> Optional[SimInputs]:
+        """Fetch prepared simulation inputs by their fingerprint.
+
+        Args:
+            fingerprint (str): Hash of the model fields the inputs depend on.
+
+        Returns:
+            Optional[SimInputs]: The prepared inputs, or None if not found.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["sim_inputs"]
+        doc: Optional[dict[str, Any]] = await db_collection.find_one(
+            {"_id": fingerprint}
+        )
+        return None if doc is None else SimInputs(**doc)
+
+    @track_mongodb_operation("insert_sim_inputs")
+    async def insert_sim_inputs(self, sim_inputs: SimInputs) -> None:
+        """Insert or replace prepared simulation inputs.
+
+        Args:
+            sim_inputs (SimInputs): The prepared inputs.
+
+        """
+        db_collection: AsyncIOMotorCollection = self.db["sim_inputs"]
+        await db_collection.replace_one(
+            {"_id": sim_inputs.fingerprint},
+            sim_inputs.model_dump(),
+            upsert=True,
+        )
 
+    @track_mongodb_operation("clean_collection")
     async def clean_collection(self, collection: str) -> None:
         """Delete all documents in a specified collection.
 
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from src.solar_data.geocache import GEOCODE_COLLECTION, GEOCODE_TTL
+from src.solar_data.solar_tiles import TILE_COLLECTION
+
+logger: logging.Logger = logging.getLogger("fastapi_logger")
+
+# Version of the declared collections and indexes. Increase it whenever COLLECTIONS
+# changes, so the new indexes are applied at the next startup.
+SCHEMA_VERSION: int = 6
+
+# Collection recording the applied schema version
+SCHEMA_COLLECTION: str = "schema_info"
+
+# Seconds until prepared simulation inputs expire, the weather data of PVGIS is
+# static but the inputs of deleted models shouldn't pile up
+SIM_INPUTS_TTL: int = 30 * 24 * 3600
+
+# Options of an index that can't be changed without recreating it
+INDEX_OPTIONS: tuple[str, ...] = (
+    "unique",
+    "expireAfterSeconds",
+    "partialFilterExpression",
+)
+
+# Indexes that are no longer declared and are dropped when the schema is applied.
+# The results of a simulation are split into chunks, so sim_id isn't unique anymore.
+DROPPED_INDEXES: dict[str, list[str]] = {"sim_results_ts": ["sim_id_1"]}
+
+# All collections of the database and their indexes. Simulations are shared by the
+# models with the same inputs (memo key), so they aren't unique per model.
+COLLECTIONS: dict[str, list[IndexModel]] = {
+    "users": [],
+    "models": [IndexModel("user_id"), IndexModel("sim_id")],
+    "simulations": [
+        IndexModel("model_id"),
+        IndexModel(
+            "memo_key",
+            unique=True,
+            partialFilterExpression={"memo_key": {"$type": "string"}},
+        ),
+    ],
+    "sim_results_ts": [
+        IndexModel([("sim_id", ASCENDING), ("chunk", ASCENDING)], unique=True),
+        IndexModel("model_id"),
+    ],
+    "sim_results_eval": [IndexModel("model_id", unique=True)],
+    "finances": [IndexModel("model_id", unique=True)],
+    "fin_results": [IndexModel("model_id", unique=True)],
+    "loadprofiles": [
+        IndexModel(
+            [("profile_id", ASCENDING), ("dataset_version", ASCENDING)], unique=True
+        ),
+        IndexModel([("profile_id", ASCENDING), ("published_at", DESCENDING)]),
+    ],
+    GEOCODE_COLLECTION: [IndexModel("updated_at", expireAfterSeconds=GEOCODE_TTL)],
+    TILE_COLLECTION: [],
+    "sim_inputs": [IndexModel("created_at", expireAfterSeconds=SIM_INPUTS_TTL)],
+}
+
+
+async def get_schema_version(db: AsyncIOMotorDatabase) -> Optional[int]:
+    """Get the schema version applied to the database.
+
+    Args:
+        db (AsyncIOMotorDatabase): The database.
+
+    Returns:
+        Optional[int]: The applied schema version, None if no schema was applied.
+
+    """
+    doc: Optional[dict[str, Any]] = await db[SCHEMA_COLLECTION].find_one(
+        {"_id": "schema"}
+    )
+    return None if doc is None else int(doc["version"])
+
+
+async def drop_changed_indexes(
+    collection: AsyncIOMotorCollection, indexes: list[IndexModel]
+) -> None:
+    """Drop the existing indexes whose options differ from the declared index of the
+    same name, so they can be recreated. MongoDB refuses to create an index with the
+    name of an existing index with other options.
+
+    Args:
+        collection (AsyncIOMotorCollection): The collection.
+        indexes (list[IndexModel]): The declared indexes of the collection.
+
+    """
+    existing: dict[str, dict[str, Any]] = await collection.index_information()
+    for index in indexes:
+        declared: dict[str, Any] = index.document
+        current: Optional[dict[str, Any]] = existing.get(declared["name"])
+        if current is not None and any(
+            current.get(option) != declared.get(option) for option in INDEX_OPTIONS
+        ):
+            logger.info(f"Dropping index {collection.name}.{declared['name']}.")
+            await collection.drop_index(declared["name"])
+
+
+async def drop_indexes(collection: AsyncIOMotorCollection, names: list[str]) -> None:
+    """Drop the existing indexes of the given names.
+
+    Args:
+        collection (AsyncIOMotorCollection): The collection.
+        names (list[str]): The names of the indexes to drop.
+
+    """
+    existing: dict[str, dict[str, Any]] = await collection.index_information()
+    for name in names:
+        if name in existing:
+            logger.info(f"Dropping index {collection.name}.{name}.")
+            await collection.drop_index(name)
+
+
+async def apply_schema(db: AsyncIOMotorDatabase, force: bool = False) -> bool:
+    """Create the declared collections and indexes if the database has an older
+    schema version. Creating an existing index is a no-op, so applying the schema
+    repeatedly is safe. Indexes whose options changed are recreated, indexes that are
+    no longer declared are dropped.
+
+    Args:
+        db (AsyncIOMotorDatabase): The database.
+        force (bool, optional): Apply the schema even if the database is up to date.
+                                Defaults to False.
+
+    Returns:
+        bool: True if the schema was applied, False if it was up to date.
+
+    """
+    version: Optional[int] = await get_schema_version(db)
+    if not force and version is not None and version >= SCHEMA_VERSION:
+        logger.info(f"Database schema is up to date (version {version}).")
+        return False
+
+    existing: list[str] = await db.list_collection_names()
+    for name, indexes in COLLECTIONS.items():
+        if name not in existing:
+            await db.create_collection(name)
+        if indexes:
+            await drop_changed_indexes(db[name], indexes)
+            await db[name].create_indexes(indexes)
+
+    for name, index_names in DROPPED_INDEXES.items():
+        if name in existing:
+            await drop_indexes(db[name], index_names)
+
+    await db[SCHEMA_COLLECTION].replace_one(
+        {"_id": "schema"},
+        {"version": SCHEMA_VERSION, "applied_at": datetime.now().isoformat()},
+        upsert=True,
+    )
+    logger.info(
+        f"Database schema applied: version {version} -> {SCHEMA_VERSION}, "
+        f"{len(COLLECTIONS)} collections."
+    )
+    return True
+
+
+async def main(force: bool) -> None:
+    """Apply the schema to the configured database."""
+    # Imported here, the client reads the connection settings at import time
+    from src.database.mongodb import MongoClient
+
+    db_client: MongoClient = MongoClient()
+    try:
+        await apply_schema(db_client.db, force)
+    finally:
+        db_client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Create the collections and indexes of the database."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="apply the schema even if the database is up to date",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.force))
@@ -1,12 +1,15 @@
 import logging
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime
 from logging import Logger
 from typing import Any, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, status
+from fastapi import BackgroundTasks, FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from src.database.models import (
     FinFormData,
@@ -21,11 +24,20 @@ from src.database.models import (
 )
 from src.database.mongodb import MongoClient
 from src.utils.auth_funcs import check_user_exists
+from src.utils.metrics import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    MetricsMiddleware,
+    record_cache_lookup,
+)
+from src.utils.resources import Resources
 from src.utils.sim_funcs import (
+    SIM_TIMEBASES,
     calc_fin_results,
     eval_sim_results,
     get_sim_input_data,
-    run_ferntree_simulation,
+    prefetch_sim_inputs,
+    run_memoized_simulation,
 )
 
 # Set up logger
@@ -37,11 +49,24 @@ logging.basicConfig(
 )
 logger: Logger = logging.getLogger(LOGGERNAME)
 
-# Create a FastAPI instance
-app: FastAPI = FastAPI()
+# Resources shared by all requests: MongoDB client, HTTP session and warmed caches
+resources: Resources = Resources()
+db_client: MongoClient = resources.db_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open the shared resources at startup and close them at shutdown. The schema
+    of the database is applied once at startup, instead of creating the indexes on
+    every write.
+    """
+    await resources.start()
+    yield
+    await resources.close()
+
 
-# Create a MongoDB client
-db_client: MongoClient = MongoClient()
+# Create a FastAPI instance
+app: FastAPI = FastAPI(lifespan=lifespan)
 
 # Load config from .env file:
 load_dotenv("./.env")
@@ -58,15 +83,33 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Record request metrics (added last, so it also times the CORS middleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Export the metrics of the API in the Prometheus text exposition format.
+
+    Returns:
+        PlainTextResponse: Request, database, external API, simulation and cache
+            metrics of this worker process.
+
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
 
 @app.post("/workspace/models/submit-model", response_model=str)
 @check_user_exists(db_client)
-async def submit_model(user_id: str, model_data: ModelDataIn) -> str:
+async def submit_model(
+    user_id: str, model_data: ModelDataIn, background_tasks: BackgroundTasks
+) -> str:
     """Submit a new model to the database.
 
     Args:
         user_id (str): The ID of the user submitting the model.
         model_data (ModelDataIn): The model data to be submitted.
+        background_tasks (BackgroundTasks): Tasks run after the response is sent.
 
     Returns:
         str: The ID of the newly created model.
@@ -88,6 +131,17 @@ async def submit_model(user_id: str, model_data: ModelDataIn) -> str:
             detail="Error inserting model data into database.",
         )
 
+    # Prefetch the solar data, coordinates and timezone of the model after the
+    # response is sent. The geocoding cache is seeded with the frontend coordinates.
+    # Simulations run as awaited subprocesses, so the prefetch isn't stalled by them.
+    background_tasks.add_task(
+        prefetch_sim_inputs,
+        db_client,
+        model_data,
+        resources.geocoder,
+        resources.solar_tiles,
+    )
+
     logger.info(
         f"POST:\t/workspace/models/submit-model --> Return Model ID: {model_id}"
     )
@@ -121,12 +175,16 @@ async def fetch_models(user_id: str) -> list[ModelDataOut]:
 
 @app.delete("/workspace/models/delete-model", response_model=str)
 @check_user_exists(db_client)
-async def delete_model(user_id: str, model_id: str) -> str:
-    """Delete a specific model.
+async def delete_model(
+    user_id: str, model_id: str, background_tasks: BackgroundTasks
+) -> str:
+    """Delete a specific model. Its simulation is deleted in the background, once no
+    other model refers to it.
 
     Args:
         user_id (str): The ID of the user requesting the deletion.
         model_id (str): The ID of the model to be deleted.
+        background_tasks (BackgroundTasks): Tasks run after the response is sent.
 
     Returns:
         str: The ID of the deleted model.
@@ -147,6 +205,7 @@ async def delete_model(user_id: str, model_id: str) -> str:
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Model with ID {model_id} not found.",
         )
+    background_tasks.add_task(db_client.evict_unreferenced_simulations)
 
     logger.info(
         f"DELETE:\t/workspace/models/delete-model --> Deleted model with ID: {model_id}"
@@ -157,12 +216,21 @@ async def delete_model(user_id: str, model_id: str) -> str:
 
 @app.get("/workspace/simulations/run-sim", response_model=dict[str, bool])
 @check_user_exists(db_client)
-async def run_simulation(user_id: str, model_id: str) -> dict[str, bool]:
-    """Run a simulation for a specific model.
+async def run_simulation(
+    user_id: str,
+    model_id: str,
+    background_tasks: BackgroundTasks,
+    timebase: int = 3600,
+) -> dict[str, bool]:
+    """Run a simulation for a specific model. If a simulation with the same inputs
+    has completed before, e.g. for an identical model, its results are reused.
 
     Args:
         user_id (str): The ID of the user requesting the simulation.
         model_id (str): The ID of the model to simulate.
+        background_tasks (BackgroundTasks): Tasks run after the response is sent.
+        timebase (int, optional): The time step of the simulation in seconds.
+            Defaults to 3600.
 
     Returns:
         dict[str, bool]: A dictionary indicating whether simulation run was successful.
@@ -173,42 +241,51 @@ async def run_simulation(user_id: str, model_id: str) -> dict[str, bool]:
     """
     logger.info(
         f"GET:\t/workspace/simulations/run-sim --> "
-        f"Received request: user_id={user_id}, model_id={model_id}"
+        f"Received request: user_id={user_id}, model_id={model_id}, "
+        f"timebase={timebase}"
     )
 
+    if timebase not in SIM_TIMEBASES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Timebase {timebase}s not supported, use {SIM_TIMEBASES}.",
+        )
+
     # Fetch model data from database
     model_data: ModelDataOut = await db_client.fetch_model_by_id(model_id)
 
     # Get simulation input data
-    sim_input_data: SimDataIn = await get_sim_input_data(model_data)
-
-    # Insert simulation input data into database
-    sim_id: str = await db_client.insert_document("simulations", sim_input_data)
+    sim_input_data: SimDataIn = await get_sim_input_data(
+        model_data, timebase, resources.geocoder, resources.solar_tiles, db_client
+    )
 
-    # Run the simulation
-    sim_run: bool = await run_ferntree_simulation(model_id, sim_id)
+    # Run the simulation, or reuse the results of one with the same inputs
+    try:
+        sim_id: str = await run_memoized_simulation(db_client, model_id, sim_input_data)
+    except RuntimeError as e:
+        logger.info(f"ERROR:\t/workspace/simulations/run-simulation --> {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error running simulation",
+        )
 
-    # If sim run was successful, insert sim_id into model doc in database
-    if sim_run:
+    # Point the model to the simulation, the results of its previous simulation
+    # are evaluated no longer and deleted once no other model refers to them
+    if sim_id != model_data.sim_id:
+        await db_client.delete_document("sim_results_eval", model_id)
         sim_id_updated: bool = await db_client.update_sim_id_of_model(model_id, sim_id)
         if not sim_id_updated:
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail=f"Error updating sim_id {sim_id} of model {model_id}.",
             )
-        logger.info(
-            f"GET:\t/workspace/simulations/run-simulation --> "
-            f"Sim {sim_id} ran successfully!"
-        )
-        return {"run_successful": True}
-    else:
-        logger.info(
-            f"ERROR:\t/workspace/simulations/run-simulation --> Sim {sim_id} failed!"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error running simulation",
-        )
+        background_tasks.add_task(db_client.evict_unreferenced_simulations)
+
+    logger.info(
+        f"GET:\t/workspace/simulations/run-simulation --> "
+        f"Sim {sim_id} ran successfully!"
+    )
+    return {"run_successful": True}
 
 
 @app.get("/workspace/simulations/fetch-sim-results", response_model=SimResultsEval)
@@ -236,6 +313,7 @@ async def fetch_sim_results(user_id: str, model_id: str) -> SimResultsEval:
     sim_results_eval_existing: Optional[SimResultsEval] = (
         SimResultsEval(**doc) if doc else None
     )
+    record_cache_lookup("sim_results_eval", sim_results_eval_existing is not None)
 
     # If not, evaluate sim results
     if sim_results_eval_existing is None:
@@ -285,9 +363,14 @@ async def fetch_sim_timeseries(
         logger.error(f"Error parsing datetime: {e}")
         raise HTTPException(status_code=400, detail="Invalid datetime format")
 
-    # Fetch sim results timeseries data
-    doc: Optional[dict[str, Any]] = await db_client.fetch_document(
-        "sim_results_ts", model_id
+    # Fetch model data
+    model_data: ModelDataOut = await db_client.fetch_model_by_id(model_id)
+
+    # Fetch sim results timeseries data of the simulation of the model
+    doc: Optional[dict[str, Any]] = (
+        await db_client.fetch_sim_timeseries(model_data.sim_id)
+        if model_data.sim_id
+        else None
     )
     if doc is None:
         raise RuntimeError(
@@ -297,8 +380,6 @@ async def fetch_sim_timeseries(
         SimTimestep(**timestep) for timestep in doc["timeseries"]
     ]
 
-    # Fetch model data
-    model_data: ModelDataOut = await db_client.fetch_model_by_id(model_id)
     battery_cap: float = model_data.battery_cap
 
     # Filter the timeseries data to only include data within the given date range
@@ -317,8 +398,13 @@ async def fetch_sim_timeseries(
         if start_time <= timestep.time <= end_time
     ]
 
-    if len(sim_timeseries_data) > 20 * 24:
-        sim_timeseries_data = sim_timeseries_data[: 20 * 24]
+    # Limit the response to 20 days, the number of timesteps depends on the timebase
+    timebase: int = (
+        int(sim_results[1].time - sim_results[0].time) if len(sim_results) > 1 else 3600
+    )
+    max_timesteps: int = 20 * 24 * 3600 // max(timebase, 1)
+    if len(sim_timeseries_data) > max_timesteps:
+        sim_timeseries_data = sim_timeseries_data[:max_timesteps]
         logger.info(
             "POST:\t/workspace/simulations/fetch-sim-timeseries --> "
             "Fetch too large, returning only 20 days of data"
@@ -353,13 +439,17 @@ async def submit_fin_form_data(user_id: str, fin_form_data_sub: FinFormData) ->
     model_id: str = fin_form_data_sub.model_id
     doc: Optional[dict[str, Any]] = await db_client.fetch_document("finances", model_id)
     fin_form_data_db: Optional[FinFormData] = FinFormData(**doc) if doc else None
+    fin_results_cached: bool = (
+        fin_form_data_db is not None and fin_form_data_sub == fin_form_data_db
+    )
+    record_cache_lookup("fin_results", fin_results_cached)
 
     # If model has no form data (1:1 relation),
     # then write form data to database and calculate financial results
     # If model has form data, then check if form data has changed and if so,
     # write new form data to database and calculate financial results
     # Else nothing to do because finances have already been calculated for this formdata
-    if (fin_form_data_db is None) or (fin_form_data_sub != fin_form_data_db):
+    if not fin_results_cached:
         logger.info(
             f"POST:\t/workspace/finances/submit-fin-form-data --> "
             f"Calculating financial results for model {model_id}"
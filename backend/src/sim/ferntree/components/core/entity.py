@@ -1,6 +1,16 @@
 class Entity:
-    """Base entity class."""
+    """Base entity class.
+    Components of the simulation core use __slots__ instead of an instance __dict__
+    to reduce their memory footprint and speed up attribute lookups in the timestep
+    loop. Subclasses declare their own attributes in __slots__.
+    """
+
+    __slots__ = ()
 
     def __init__(self) -> None:
         """Initializes a new instance of the Entity class."""
         pass
+
+    def stepped(self) -> bool:
+        """Whether the entity has to be simulated step by step."""
+        return True
@@ -0,0 +1,187 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# Seconds of a simulated year
+SECONDS_PER_YEAR: int = 365 * 24 * 3600
+
+# Resampling methods
+# - "linear": linear interpolation of point values, e.g. ambient temperature
+# - "energy": interpolation that conserves the energy of each source interval,
+#   e.g. solar irradiance and load profiles given as mean power per interval
+METHODS: tuple[str, ...] = ("linear", "energy")
+
+# Resampled series by (source, timebase, method), least recently used first
+_cache: OrderedDict[tuple[str, int, str], np.ndarray] = OrderedDict()
+# Maximum number of cached series
+CACHE_SIZE: int = 32
+
+
+def year_timebase(values: np.ndarray) -> int:
+    """Timebase of a series covering one year.
+
+    Args:
+        values (np.ndarray): Series with the timesteps along the last axis
+
+    Returns:
+        int: Timebase in seconds
+
+    Raises:
+        ValueError: If the length of the series doesn't divide a year
+
+    """
+    timesteps: int = values.shape[-1]
+    if timesteps == 0 or SECONDS_PER_YEAR % timesteps != 0:
+        raise ValueError(f"Series with {timesteps} values doesn't cover one year.")
+    return SECONDS_PER_YEAR // timesteps
+
+
+def block_mean(values: np.ndarray, steps: int) -> np.ndarray:
+    """Downsample a series by averaging blocks of steps values.
+
+    Args:
+        values (np.ndarray): Series with the timesteps along the last axis
+        steps (int): Number of values per block
+
+    Returns:
+        np.ndarray: Mean of each block
+
+    """
+    return values.reshape(*values.shape[:-1], -1, steps).mean(axis=-1)
+
+
+def interpolate(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Periodic linear interpolation of a series at fractional positions, the
+    last value is interpolated towards the first one (the year wraps around).
+
+    Args:
+        values (np.ndarray): Series with the timesteps along the last axis
+        positions (np.ndarray): Fractional indices of the interpolated values
+
+    Returns:
+        np.ndarray: Interpolated values
+
+    """
+    lower: np.ndarray = np.floor(positions).astype(np.int64)
+    frac: np.ndarray = positions - lower
+    n: int = values.shape[-1]
+    lower %= n
+    upper: np.ndarray = (lower + 1) % n
+    result: np.ndarray = values[..., lower] * (1 - frac) + values[..., upper] * frac
+    return result
+
+
+def upsample(values: np.ndarray, steps: int, method: str) -> np.ndarray:
+    """Upsample a series to steps values per source interval.
+
+    Args:
+        values (np.ndarray): Series with the timesteps along the last axis
+        steps (int): Number of values per source interval
+        method (str): "linear" or "energy"
+
+    Returns:
+        np.ndarray: Upsampled series
+
+    """
+    if method == "linear":
+        # Source values are samples at the start of each interval
+        return interpolate(values, np.arange(values.shape[-1] * steps) / steps)
+
+    # Source values are means over each interval: interpolate between the interval
+    # midpoints, then scale each interval to its source mean
+    positions: np.ndarray = (np.arange(values.shape[-1] * steps) + 0.5) / steps - 0.5
+    shape: tuple[int, ...] = (*values.shape, steps)
+    result: np.ndarray = interpolate(values, positions).reshape(shape)
+    means: np.ndarray = result.mean(axis=-1)
+    valid: np.ndarray = means > 0
+    scale: np.ndarray = np.divide(values, means, out=np.zeros(means.shape), where=valid)
+    # Intervals whose interpolation has no positive mean keep the source mean
+    result = np.where(
+        valid[..., np.newaxis],
+        result * scale[..., np.newaxis],
+        values[..., np.newaxis],
+    )
+    return result.reshape(*values.shape[:-1], -1)
+
+
+def resample(
+    values: np.ndarray,
+    timebase: int,
+    method: str,
+    source_timebase: Optional[int] = None,
+) -> np.ndarray:
+    """Resample a series to another timebase. Coarser timebases average the values
+    of each interval, finer timebases interpolate them with the given method.
+
+    Args:
+        values (np.ndarray): Series with the timesteps along the last axis
+        timebase (int): Target timebase in seconds
+        method (str): "linear" or "energy", see METHODS
+        source_timebase (int, optional): Timebase of the series in seconds, inferred
+            from its length if None (the series has to cover one year)
+
+    Returns:
+        np.ndarray: Resampled series as float64 array
+
+    Raises:
+        ValueError: If the method is unknown or the timebases are not multiples of
+            each other
+
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method '{method}', use {METHODS}.")
+
+    values = np.asarray(values, dtype=np.float64)
+    source: int = source_timebase or year_timebase(values)
+    if timebase == source:
+        return values
+    if source % timebase == 0:
+        return upsample(values, source // timebase, method)
+    if timebase % source == 0:
+        return block_mean(values, timebase // source)
+    raise ValueError(f"Can't resample from timebase {source}s to {timebase}s.")
+
+
+def resample_cached(
+    values: np.ndarray,
+    timebase: int,
+    method: str,
+    source: Optional[str] = None,
+) -> np.ndarray:
+    """Resample a series and cache the result by source, timebase and method.
+
+    Args:
+        values (np.ndarray): Series covering one year, timesteps along the last axis
+        timebase (int): Target timebase in seconds
+        method (str): "linear" or "energy", see METHODS
+        source (str, optional): Key of the series, e.g. the version and id of a load
+            profile. The content hash of the series is used if None.
+
+    Returns:
+        np.ndarray: Read-only resampled series, the series itself if it already has
+        the target timebase
+
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if year_timebase(values) == timebase:
+        # Nothing to resample, e.g. a zero-copy view of the profile store
+        return values
+
+    if source is None:
+        source = hashlib.sha1(values.tobytes()).hexdigest()
+
+    key: tuple[str, int, str] = (source, timebase, method)
+    result: Optional[np.ndarray] = _cache.get(key)
+    if result is None:
+        result = resample(values, timebase, method)
+        # Cached series are shared by all callers
+        result.flags.writeable = False
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+
+    return result
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+logger: logging.Logger = logging.getLogger("ferntree")
+
+# Directory of the local stage cache
+scipt_dir: str = os.path.dirname(os.path.abspath(__file__))
+STAGE_CACHE_DIR: str = os.environ.get(
+    "STAGE_CACHE_DIR",
+    os.path.normpath(os.path.join(scipt_dir, "../../data/stage_cache")),
+)
+# Maximum size of the cached stage outputs [bytes], least recently used are removed
+STAGE_CACHE_MAX_BYTES: int = int(os.environ.get("STAGE_CACHE_MAX_MB", 512)) * 2**20
+# Version of the stage computations. Increase it whenever the computation of a
+# stage changes, so outputs of the previous version are not reused.
+STAGE_CACHE_VERSION: int = 1
+
+# Outputs of a stage: arrays by name
+StageOutputs = dict[str, np.ndarray]
+
+
+def stage_key(name: str, inputs: dict[str, Any], upstream: list[str]) -> str:
+    """Key of the outputs of a stage: hash of the stage, its own inputs and the keys
+    of the upstream stages it reads from.
+
+    Args:
+        name (str): Name of the stage
+        inputs (dict): Inputs of the stage, JSON serialisable
+        upstream (list): Keys of the upstream stages
+
+    Returns:
+        str: SHA-256 hex digest
+
+    """
+    payload: str = json.dumps(
+        [STAGE_CACHE_VERSION, name, inputs, upstream], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def array_digest(values: np.ndarray) -> str:
+    """Content hash of an array, e.g. of the weather data as input of a stage."""
+    data: np.ndarray = np.ascontiguousarray(values, dtype=np.float64)
+    return hashlib.sha1(data.tobytes()).hexdigest()
+
+
+class StageCache:
+    """Local cache of the outputs of the simulation stages.
+
+    The simulation is a chain of stages: weather -> baseload -> PV -> net load ->
+    battery dispatch. Each stage output is stored in a .npz file named by a key of
+    the stage inputs and the keys of its upstream stages. If only the battery of a
+    model changes, the weather, baseload and PV outputs are reused and only the
+    dispatch is simulated. The files are shared by all simulation processes.
+    """
+
+    def __init__(
+        self, root: str = STAGE_CACHE_DIR, max_bytes: int = STAGE_CACHE_MAX_BYTES
+    ) -> None:
+        """Initializes a new instance of the StageCache class.
+
+        Args:
+            root (str): Directory of the cache
+            max_bytes (int): Maximum size of the cached outputs [bytes]
+
+        """
+        self.root: str = root
+        self.max_bytes: int = max_bytes
+
+    def path(self, key: str) -> str:
+        """Path of the file of a stage output."""
+        return os.path.join(self.root, f"{key}.npz")
+
+    def get(self, key: str) -> Optional[StageOutputs]:
+        """Get the outputs of a stage.
+
+        Args:
+            key (str): Key of the stage outputs
+
+        Returns:
+            StageOutputs, optional: Arrays by name, None if not cached
+
+        """
+        path: str = self.path(key)
+        try:
+            with np.load(path) as npz:
+                outputs: StageOutputs = {name: npz[name] for name in npz.files}
+            # Mark as recently used for the eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            # Not cached, or removed by another process in the meantime
+            return None
+        return outputs
+
+    def put(self, key: str, outputs: StageOutputs) -> None:
+        """Store the outputs of a stage atomically and evict the least recently
+        used outputs if the cache is full.
+
+        Args:
+            key (str): Key of the stage outputs
+            outputs (StageOutputs): Arrays by name
+
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path: str = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **outputs)
+        os.replace(tmp_path, self.path(key))
+        self.evict()
+
+    def compute(
+        self, name: str, key: str, func: Callable[[], StageOutputs]
+    ) -> StageOutputs:
+        """Get the outputs of a stage, compute and store them if not cached.
+
+        Args:
+            name (str): Name of the stage
+            key (str): Key of the stage outputs
+            func (Callable): Computes the outputs of the stage
+
+        Returns:
+            StageOutputs: Arrays by name
+
+        """
+        outputs: Optional[StageOutputs] = self.get(key)
+        if outputs is not None:
+            logger.info(f"Stage cache: reusing {name} outputs.")
+            return outputs
+
+        outputs = func()
+        try:
+            self.put(key, outputs)
+        except OSError as e:
+            logger.warning(f"Failed to store {name} outputs in stage cache: {e}")
+        return outputs
+
+    def evict(self) -> None:
+        """Remove the least recently used outputs until the cache fits max_bytes."""
+        files: list[tuple[float, int, str]] = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat: os.stat_result = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total: int = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+# Stage caches of this process by directory
+_caches: dict[str, StageCache] = {}
+
+
+def get_stage_cache(root: str = STAGE_CACHE_DIR) -> StageCache:
+    """Get the stage cache of a directory, shared within the process.
+
+    Args:
+        root (str): Directory of the cache
+
+    Returns:
+        StageCache: Stage cache of the directory
+
+    """
+    if root not in _caches:
+        _caches[root] = StageCache(root)
+    return _caches[root]
@@ -0,0 +1,90 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("ferntree")
+
+
+class StateRegistry:
+    """Registry for the state variables of the simulation.
+    Each component registers the state variables it writes during the simulation.
+    At startup, the registry allocates one NumPy record array with a column (field)
+    for each variable and a row for each timestep. Components write their state into
+    their own column at the current timestep, and the filled array is the output of
+    the simulation.
+    """
+
+    def __init__(self, timesteps: int) -> None:
+        """Initializes a new instance of the StateRegistry class.
+
+        Args:
+            timesteps (int): Number of timesteps of the simulation
+
+        """
+        self.timesteps: int = timesteps  # Number of rows of the state array
+        self.fields: list[str] = []  # Names of the registered state variables
+        self.data: np.ndarray  # Record array (timesteps x variables)
+        self.allocated: bool = False
+
+    def register(self, *names: str) -> None:
+        """Registers state variables. Variables can be registered by several components
+        (e.g. a device and the smart meter reading it), but only once per name.
+
+        Args:
+            names (str): Names of the state variables
+
+        """
+        if self.allocated:
+            raise RuntimeError("Cannot register state variables after allocation.")
+
+        for name in names:
+            if name not in self.fields:
+                self.fields.append(name)
+
+    def allocate(self) -> np.ndarray:
+        """Allocates the record array for all registered state variables.
+        All variables are initialised with 0.0, so that variables of components
+        that are not part of the system model read as zero.
+
+        Returns:
+            np.ndarray: The record array of the simulation state
+
+        """
+        dtype: np.dtype = np.dtype([(name, np.float64) for name in self.fields])
+        self.data = np.zeros(self.timesteps, dtype=dtype)
+        self.allocated = True
+
+        logger.info(
+            f"State registry: {len(self.fields)} variables x {self.timesteps} timesteps"
+        )
+
+        return self.data
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a writable view on the column of a state variable.
+
+        Args:
+            name (str): Name of the state variable
+
+        Returns:
+            np.ndarray: View on the column of the state variable
+
+        """
+        if not self.allocated:
+            raise RuntimeError("State registry has not been allocated yet.")
+        if name not in self.fields:
+            raise KeyError(f"State variable '{name}' is not registered.")
+
+        return self.data[name]
+
+    def row(self, t: int) -> dict[str, float]:
+        """Returns the state of all variables at timestep t.
+
+        Args:
+            t (int): Timestep
+
+        Returns:
+            dict: State variables at timestep t
+
+        """
+        return dict(zip(self.fields, self.data[t].tolist()))
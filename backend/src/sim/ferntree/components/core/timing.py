@@ -0,0 +1,111 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+logger = logging.getLogger("ferntree")
+
+
+class SpanTimer:
+    """Collects timing spans for the phases of a simulation run, e.g. loading the
+    config, building the simulation or the timestep loop. Spans with the same name
+    are accumulated, so a span can also be used to time a function that is called
+    at every timestep.
+    """
+
+    def __init__(self, detailed: bool = False) -> None:
+        """Initializes a new instance of the SpanTimer class.
+
+        Args:
+            detailed (bool): Also time the timetick of each component at every
+                timestep, which adds a small overhead to the timestep loop
+
+        """
+        self.detailed: bool = detailed
+        # Accumulated timing spans: name -> count, total and max duration [s]
+        self.spans: dict[str, dict[str, float]] = {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Context manager to time a phase of the simulation.
+
+        Args:
+            name (str): Name of the span
+
+        """
+        start_time: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    def add(self, name: str, duration: float) -> None:
+        """Adds a duration to a span.
+
+        Args:
+            name (str): Name of the span
+            duration (float): Duration in seconds
+
+        """
+        span: Any = self.spans.get(name)
+        if span is None:
+            self.spans[name] = {"count": 1, "total_s": duration, "max_s": duration}
+        else:
+            span["count"] += 1
+            span["total_s"] += duration
+            if duration > span["max_s"]:
+                span["max_s"] = duration
+
+    def wrap(self, name: str, func: Callable[[], Any]) -> Callable[[], Any]:
+        """Wraps a function without arguments so that each call is added to a span.
+
+        Args:
+            name (str): Name of the span
+            func (Callable): Function to time
+
+        Returns:
+            Callable: The timed function
+
+        """
+        add: Callable[[str, float], None] = self.add
+        perf_counter: Callable[[], float] = time.perf_counter
+
+        def timed() -> Any:
+            start_time: float = perf_counter()
+            result: Any = func()
+            add(name, perf_counter() - start_time)
+            return result
+
+        return timed
+
+    def to_dict(self) -> dict[str, dict[str, float]]:
+        """Returns the spans with their count, total, mean and max duration."""
+        return {
+            name: {
+                "count": span["count"],
+                "total_s": span["total_s"],
+                "mean_s": span["total_s"] / span["count"],
+                "max_s": span["max_s"],
+            }
+            for name, span in self.spans.items()
+        }
+
+    def log_summary(self) -> None:
+        """Logs the total duration of each span."""
+        logger.info("Timing spans:")
+        for name, span in self.spans.items():
+            logger.info(
+                f"  {name:<32} {span['total_s']:>9.4f} s ({int(span['count'])}x)"
+            )
+
+    def dump(self, path: str) -> None:
+        """Writes the spans as JSON metrics to a file.
+
+        Args:
+            path (str): Path of the JSON file
+
+        """
+        with open(path, "w") as f:
+            json.dump({"spans": self.to_dict()}, f, indent=2)
+        logger.info(f"Timing spans written to {path}")
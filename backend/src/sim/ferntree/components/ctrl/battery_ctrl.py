@@ -1,5 +1,5 @@
 import logging
-from typing import Any
+from typing import Any, Callable
 
 # import cvxpy as cp
 import numpy as np
@@ -12,6 +12,21 @@ logger = logging.getLogger("ferntree")
 class BatteryCtrl:
     """Control class for battery device."""
 
+    __slots__ = (
+        "host",
+        "dt_h",
+        "planning_horizon",
+        "useable_capacity",
+        "greedy",
+        "opt_fill",
+        "smart_meter",
+        "prediction_window",
+        "P_load_pred",
+        "Z_charge",
+        "Z_discharge",
+        "get_net_load",
+    )
+
     def __init__(
         self, host: SimHost, ctrl_specs: dict[str, Any], smart_meter: Device
     ) -> None:
@@ -25,6 +40,8 @@ class BatteryCtrl:
         """
         # super().__init__(host)
         self.host: SimHost = host
+        # Duration of a timestep [h] to convert battery power to energy
+        self.dt_h: float = self.host.timebase / 3600
 
         # Planning horizon for battery operation [days]
         self.planning_horizon: int = int(
@@ -48,6 +65,16 @@ class BatteryCtrl:
         self.Z_charge: float = 0.0
         self.Z_discharge: float = 0.0
 
+        # Net load measurement of the smart meter (cached at startup)
+        self.get_net_load: Callable[[], float]
+
+    def startup(self) -> None:
+        """Startup of the battery controller: measures the net load of all timesteps
+        and caches the net load measurement of the smart meter.
+        """
+        self.smart_meter.measure_net_load()
+        self.get_net_load = self.smart_meter.get_net_load
+
     def set_battery_power(
         self, soc_t: float, bat_max_pwr: float, bat_cap: float
     ) -> tuple[float, float, float, float]:
@@ -67,7 +94,7 @@ class BatteryCtrl:
 
         """
         # Get current net load of house
-        p_t: float = self.smart_meter.get_net_load()
+        p_t: float = self.get_net_load()
         # Update prediction of net load power profile
         self.P_load_pred = self.update_prediction(self.P_load_pred, p_t)
 
@@ -146,14 +173,14 @@ class BatteryCtrl:
         # Enforce feasibility of battery profile wrt. SoC
         # Additional constraints added with safety margins of 10% of capacity
         x_t = min(
-            x_t, 0.9 * bat_cap - soc_t
+            x_t, (0.9 * bat_cap - soc_t) / self.dt_h
         )  # battery cannot charge more than capacity - soc_t
         x_t = max(
-            x_t, -(soc_t - 0.1 * bat_cap)
+            x_t, -(soc_t - 0.1 * bat_cap) / self.dt_h
         )  # battery cannot discharge more than soc_t
 
-        # Update state of charge
-        soc_t += x_t
+        # Update state of charge with the energy of the timestep
+        soc_t += x_t * self.dt_h
 
         return x_t, soc_t, Z_t
 
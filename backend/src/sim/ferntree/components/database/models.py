@@ -1,3 +1,7 @@
+import hashlib
+from typing import Optional, Union
+
+import numpy as np
 from pydantic import BaseModel, Field
 
 
@@ -46,7 +50,43 @@ class LoadProfile(BaseModel):
         title="Profile ID",
         description="The ID of the load profile",
     )
-    load_profile: list[float] = Field(
+    load_profile: Union[bytes, list[float]] = Field(
         title="Load Profile",
-        description="The load profile in kW",
+        description="The load profile in kW, packed as binary or as list of floats",
+    )
+    dataset_version: Optional[str] = Field(
+        title="Dataset Version",
+        description="The version of the dataset the load profile belongs to",
+        default=None,
+    )
+    dtype: Optional[str] = Field(
+        title="Data Type",
+        description="The data type of the packed load profile, e.g. '<f4'",
+        default=None,
+    )
+    checksum: Optional[str] = Field(
+        title="Checksum",
+        description="The sha256 checksum of the packed load profile",
+        default=None,
     )
+
+    def to_array(self) -> np.ndarray:
+        """Decode the load profile.
+
+        Returns:
+            np.ndarray: The load profile as float64 array
+
+        Raises:
+            ValueError: If the checksum of the packed load profile doesn't match
+
+        """
+        if isinstance(self.load_profile, list):
+            return np.array(self.load_profile, dtype=np.float64)
+
+        if self.checksum != hashlib.sha256(self.load_profile).hexdigest():
+            raise ValueError(
+                f"Checksum mismatch of load profile with id {self.profile_id} "
+                f"(version {self.dataset_version})."
+            )
+        values: np.ndarray = np.frombuffer(self.load_profile, dtype=self.dtype or "<f8")
+        return values.astype(np.float64)
@@ -1,8 +1,13 @@
+import logging
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 from typing import Any, Optional
 
 import certifi
+import numpy as np
 from bson.objectid import ObjectId
 from components.database.models import LoadProfile, TimestepData
 from dotenv import load_dotenv
@@ -21,16 +26,38 @@ load_dotenv(env_path)
 MONGODB_URI: str = os.environ["MONGODB_URI"]
 MONGODB_DATABASE: str = os.environ["MONGODB_DATABASE"]
 
+logger: logging.Logger = logging.getLogger("ferntree")
+
+# Write-behind: number of batches waiting for the writer thread before the
+# simulation blocks (one batch is written while the next one is filled)
+MAX_PENDING_BATCHES: int = 2
+# Write-behind: bounds of the adaptive batch size [timesteps]
+MIN_BATCH_SIZE: int = 500
+MAX_BATCH_SIZE: int = 50000
+# Write-behind: round-trip time [s] above which the batch size is increased
+TARGET_RTT: float = 0.05
+# Number of timesteps per results document. A year of results at a timebase of
+# 60 s exceeds the 16 MB limit of a document, so the results are split into chunks.
+RESULTS_CHUNK_SIZE: int = 10000
+
 
 class pyMongoClient:
     """Class for interacting with the MongoDB database."""
 
-    def __init__(self, sim_id: str, model_id: str) -> None:
+    def __init__(
+        self,
+        sim_id: Optional[str] = None,
+        model_id: Optional[str] = None,
+        write_behind: bool = True,
+    ) -> None:
         """Initializes a new instance of the pyMongoClient class.
 
         Args:
-            sim_id (str): id of simulation doc in db
-            model_id (str): id of model doc in db
+            sim_id (str, optional): id of simulation doc in db, None for a client
+                that only reads, e.g. to sync the profile store
+            model_id (str, optional): id of model doc in db
+            write_behind (bool): write results in a background thread, so the
+                simulation doesn't wait for the database
 
         """
         self.client: MongoClient = MongoClient(
@@ -39,24 +66,34 @@ class pyMongoClient:
 
         self.db: Database = self.client[MONGODB_DATABASE]
         self.results_collection: Collection = self.db["sim_results_ts"]
-        self.results_collection.create_index("sim_id", unique=True)
-        self.results_collection.create_index("model_id", unique=True)
 
-        # Replace the document if it exists, or insert a new one
-        self.results_collection.replace_one(
-            {"sim_id": sim_id},
-            {
-                "sim_id": sim_id,
-                "model_id": model_id,
-                "run_time": datetime.now().isoformat(),
-            },
-            upsert=True,
-        )
+        # Remove the results of a previous run, the chunks are created on write
+        if sim_id is not None:
+            self.results_collection.delete_many({"sim_id": sim_id})
 
-        self.sim_id: str = sim_id
+        self.sim_id: Optional[str] = sim_id
+        self.model_id: Optional[str] = model_id
+        self.run_time: str = datetime.now().isoformat()
+        # Number of timesteps written to the results documents
+        self.rows_written: int = 0
 
+        # Number of timesteps written to the database at once, adapted to the
+        # round-trip time of the writes in write-behind mode
         self.batch_size: int = 1000
-        self.data_buffer: list[Any] = []
+
+        # Write-behind: the writer thread drains a bounded queue of batches
+        self.write_behind: bool = write_behind and sim_id is not None
+        self.pending: queue.Queue[Optional[np.ndarray]] = queue.Queue(
+            MAX_PENDING_BATCHES
+        )
+        self.writer_error: Optional[BaseException] = None
+        self.rtt: Optional[float] = None  # Smoothed round-trip time of writes [s]
+        self.writer: Optional[threading.Thread] = None
+        if self.write_behind:
+            self.writer = threading.Thread(
+                target=self.writer_loop, name="ferntree-db-writer", daemon=True
+            )
+            self.writer.start()
 
     def load_config(self) -> dict[str, Any]:
         """Load simulation configuration from the database.
@@ -75,18 +112,22 @@ class pyMongoClient:
 
         return result
 
-    def get_load_profile(self, profile_id: int) -> list[float]:
+    def get_load_profile(self, profile_id: int) -> np.ndarray:
         """Get load profile for baseload from database.
+        If the profile was published in several dataset versions, the newest one is
+        used.
 
         Args:
             profile_id (int): id of load profile in db
 
         Returns:
-            list: Load profile
+            np.ndarray: Load profile
 
         """
         collection = self.db["loadprofiles"]
-        doc: Optional[dict[str, Any]] = collection.find_one({"profile_id": profile_id})
+        doc: Optional[dict[str, Any]] = collection.find_one(
+            {"profile_id": profile_id}, sort=[("published_at", -1)]
+        )
 
         if doc is None:
             raise ValueError(
@@ -94,49 +135,169 @@ class pyMongoClient:
             )  # noqa: E501
 
         lp_data: LoadProfile = LoadProfile(**doc)
-        load_profile: list[float] = lp_data.load_profile
+        load_profile: np.ndarray = lp_data.to_array()
 
         return load_profile
 
-    def write_timeseries_data_to_db(self, results: dict[str, Any]) -> None:
-        """Write the results of a single timestep to the database.
+    def get_profile_versions(self) -> list[str]:
+        """Get the dataset versions of the load profiles in use: the version of the
+        newest published document of each profile id. Datasets publish disjoint
+        ranges of profile ids, so this is the newest version of every dataset.
+
+        Returns:
+            list: Sorted dataset versions, empty if no versioned profiles exist
+
+        """
+        collection = self.db["loadprofiles"]
+        pipeline: list[dict[str, Any]] = [
+            {"$match": {"dataset_version": {"$exists": True}}},
+            {"$sort": {"profile_id": 1, "published_at": -1}},
+            {
+                "$group": {
+                    "_id": "$profile_id",
+                    "dataset_version": {"$first": "$dataset_version"},
+                }
+            },
+            {"$group": {"_id": "$dataset_version"}},
+        ]
+        return sorted(str(doc["_id"]) for doc in collection.aggregate(pipeline))
+
+    def get_load_profiles(
+        self, dataset_versions: list[str]
+    ) -> dict[int, tuple[str, np.ndarray]]:
+        """Get all load profiles of the given dataset versions from database. If a
+        profile id is in several of the versions, the newest one is used.
 
         Args:
-            results (dict): The results of a single timestep
+            dataset_versions (list): Dataset versions of the load profiles
+
+        Returns:
+            dict: Dataset version and load profile by id
 
         """
-        # Check that results are correct type
-        parsed_results: TimestepData = TimestepData(**results)
-        # Parse results to dictionary and append to buffer
-        timestep_results: dict[str, Optional[float]] = parsed_results.model_dump()
-        self.data_buffer.append(timestep_results)
+        collection = self.db["loadprofiles"]
+        profiles: dict[int, tuple[str, np.ndarray]] = {}
+        for doc in collection.find(
+            {"dataset_version": {"$in": dataset_versions}}, sort=[("published_at", 1)]
+        ):
+            lp_data: LoadProfile = LoadProfile(**doc)
+            profiles[lp_data.profile_id] = (
+                str(lp_data.dataset_version),
+                lp_data.to_array(),
+            )
+
+        return profiles
+
+    def write_timeseries_data_to_db(self, results: np.ndarray) -> None:
+        """Write the results of a batch of timesteps to the database. In
+        write-behind mode, the batch is queued for the writer thread.
 
-        # Write buffer to database if it is full
-        if len(self.data_buffer) == self.batch_size:
-            self.write_batch(self.data_buffer)
-            self.data_buffer = []
+        Args:
+            results (np.ndarray): Rows of the record array of the simulation state
 
-    def write_batch(self, batch: list[TimestepData]) -> None:
-        """Write a batch of results to the database.
+        """
+        # Check that results contain all fields of a timestep
+        fields: tuple[str, ...] = results.dtype.names or ()
+        missing: set[str] = set(TimestepData.model_fields) - set(fields)
+        if missing:
+            raise ValueError(f"Results are missing timestep data: {sorted(missing)}")
+
+        if self.writer is None:
+            self.write_batch(self.to_documents(results))
+            return
+
+        # Fail fast if the writer thread has failed
+        self.raise_writer_error()
+        # Hand a copy over to the writer thread, blocks only if it falls behind
+        self.pending.put(results.copy())
+
+    def to_documents(self, results: np.ndarray) -> list[dict[str, float]]:
+        """Convert rows of the record array to timestep documents."""
+        fields: tuple[str, ...] = results.dtype.names or ()
+        return [dict(zip(fields, row)) for row in results.tolist()]
+
+    def writer_loop(self) -> None:
+        """Writer thread: writes the pending batches to the database until the
+        sentinel None is received. After an error, the remaining batches are
+        discarded so the simulation doesn't block, the error is raised by the
+        simulation thread.
+        """
+        while True:
+            results: Optional[np.ndarray] = self.pending.get()
+            if results is None:
+                return
+            if self.writer_error is not None:
+                continue
+            try:
+                start: float = time.perf_counter()
+                self.write_batch(self.to_documents(results))
+                self.adapt_batch_size(time.perf_counter() - start)
+            except BaseException as e:
+                logger.error(f"Failed to write results to database: {e}")
+                self.writer_error = e
+
+    def adapt_batch_size(self, rtt: float) -> None:
+        """Adapt the batch size to the round-trip time of the writes: if writes are
+        slow or the writer falls behind, fewer but larger batches are written.
+
+        Args:
+            rtt (float): Round-trip time of the last write [s]
+
+        """
+        self.rtt = rtt if self.rtt is None else 0.8 * self.rtt + 0.2 * rtt
+        if self.rtt > TARGET_RTT or self.pending.qsize() > 0:
+            self.batch_size = min(self.batch_size * 2, MAX_BATCH_SIZE)
+        elif self.rtt < TARGET_RTT / 4:
+            self.batch_size = max(self.batch_size // 2, MIN_BATCH_SIZE)
+
+    def raise_writer_error(self) -> None:
+        """Raise the error of the writer thread in the simulation thread."""
+        if self.writer_error is not None:
+            raise RuntimeError(
+                "Writing results to database failed."
+            ) from self.writer_error
+
+    def write_batch(self, batch: list[dict[str, float]]) -> None:
+        """Write a batch of results to the database. The batch is pushed to the
+        results documents of the chunks it spans, a chunk document is created with
+        its first timesteps.
 
         Args:
             batch (list): A batch of results
 
         """
-        # Find document with sim_id and push batch
-        self.results_collection.update_one(
-            {"sim_id": self.sim_id}, {"$push": {"timeseries": {"$each": batch}}}
-        )
+        start: int = 0
+        while start < len(batch):
+            row: int = self.rows_written + start
+            chunk: int = row // RESULTS_CHUNK_SIZE
+            stop: int = min(
+                len(batch), start + RESULTS_CHUNK_SIZE - row % RESULTS_CHUNK_SIZE
+            )
+            self.results_collection.update_one(
+                {"sim_id": self.sim_id, "chunk": chunk},
+                {
+                    "$push": {"timeseries": {"$each": batch[start:stop]}},
+                    "$setOnInsert": {
+                        "model_id": self.model_id,
+                        "run_time": self.run_time,
+                    },
+                },
+                upsert=True,
+            )
+            start = stop
+        self.rows_written += len(batch)
 
     def shutdown(self) -> None:
         """Shutdown of the database:
-        - Writes any remaining data in the buffer to the database
+        - Waits until the writer thread has written all pending batches.
         - Closes the connection to the database.
+        - Raises the error of the writer thread, if any.
         """
-        # Write remaining data in buffer to database
-        if self.data_buffer:
-            self.write_batch(self.data_buffer)
-            self.data_buffer = []
+        if self.writer is not None:
+            self.pending.put(None)
+            self.writer.join()
+            self.writer = None
 
         # Close connection to database
         self.client.close()
+        self.raise_writer_error()
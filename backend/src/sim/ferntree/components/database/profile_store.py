@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Optional
+
+import numpy as np
+from components.database.mongodb import pyMongoClient
+
+logger: logging.Logger = logging.getLogger("ferntree")
+
+# Directory of the local profile store
+scipt_dir: str = os.path.dirname(os.path.abspath(__file__))
+PROFILE_STORE_DIR: str = os.environ.get(
+    "PROFILE_STORE_DIR",
+    os.path.normpath(os.path.join(scipt_dir, "../../data/profile_store")),
+)
+# Seconds until the dataset versions of the store are checked again in the database
+PROFILE_STORE_MAX_AGE: float = float(os.environ.get("PROFILE_STORE_MAX_AGE", 600))
+# Index of the store: dataset versions, matrix file, row and version of each profile
+INDEX_FILE: str = "index.json"
+
+
+class ProfileStore:
+    """Local store of the normalised annual load profiles.
+
+    The newest published version of each profile in the database, i.e. the newest
+    version of every dataset, is kept in a memory-mapped .npy matrix with one row
+    per profile. Looking up a profile is an O(1) zero-copy view of its row, and the
+    pages of the matrix are shared by all simulation processes via the page cache.
+    The store is synced from the database when a new dataset version is published.
+    """
+
+    def __init__(
+        self, root: str = PROFILE_STORE_DIR, max_age: float = PROFILE_STORE_MAX_AGE
+    ) -> None:
+        """Initializes a new instance of the ProfileStore class.
+
+        Args:
+            root (str): Directory of the store
+            max_age (float): Seconds until the dataset versions are checked again
+
+        """
+        self.root: str = root
+        self.max_age: float = max_age
+        self.index: Optional[dict[str, Any]] = None
+        self.profiles: Optional[np.ndarray] = None
+        self.rows: dict[int, int] = {}
+
+    @property
+    def dataset_versions(self) -> list[str]:
+        """Dataset versions of the loaded profiles, empty if the store is empty."""
+        return list((self.index or {}).get("dataset_versions", []))
+
+    def version(self, profile_id: int) -> Optional[str]:
+        """Dataset version of a profile in the store, None if it is not stored."""
+        row: Optional[int] = self.rows.get(profile_id)
+        if row is None or self.index is None:
+            return None
+        return str(self.index["row_versions"][row])
+
+    def load(self) -> None:
+        """Load the index of the store and memory-map the profiles if another
+        process has synced new dataset versions.
+        """
+        index_path: str = os.path.join(self.root, INDEX_FILE)
+        if not os.path.isfile(index_path):
+            return
+        with open(index_path) as f:
+            index: dict[str, Any] = json.load(f)
+
+        if index["file"] != (self.index or {}).get("file"):
+            self.profiles = np.load(
+                os.path.join(self.root, index["file"]), mmap_mode="r"
+            )
+            self.rows = {
+                int(profile_id): row for row, profile_id in enumerate(index["rows"])
+            }
+        self.index = index
+
+    def sync(self, db_client: pyMongoClient, force: bool = False) -> None:
+        """Sync the store with the newest dataset versions in the database.
+        The versions are only checked if the last check is older than max_age, the
+        profiles are only fetched if the versions have changed.
+
+        Args:
+            db_client (pyMongoClient): Database client
+            force (bool): Check the versions regardless of the last check
+
+        """
+        self.load()
+        if (
+            not force
+            and self.index is not None
+            and self.dataset_versions
+            and time.time() - self.index["checked_at"] < self.max_age
+        ):
+            return
+
+        versions: list[str] = db_client.get_profile_versions()
+        if not versions:
+            # No versioned profiles published
+            return
+
+        if versions != self.dataset_versions:
+            logger.info(f"Syncing load profiles of versions {versions} to local store.")
+            profiles: dict[int, tuple[str, np.ndarray]] = db_client.get_load_profiles(
+                versions
+            )
+            profile_ids: list[int] = sorted(profiles)
+            matrix: np.ndarray = np.stack([profiles[i][1] for i in profile_ids])
+
+            # Each set of versions has its own matrix file, so processes reading
+            # the previous versions are not affected
+            versions_hash: str = hashlib.sha1(json.dumps(versions).encode()).hexdigest()
+            file_name: str = f"profiles_{versions_hash[:16]}.npy"
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path: str = os.path.join(self.root, f"{file_name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, os.path.join(self.root, file_name))
+            index: dict[str, Any] = {
+                "dataset_versions": versions,
+                "file": file_name,
+                "rows": profile_ids,
+                "row_versions": [profiles[i][0] for i in profile_ids],
+            }
+        else:
+            index = dict(self.index or {})
+
+        index["checked_at"] = time.time()
+        self.write_index(index)
+        self.load()
+        self.remove_stale_files()
+
+    def write_index(self, index: dict[str, Any]) -> None:
+        """Replace the index of the store atomically."""
+        tmp_path: str = os.path.join(self.root, f"{INDEX_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.root, INDEX_FILE))
+
+    def remove_stale_files(self) -> None:
+        """Remove the matrix files of previous dataset versions."""
+        current: Optional[str] = (self.index or {}).get("file")
+        for file_name in os.listdir(self.root):
+            if file_name.endswith(".npy") and file_name != current:
+                os.remove(os.path.join(self.root, file_name))
+
+    def get(self, profile_id: int) -> Optional[np.ndarray]:
+        """Get a load profile from the store.
+
+        Args:
+            profile_id (int): id of load profile
+
+        Returns:
+            np.ndarray, optional: Read-only view of the load profile, None if the
+            profile is not in the store
+
+        """
+        row: Optional[int] = self.rows.get(profile_id)
+        if row is None or self.profiles is None:
+            return None
+        return self.profiles[row]
+
+
+# Profile stores of this process by directory
+_stores: dict[str, ProfileStore] = {}
+
+
+def get_profile_store(root: str = PROFILE_STORE_DIR) -> ProfileStore:
+    """Get the profile store of a directory, shared within the process.
+
+    Args:
+        root (str): Directory of the store
+
+    Returns:
+        ProfileStore: Profile store of the directory
+
+    """
+    if root not in _stores:
+        _stores[root] = ProfileStore(root)
+    return _stores[root]
@@ -1,7 +1,9 @@
 import logging
-from typing import Any
+from typing import Any, Optional
 
 import numpy as np
+from components.core.resample import resample_cached
+from components.core.stage_cache import StageOutputs, array_digest
 from components.dev.device import Device
 from components.host.sim_host import SimHost
 
@@ -11,10 +13,25 @@ logger: logging.Logger = logging.getLogger("ferntree")
 class BaseLoad(Device):  # type: ignore[misc]
     """Class for uncontrollable baseload."""
 
+    __slots__ = ("annual_consumption", "load_profile", "source", "P_base")
+
     def __init__(
-        self, host: SimHost, dev_specs: dict[str, Any], load_profile: list[float]
+        self,
+        host: SimHost,
+        dev_specs: dict[str, Any],
+        load_profile: np.ndarray,
+        source: Optional[str] = None,
     ) -> None:
-        """Initializes a new instance of the BaseLoad class."""
+        """Initializes a new instance of the BaseLoad class.
+
+        Args:
+            host (SimHost): The simulation host
+            dev_specs (dict): Specifications of the baseload
+            load_profile (np.ndarray): Normalised load profile of one year
+            source (str, optional): Key of the load profile, e.g. its dataset version
+                and id. The content hash of the profile is used if None.
+
+        """
         super().__init__(host)
 
         # Annual electricity consumption [kWh] to scale load profile
@@ -22,33 +39,55 @@ class BaseLoad(Device):  # type: ignore[misc]
             "annual_consumption"
         ]  # Annual electricity consumption [kWh]
 
-        # Set normalised load profile
-        self.load_profile: np.ndarray = np.array(load_profile)
+        # Set normalised load profile, may be a read-only view of the profile store
+        self.load_profile: np.ndarray = np.asarray(load_profile)
+        self.source: Optional[str] = source
 
-        # Current state of the baseload
-        self.current_state: dict[str, float] = {"P_base": 0.0}
+        # State of the baseload: Power demand [kW]
+        self.host.state.register("P_base")
+        self.P_base: np.ndarray
 
     def startup(self) -> None:
         """Startup of the baseload
-        - Get load profile from database
-        - Scale loadprofile to specified annual consumption.
+        - Resample and scale the load profile, or reuse it from the stage cache
+        - Write baseload power demand of all timesteps to the simulation state.
         """
-        # load_profile = np.array(self.host.get_load_profile(self.profile_id))
-        if abs(self.load_profile.sum() - 1.0) > 1e-6:
-            logger.warning(
-                f"Load profile not normalized to 1kWh/a: {self.load_profile.sum():.2f} kWh/a"  # noqa: E501
-            )
+        baseload: StageOutputs = self.host.run_stage(
+            "baseload",
+            self.scale_load_profile,
+            {
+                "profile": self.source or array_digest(self.load_profile),
+                "timebase": self.host.timebase,
+                "annual_consumption": self.annual_consumption,
+            },
+        )
 
-        # Scale load profile to specified annual consumption
-        # self.load_profile represents now annual baseload power demand in kW
-        self.load_profile = (
-            self.load_profile * self.annual_consumption / self.load_profile.sum()
+        # Baseload is uncontrollable, so the state of all timesteps is known upfront
+        self.P_base = self.host.state.column("P_base")
+        self.P_base[:] = baseload["P_base"][: self.host.timesteps]
+
+    def scale_load_profile(self) -> StageOutputs:
+        """Resample the load profile to the timebase and scale it to the specified
+        annual consumption.
+
+        Returns:
+            StageOutputs: Baseload power demand P_base [kW]
+
+        """
+        load_profile: np.ndarray = resample_cached(
+            self.load_profile, self.host.timebase, "energy", source=self.source
         )
+        # Energy of the profile [kWh]: power [kW] times duration of timestep [h]
+        dt_h: float = self.host.timebase / 3600
+        energy: float = load_profile.sum() * dt_h
+        if abs(energy - 1.0) > 1e-6:
+            logger.warning(f"Load profile not normalized to 1kWh/a: {energy:.2f} kWh/a")
+
+        # Scale load profile to specified annual consumption
+        # P_base represents now annual baseload power demand in kW
+        P_base: np.ndarray = load_profile * self.annual_consumption / energy
         logger.info(
-            f"Baseload: mean {self.load_profile.mean():.2f} kW, max {self.load_profile.max():.2f} kW, min {self.load_profile.min():.2f} kW, {self.load_profile.sum():.2f} kWh"  # noqa: E501
+            f"Baseload: mean {P_base.mean():.2f} kW, max {P_base.max():.2f} kW, min {P_base.min():.2f} kW, {P_base.sum() * dt_h:.2f} kWh"  # noqa: E501
         )
 
-    def timetick(self) -> None:
-        """Simulates a single timestep of the baseload."""
-        # Update current state of the baseload
-        self.current_state["P_base"] = self.load_profile[self.host.current_timestep]
+        return {"P_base": P_base}
@@ -1,15 +1,36 @@
 import logging
+from typing import Callable, Optional
 
+import numpy as np
+from components.core.stage_cache import StageOutputs
 from components.ctrl.battery_ctrl import BatteryCtrl
 from components.dev.device import Device
 from components.host.sim_host import SimHost
 
 logger: logging.Logger = logging.getLogger("ferntree")
 
+# State variables of the battery dispatch, stored in the stage cache
+DISPATCH_STATE: tuple[str, ...] = ("P_bat", "Soc_bat", "fill_level", "P_load_pred")
+
 
 class BatteryDev(Device):  # type: ignore[misc]
     """Class for battery energy storage."""
 
+    __slots__ = (
+        "capacity",
+        "max_power",
+        "soc_init",
+        "battery_ctrl",
+        "soc",
+        "P_bat",
+        "Soc_bat",
+        "fill_level",
+        "P_load_pred",
+        "set_battery_power",
+        "dispatch_key",
+        "restored",
+    )
+
     def __init__(self, host: SimHost, dev_specs: dict[str, float]) -> None:
         """Initializes a new instance of the BatteryDev class."""
         super().__init__(host)
@@ -23,27 +44,100 @@ class BatteryDev(Device):  # type: ignore[misc]
 
         # Battery controller (is set by simBuilder)
         self.battery_ctrl: BatteryCtrl
+        # Control method of the battery controller (cached at startup)
+        self.set_battery_power: Callable[..., tuple[float, float, float, float]]
+
+        # Current state of charge [kWh]
+        self.soc: float = self.soc_init
+
+        # State of the battery
+        self.host.state.register(
+            "P_bat",  # Power [kW]
+            "Soc_bat",  # State of charge [kWh]
+            "fill_level",  # Fill level of battery [0 ... 1]
+            "P_load_pred",  # Predicted load of house [kW]
+        )
+        self.P_bat: np.ndarray
+        self.Soc_bat: np.ndarray
+        self.fill_level: np.ndarray
+        self.P_load_pred: np.ndarray
 
-        # Current state of the battery
-        self.current_state: dict[str, float] = {
-            "P_bat": 0.0,  # Power at current timestep [kW]
-            "Soc_bat": self.soc_init,  # State of charge at current timestep [kWh]
-            "fill_level": 0.0,  # Fill level of battery [0 ... 1]
-            "P_load_pred": 0.0,  # Predicted load of house at current timestep [kW]
-        }
+        # Key of the dispatch in the stage cache, None if it can't be cached
+        self.dispatch_key: Optional[str] = None
+        # Dispatch of all timesteps was taken from the stage cache
+        self.restored: bool = False
 
     def startup(self) -> None:
-        """Startup of the battery."""
-        pass
+        """Startup of the battery.
+        - Starts up the battery controller and caches its control method
+        - Caches the columns of the battery state
+        - Restores the dispatch from the stage cache, if the net load and the battery
+          specs are unchanged since an earlier simulation.
+        """
+        self.soc = self.soc_init
+        self.battery_ctrl.startup()
+        self.set_battery_power = self.battery_ctrl.set_battery_power
+        self.P_bat = self.host.state.column("P_bat")
+        self.Soc_bat = self.host.state.column("Soc_bat")
+        self.fill_level = self.host.state.column("fill_level")
+        self.P_load_pred = self.host.state.column("P_load_pred")
+
+        ctrl: BatteryCtrl = self.battery_ctrl
+        self.dispatch_key = self.host.stage_key(
+            "dispatch",
+            {
+                "capacity": self.capacity,
+                "max_power": self.max_power,
+                "soc_init": self.soc_init,
+                "planning_horizon": ctrl.planning_horizon,
+                "useable_capacity": ctrl.useable_capacity,
+                "greedy": ctrl.greedy,
+                "opt_fill": ctrl.opt_fill,
+                "timebase": self.host.timebase,
+                "timesteps": self.host.timesteps,
+            },
+            upstream=("net_load",),
+        )
+        self.restored = False
+        if self.dispatch_key is not None and self.host.stages is not None:
+            dispatch: Optional[StageOutputs] = self.host.stages.get(self.dispatch_key)
+            if dispatch is not None:
+                logger.info("Stage cache: reusing dispatch outputs.")
+                for name in DISPATCH_STATE:
+                    self.host.state.column(name)[:] = dispatch[name]
+                self.restored = True
+
+    def stepped(self) -> bool:
+        """The battery is simulated step by step, unless its dispatch was restored
+        from the stage cache.
+        """
+        return not self.restored
+
+    def shutdown(self) -> None:
+        """Shutdown of the battery: stores the simulated dispatch in the stage
+        cache.
+        """
+        if self.restored or self.dispatch_key is None or self.host.stages is None:
+            return
+        try:
+            self.host.stages.put(
+                self.dispatch_key,
+                {name: self.host.state.column(name) for name in DISPATCH_STATE},
+            )
+        except OSError as e:
+            logger.warning(f"Failed to store dispatch outputs in stage cache: {e}")
 
     def timetick(self) -> None:
         """Simulates a single timestep of the battery."""
         # Update current state of the battery
         # Convention: Generation is negative, consumption positive
-        bat_pwr, soc_t, Z_t, P_load_pred = self.battery_ctrl.set_battery_power(
-            self.current_state["Soc_bat"], self.max_power, self.capacity
+        bat_pwr, soc_t, Z_t, P_load_pred = self.set_battery_power(
+            self.soc, self.max_power, self.capacity
         )
-        self.current_state["P_bat"] = bat_pwr
-        self.current_state["Soc_bat"] = soc_t
-        self.current_state["fill_level"] = Z_t
-        self.current_state["P_load_pred"] = P_load_pred
+        self.soc = soc_t
+
+        t: int = self.host.current_timestep
+        self.P_bat[t] = bat_pwr
+        self.Soc_bat[t] = soc_t
+        self.fill_level[t] = Z_t
+        self.P_load_pred[t] = P_load_pred
@@ -7,16 +7,24 @@ from components.host.sim_host import SimHost
 class Device(Entity):  # type: ignore[misc]
     """Base class for all devices."""
 
+    __slots__ = ("host",)
+
     def __init__(self, host: SimHost) -> None:
         """Initializes a new instance of the Device class."""
         super().__init__()
         self.host: SimHost = host
-        self.current_state: dict[str, float]
 
     def startup(self) -> None:
         """Startup of the device."""
         pass
 
+    def stepped(self) -> bool:
+        """Whether the device has to be simulated step by step. Devices that don't
+        override the timetick (e.g. uncontrollable devices) write their state of all
+        timesteps at startup.
+        """
+        return type(self).timetick is not Device.timetick
+
     def timetick(self) -> Any:
         """Simulates a single timestep of the device."""
         pass
@@ -1,5 +1,6 @@
 import logging
 
+import numpy as np
 from components.ctrl.heating_ctrl import HeatingCtrl
 from components.dev.device import Device
 from components.dev.heating_dev import HeatingDev
@@ -30,33 +31,41 @@ class HeatingSys(Device):  # type: ignore[misc]
         self.heating_ctrl: HeatingCtrl  # thermostat controller
         self.heating_dev: HeatingDev  # heating device, e.g. heat pump
 
-        # Initialize current state of the heating system
-        self.current_state: dict[str, float] = {
-            "T_in": 20.0 + 273.15,  # indoor temperature in [K]
-            "T_en": 5.0 + 273.15,  # building envelope temperature in [K]
-            "P_heat_th": 0.0,  # thermal heating power in [kW]
-            "P_heat_el": 0.0,  # electrical heating power in [kW]
-        }
+        # State of the heating system
+        self.host.state.register(
+            "T_in",  # indoor temperature in [K]
+            "T_en",  # building envelope temperature in [K]
+            "P_heat_th",  # thermal heating power in [kW]
+            "P_heat_el",  # electrical heating power in [kW]
+        )
+        self.P_heat_th: np.ndarray
+        self.P_heat_el: np.ndarray
 
         # Initialize heat demand profiles
         self.heat_demand_profiles: dict[str, list[float]] = {
-            "T_in": [self.current_state["T_in"]],  # indoor temperature in [K]
-            "T_en": [
-                self.current_state["T_en"]
-            ],  # building envelope temperature in [K]
-            "P_heat_th": [
-                self.current_state["P_heat_th"]
-            ],  # thermal heating power in [kW]
+            "T_in": [20.0 + 273.15],  # indoor temperature in [K]
+            "T_en": [5.0 + 273.15],  # building envelope temperature in [K]
+            "P_heat_th": [0.0],  # thermal heating power in [kW]
         }
 
     def startup(self) -> None:
         """Startup of the heating system.
         - Initializes thermostat controller, thermal building model and heating device
-        - Creates heat demand profiles and scales to annual demand.
+        - Creates heat demand profiles and scales to annual demand
+        - Writes heat demand profiles to the simulation state.
         """
         # Create heat demand profiles and scale to annual demand
         self.create_heat_demand_profiles()
 
+        # Temperatures and thermal heating power of all timesteps are known upfront
+        timesteps: int = self.host.timesteps
+        for name in ["T_in", "T_en", "P_heat_th"]:
+            self.host.state.column(name)[:] = self.heat_demand_profiles[name][
+                :timesteps
+            ]
+        self.P_heat_th = self.host.state.column("P_heat_th")
+        self.P_heat_el = self.host.state.column("P_heat_el")
+
     def create_heat_demand_profiles(self) -> None:
         """Creates heat demand profiles for the heating system and scales to
         annual demand.
@@ -115,12 +124,7 @@ class HeatingSys(Device):  # type: ignore[misc]
         # Get current timestep from simHost
         t: int = self.host.current_timestep
 
-        # Update current state of heating system
-        self.current_state["T_in"] = self.heat_demand_profiles["T_in"][t]
-        self.current_state["T_en"] = self.heat_demand_profiles["T_en"][t]
-        self.current_state["P_heat_th"] = self.heat_demand_profiles["P_heat_th"][t]
-
         # Determine electrical heating power based on thermal heating power
-        self.current_state["P_heat_el"] = self.heating_dev.set_electrical_heating_power(
-            self.current_state["P_heat_th"]
+        self.P_heat_el[t] = self.heating_dev.set_electrical_heating_power(
+            self.P_heat_th[t]
         )
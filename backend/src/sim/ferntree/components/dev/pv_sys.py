@@ -1,5 +1,7 @@
 import logging
 
+import numpy as np
+from components.core.stage_cache import StageOutputs
 from components.dev.device import Device
 from components.host.sim_host import SimHost
 
@@ -9,6 +11,8 @@ logger: logging.Logger = logging.getLogger("ferntree")
 class PVSys(Device):  # type: ignore[misc]
     """Class for photovoltaic system."""
 
+    __slots__ = ("peak_power", "P_pv")
+
     def __init__(self, host: SimHost, dev_specs: dict[str, float]) -> None:
         """Initializes a new instance of the PVSys class."""
         super().__init__(host)
@@ -19,17 +23,33 @@ class PVSys(Device):  # type: ignore[misc]
         else:
             self.peak_power = dev_specs["peak_power"]
 
-        self.current_state: dict[str, float] = {
-            "P_pv": 0.0
-        }  # Current state of the PV system: Power output at current timestep [kW]
+        # State of the PV system: Power output [kW]
+        self.host.state.register("P_pv")
+        self.P_pv: np.ndarray
 
     def startup(self) -> None:
-        """Startup of the pv system."""
-        pass
-
-    def timetick(self) -> None:
-        """Simulates a single timestep of the PV system."""
-        # Update current state of the PV system
+        """Startup of the pv system.
+        The PV generation only depends on the solar irradiance, so the power output of
+        all timesteps is written to the simulation state upfront.
+        """
+        # Cheaper to compute than to load, only keyed for the downstream stages
+        pv: StageOutputs = self.host.run_stage(
+            "pv",
+            self.convert_solar,
+            {"peak_power": self.peak_power},
+            upstream=("weather",),
+            persist=False,
+        )
+        self.P_pv = self.host.state.column("P_pv")
+        self.P_pv[:] = pv["P_pv"]
+
+    def convert_solar(self) -> StageOutputs:
+        """Convert the solar irradiance to the power output of the PV system.
+
+        Returns:
+            StageOutputs: Power output P_pv [kW]
+
+        """
         # Convention: Generation is negative, consumption positive
-        P_solar: float = self.host.env_state.get("P_solar") or 0.0
-        self.current_state["P_pv"] = -1 * self.peak_power * P_solar * 1e-3
+        P_solar: np.ndarray = self.host.state.column("P_solar")
+        return {"P_pv": -1 * self.peak_power * P_solar * 1e-3}
@@ -1,8 +1,8 @@
 import logging
-from typing import Any
+from typing import Any, Callable
 
+from components.core.timing import SpanTimer
 from components.dev.device import Device
-from components.dev.smart_meter import SmartMeter
 from components.host.sim_host import SimHost
 
 logger = logging.getLogger("ferntree")
@@ -13,6 +13,8 @@ class SfHouse(Device):  # type: ignore[misc]
     Each house has a baseload, a heating system, and optionally a PV system and battery.
     """
 
+    __slots__ = ("components", "timeticks")
+
     def __init__(self, host: SimHost) -> None:
         """Initializes a new instance of the SfHouse class.
         - Adds the house to the host
@@ -22,6 +24,8 @@ class SfHouse(Device):  # type: ignore[misc]
 
         self.host.add_house(self)
         self.components: dict[str, Device] = {}
+        # Timeticks of the components that are simulated step by step (set at startup)
+        self.timeticks: tuple[Callable[[], Any], ...] = ()
 
     def add_component(self, comp: Device, name: str) -> None:
         """Adds a components to the house."""
@@ -31,38 +35,43 @@ class SfHouse(Device):  # type: ignore[misc]
             raise TypeError("Can only add objects of class 'Device' to house.")
 
     def startup(self) -> None:
-        """Startup of the house and its components."""
-        for comp in self.components.values():
-            comp.startup()
+        """Startup of the house and its components.
+        Components that are not stepped (e.g. uncontrollable devices that write their
+        state at startup, or a battery whose dispatch was taken from the stage cache)
+        are skipped in the timestep loop, the bound timeticks of all others are
+        cached. With a detailed timer of the host, the timetick of each component is
+        timed separately.
+        """
+        timer: SpanTimer = self.host.timer
+        for name, comp in self.components.items():
+            with timer.span(f"startup.{name}"):
+                comp.startup()
+
+        self.timeticks = tuple(
+            timer.wrap(f"timetick.{name}", comp.timetick)
+            if timer.detailed
+            else comp.timetick
+            for name, comp in self.components.items()
+            if comp.stepped()
+        )
+
+    def stepped(self) -> bool:
+        """Whether any component of the house has to be simulated step by step."""
+        return len(self.timeticks) > 0
 
     def shutdown(self) -> None:
         """Shutdown of the house and its components."""
         for comp in self.components.values():
             comp.shutdown()
 
-    def timetick(self) -> dict[str, Any]:
+    def timetick(self) -> None:
         """Simulates a single timestep of the house's components.
         First the baseload and the heating system are simulated to determine the
         electricity demand.
         Then the PV system is simulated to determine the electricity generation.
         Finally the battery is simulated to balance supply and demand.
+        The components write their state into the simulation state of the host,
+        which is written to the database by the host.
         """
-        for comp in self.components.values():
-            comp.timetick()
-
-        results: dict[str, Any] = self.get_results()
-
-        return results
-
-    def get_results(self) -> dict[str, Any]:
-        """Returns the results of the house's components for the current timestep.
-        The current state of each component is read from the smart meter and returned
-        as a dictionary.
-        These results are then converted to a ORM object and written to the database.
-        """
-        smart_meter: SmartMeter = self.components.get("smart_meter")
-        if not isinstance(smart_meter, SmartMeter):
-            raise TypeError("Expected 'smart_meter' to be of type 'SmartMeter'")
-        results: dict[str, Any] = smart_meter.get_measurements()
-
-        return results
+        for timetick in self.timeticks:
+            timetick()
@@ -1,8 +1,12 @@
 import logging
 from datetime import datetime
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional
 
+import numpy as np
 from components.core.entity import Entity
+from components.core.stage_cache import StageCache, StageOutputs, stage_key
+from components.core.state import StateRegistry
+from components.core.timing import SpanTimer
 from components.database.mongodb import pyMongoClient
 from pytz import timezone
 
@@ -17,15 +21,22 @@ class SimHost:
     - Saving the results to the database.
     """
 
-    def __init__(self, sim_settings: dict[str, Any], db_client: pyMongoClient) -> None:
+    def __init__(
+        self,
+        sim_settings: dict[str, Any],
+        db_client: pyMongoClient,
+        timer: Optional[SpanTimer] = None,
+    ) -> None:
         """Initializes a new instance of the SimHost class.
 
         Args:
             sim_settings (dict): Simulation settings
             db_client (pyMongoClient): MongoDB database client
+            timer (SpanTimer, optional): Timer for the phases of the simulation
 
         """
         self.db_client: pyMongoClient = db_client  # MongoDB database client
+        self.timer: SpanTimer = timer or SpanTimer()  # Timing spans of the phases
 
         # self.model_name = sim_settings["model_name"]
         self.timebase: int = int(sim_settings["timebase"])  # Timebase in seconds
@@ -40,31 +51,56 @@ class SimHost:
         self.current_timestep: int  # Current timestep
 
         self.house: Entity  # House object being simulated
-
-        # Current state of simulation environment
-        self.env_state: dict[str, Optional[Union[float, int]]] = {
-            "time": None,  # Time of the simulation
-            "T_amb": None,  # Ambient temperature [K]
-            "P_solar": None,  # Solar irradiance [kW/m2]
-        }
+        self.house_timetick: Callable[[], None]  # Timetick of the house
+
+        # State of the simulation: components register their state variables and
+        # write them into the preallocated record array (timesteps x variables)
+        self.state: StateRegistry = StateRegistry(self.timesteps)
+        # State of simulation environment
+        self.state.register(
+            "time",  # Time of the simulation
+            "T_amb",  # Ambient temperature [K]
+            "P_solar",  # Solar irradiance [kW/m2]
+        )
+        # Number of timesteps already written to the database
+        self.results_written: int = 0
+
+        # Cache of the stage outputs (set by SimBuilder), None to compute all stages
+        self.stages: Optional[StageCache] = None
+        # Keys of the stages that have run, None for stages that can't be cached
+        self.stage_keys: dict[str, Optional[str]] = {}
 
         # self.weather_data_path = None  # Path to the weather data file
-        self.T_amb: list[float]
-        self.P_solar: list[float]
+        # Weather data resampled to the timebase (set by SimBuilder)
+        self.T_amb: np.ndarray
+        self.P_solar: np.ndarray
 
     def startup(self) -> None:
         """Startup of the host:
         - Initializes the current time.
+        - Allocates the simulation state and sets the state of the environment.
         - Starts up the house.
         """
         self.current_time = self.start_time
+        self.results_written = 0
+
+        self.state.allocate()
+        self.state.column("time")[:] = (
+            self.start_time + np.arange(self.timesteps) * self.timebase
+        )
+        self.state.column("T_amb")[:] = self.T_amb[: self.timesteps]
+        self.state.column("P_solar")[:] = self.P_solar[: self.timesteps]
+
         self.house.startup()
+        self.house_timetick = self.house.timetick
 
     def shutdown(self) -> None:
         """Shutdown of the host:
+        - Saves the remaining results to the database.
         - Shuts down the database.
         - Shuts down the house.
         """
+        self.save_results(self.timesteps)
         self.db_client.shutdown()
         self.house.shutdown()
 
@@ -81,36 +117,99 @@ class SimHost:
         - Perfroms timetick for each timestep in the simulation.
         - Shuts down the host.
         """
-        self.startup()
-        logger.info(f"Running simulation with {self.timesteps} timesteps.\n")
-        for t in range(self.timesteps):
-            self.current_timestep = t
-            self.timetick(t)
+        with self.timer.span("startup"):
+            self.startup()
+
+        if self.house.stepped():
+            logger.info(f"Running simulation with {self.timesteps} timesteps.\n")
+            timetick: Callable[[int], None] = self.timetick
+            with self.timer.span("timestep_loop"):
+                for t in range(self.timesteps):
+                    self.current_timestep = t
+                    timetick(t)
+        else:
+            # All states are known after startup, e.g. from the stage cache
+            logger.info("All states known at startup, skipping timestep loop.\n")
+            while self.results_written < self.timesteps:
+                stop: int = self.results_written + self.db_client.batch_size
+                self.save_results(min(stop, self.timesteps))
 
         logger.info("Simulation finished successfully.")
-        self.shutdown()
+        with self.timer.span("shutdown"):
+            self.shutdown()
 
     def timetick(self, t: int) -> None:
         """Performs a timetick for the current timestep.
-        - Updates the state of the simulation environment, i.e. time, ambient
-        temperature and solar irradiance
         - Triggers the house to perform a timetick
-        - Saves the results of the house to the database
+        - Saves the results of the house to the database once a batch is complete
         - Updates the current time.
         """
-        self.updateState(t)
-        results: dict[str, Any] = self.house.timetick()
-        self.save_results(results)
+        self.house_timetick()
+        if t + 1 - self.results_written >= self.db_client.batch_size:
+            self.save_results(t + 1)
         self.current_time += self.timebase
 
-    def updateState(self, t: int) -> None:
-        """Updates the state of the simulation environment."""
-        self.env_state = {
-            "time": self.current_time,
-            "T_amb": self.T_amb[t],
-            "P_solar": self.P_solar[t],
-        }
-
-    def save_results(self, results: dict[str, Any]) -> None:
-        """Saves the results of the house to the database."""
-        self.db_client.write_timeseries_data_to_db(results)
+    def stage_key(
+        self, name: str, inputs: dict[str, Any], upstream: tuple[str, ...] = ()
+    ) -> Optional[str]:
+        """Key of a stage of the simulation, see StageCache. The key is recorded for
+        the downstream stages. A stage can only be cached if all its upstream stages
+        were cached.
+
+        Args:
+            name (str): Name of the stage
+            inputs (dict): Inputs of the stage, JSON serialisable
+            upstream (tuple): Names of the upstream stages the stage reads from
+
+        Returns:
+            str, optional: Key of the stage, None if it can't be cached
+
+        """
+        upstream_keys: list[Optional[str]] = [self.stage_keys.get(u) for u in upstream]
+        key: Optional[str] = None
+        if self.stages is not None and None not in upstream_keys:
+            key = stage_key(name, inputs, [str(k) for k in upstream_keys])
+        self.stage_keys[name] = key
+        return key
+
+    def run_stage(
+        self,
+        name: str,
+        func: Callable[[], StageOutputs],
+        inputs: dict[str, Any],
+        upstream: tuple[str, ...] = (),
+        persist: bool = True,
+    ) -> StageOutputs:
+        """Run a stage of the simulation, or reuse its outputs from the stage cache.
+
+        Args:
+            name (str): Name of the stage
+            func (Callable): Computes the outputs of the stage
+            inputs (dict): Inputs of the stage, JSON serialisable
+            upstream (tuple): Names of the upstream stages the stage reads from
+            persist (bool): Store the outputs in the cache. Stages that are cheaper
+                to compute than to load are only keyed for the downstream stages.
+
+        Returns:
+            StageOutputs: Arrays by name
+
+        """
+        key: Optional[str] = self.stage_key(name, inputs, upstream)
+        if key is None or not persist or self.stages is None:
+            return func()
+        return self.stages.compute(name, key, func)
+
+    def save_results(self, stop: int) -> None:
+        """Saves the results of all timesteps up to stop that have not been written
+        yet to the database.
+
+        Args:
+            stop (int): Timestep up to which results are saved (exclusive)
+
+        """
+        if stop > self.results_written:
+            with self.timer.span("db_flush"):
+                self.db_client.write_timeseries_data_to_db(
+                    self.state.data[self.results_written : stop]
+                )
+            self.results_written = stop
@@ -1,10 +1,14 @@
 import argparse
+import cProfile
 import importlib
 import json
 import logging
 import os
 import sys
 import time
+from typing import Any, Callable, Optional
+
+from components.core.timing import SpanTimer
 
 # from components.host.sim_host import SimHost
 # from sim_builder import SimBuilder
@@ -19,13 +23,14 @@ logging.basicConfig(
 logger: logging.Logger = logging.getLogger(LOGGERNAME)
 
 
-def build_and_run_simulation(sim_id: str, model_id: str) -> None:
+def build_and_run_simulation(sim_id: str, model_id: str, timer: SpanTimer) -> None:
     """Build and run the simulation: load the simulation builder, build the simulation,
     and start the simulation.
 
     Args:
         sim_id (str): id of simulation doc in db
         model_id (str): id of model specs doc in db
+        timer (SpanTimer): timer for the phases of the simulation
 
     """
     # Load sim_builder
@@ -36,11 +41,70 @@ def build_and_run_simulation(sim_id: str, model_id: str) -> None:
         sys.exit(1)
 
     # Build simulation
-    builder = sim_builder.SimBuilder(sim_id, model_id)
-    sim = builder.build_simulation()
+    with timer.span("build_simulation"):
+        builder = sim_builder.SimBuilder(sim_id, model_id, timer=timer)
+        sim = builder.build_simulation()
 
     # Start simulation
-    sim.run_simulation()
+    with timer.span("run_simulation"):
+        sim.run_simulation()
+
+
+def sync_profile_store() -> None:
+    """Sync the local profile store with the newest dataset version in the database,
+    so the next simulation reads its load profile from the store. Called at startup
+    of the API to warm up the store.
+    """
+    from components.database.mongodb import pyMongoClient
+    from components.database.profile_store import get_profile_store
+
+    db_client: pyMongoClient = pyMongoClient()
+    try:
+        get_profile_store().sync(db_client, force=True)
+    finally:
+        db_client.shutdown()
+
+
+def run_with_profiler(
+    profiler: Optional[str], profile_out: Optional[str], func: Callable[[], Any]
+) -> None:
+    """Run a function, optionally with cProfile or pyinstrument, and write the
+    profile to a file.
+
+    Args:
+        profiler (str, optional): "cprofile", "pyinstrument" or None
+        profile_out (str, optional): path of the profile output file
+        func (Callable): function to run
+
+    """
+    if profiler == "cprofile":
+        profile_path: str = profile_out or "ferntree.prof"
+        cprofiler: cProfile.Profile = cProfile.Profile()
+        cprofiler.runcall(func)
+        cprofiler.dump_stats(profile_path)
+        logger.info(f"cProfile stats written to {profile_path}")
+
+    elif profiler == "pyinstrument":
+        try:
+            pyinstrument = importlib.import_module("pyinstrument")
+        except ImportError:
+            logger.error("pyinstrument is not installed, running without profiler.")
+            func()
+            return
+
+        profile_path = profile_out or "ferntree_profile.html"
+        sampler = pyinstrument.Profiler()
+        sampler.start()
+        try:
+            func()
+        finally:
+            sampler.stop()
+            with open(profile_path, "w") as f:
+                f.write(sampler.output_html())
+        logger.info(f"pyinstrument profile written to {profile_path}")
+
+    else:
+        func()
 
 
 if __name__ == "__main__":
@@ -50,13 +114,32 @@ if __name__ == "__main__":
 
     # Parse command-line arguments
     parser: argparse.ArgumentParser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--model_id", help="id of model specs doc in db")
+    parser.add_argument("-s", "--sim_id", help="id of simulation doc in db")
+    parser.add_argument(
+        "--sync-profiles",
+        action="store_true",
+        help="only sync the local profile store with the database and exit",
+    )
     parser.add_argument(
-        "-m", "--model_id", help="id of model specs doc in db", required=True
+        "--metrics",
+        help="write timing spans of all phases (incl. per-component timeticks) "
+        "as JSON to this file",
     )
     parser.add_argument(
-        "-s", "--sim_id", help="id of simulation doc in db", required=True
+        "--profile",
+        choices=["cprofile", "pyinstrument"],
+        help="profile the simulation run",
     )
+    parser.add_argument("--profile-out", help="path of the profile output file")
     args: argparse.Namespace = parser.parse_args()
+
+    if args.sync_profiles:
+        sync_profile_store()
+        sys.exit(0)
+    if args.model_id is None or args.sim_id is None:
+        parser.error("the following arguments are required: -m/--model_id, -s/--sim_id")
+
     model_id: str = args.model_id
     sim_id: str = args.sim_id
 
@@ -84,10 +167,18 @@ if __name__ == "__main__":
     logger.info("")
 
     # Build and run the simulation
+    timer: SpanTimer = SpanTimer(detailed=args.metrics is not None)
     start_time: float = time.time()
-    build_and_run_simulation(sim_id, model_id)
+    run_with_profiler(
+        args.profile,
+        args.profile_out,
+        lambda: build_and_run_simulation(sim_id, model_id, timer),
+    )
     end_time: float = time.time()
 
     logger.info("")
+    timer.log_summary()
+    if args.metrics:
+        timer.dump(args.metrics)
     logger.info(f"Simulation execution time: {(end_time - start_time):.2f} seconds.")
     logger.info("")
@@ -1,8 +1,13 @@
 import logging
-from typing import Any
+from typing import Any, Optional
 
+import numpy as np
+from components.core.resample import resample_cached
+from components.core.stage_cache import StageOutputs, array_digest, get_stage_cache
+from components.core.timing import SpanTimer
 from components.ctrl.battery_ctrl import BatteryCtrl
 from components.database.mongodb import pyMongoClient
+from components.database.profile_store import ProfileStore, get_profile_store
 from components.dev.baseload import BaseLoad
 from components.dev.battery_dev import BatteryDev
 from components.dev.pv_sys import PVSys
@@ -19,25 +24,90 @@ class SimBuilder:
     baseload, PV system, and battery.
     """
 
-    def __init__(self, sim_id: str, model_id: str) -> None:
+    def __init__(
+        self,
+        sim_id: str,
+        model_id: str,
+        db_client: Optional[pyMongoClient] = None,
+        timer: Optional[SpanTimer] = None,
+        stage_cache: bool = True,
+    ) -> None:
         """Initialize the simulation builder.
 
         Args:
             sim_id (str): id of simulation doc in db
             model_id (str): id of model doc in db
+            db_client (pyMongoClient, optional): database client to use instead of
+                connecting to the database (e.g. a local client for benchmarks)
+            timer (SpanTimer, optional): Timer for the phases of the simulation
+            stage_cache (bool): Reuse the outputs of stages whose inputs didn't change
+                since an earlier simulation, see StageCache
 
         """
+        self.timer: SpanTimer = timer or SpanTimer()
+
         # Connect to database
-        self.db_client: pyMongoClient = pyMongoClient(sim_id, model_id)
+        with self.timer.span("db_connect"):
+            self.db_client: pyMongoClient = db_client or pyMongoClient(sim_id, model_id)
 
         # Load simulation config from database
-        sim_config: dict[str, Any] = self.db_client.load_config()
+        with self.timer.span("config_load"):
+            sim_config: dict[str, Any] = self.db_client.load_config()
         self.system_settings: dict[str, Any] = sim_config["system_settings"]
 
         # Set up simulation host
-        self.sim: SimHost = SimHost(sim_config, self.db_client)
-        self.sim.T_amb = sim_config["T_amb"]
-        self.sim.P_solar = sim_config["G_i"]
+        self.sim: SimHost = SimHost(sim_config, self.db_client, self.timer)
+        if stage_cache:
+            self.sim.stages = get_stage_cache()
+
+        # Resample weather data of one year (e.g. hourly PVGIS data) to the timebase
+        T_amb: np.ndarray = np.asarray(sim_config["T_amb"], dtype=np.float64)
+        G_i: np.ndarray = np.asarray(sim_config["G_i"], dtype=np.float64)
+
+        def resample_weather() -> StageOutputs:
+            return {
+                "T_amb": resample_cached(T_amb, self.sim.timebase, "linear"),
+                "P_solar": resample_cached(G_i, self.sim.timebase, "energy"),
+            }
+
+        weather: StageOutputs = self.sim.run_stage(
+            "weather",
+            resample_weather,
+            {
+                "T_amb": array_digest(T_amb),
+                "G_i": array_digest(G_i),
+                "timebase": self.sim.timebase,
+            },
+        )
+        self.sim.T_amb = weather["T_amb"]
+        self.sim.P_solar = weather["P_solar"]
+
+    def get_load_profile(self, profile_id: int) -> tuple[np.ndarray, Optional[str]]:
+        """Get the load profile for the baseload from the local profile store,
+        which is synced from the database when a new dataset version is published.
+        Falls back to the database if the profile is not in the store. The profile
+        is resampled to the timebase of the simulation by the baseload.
+
+        Args:
+            profile_id (int): id of load profile
+
+        Returns:
+            tuple: Normalised load profile and its source (dataset version and id),
+            None if the profile was fetched from the database
+
+        """
+        store: ProfileStore = get_profile_store()
+        try:
+            store.sync(self.db_client)
+        except OSError as e:
+            logger.warning(f"Failed to sync local profile store: {e}")
+
+        load_profile: Optional[np.ndarray] = store.get(profile_id)
+        if load_profile is None:
+            logger.info(f"Load profile {profile_id} not in local store.")
+            return self.db_client.get_load_profile(profile_id), None
+
+        return load_profile, f"{store.version(profile_id)}:{profile_id}"
 
     def build_simulation(self) -> SimHost:
         """Build the simulation based on the model specifications.
@@ -56,13 +126,14 @@ class SimBuilder:
 
             # Create baseload
             if self.system_settings["baseload"]:
-                # Get load profile for baseload from database
-                load_profile: list[float] = self.db_client.get_load_profile(
-                    int(self.system_settings["baseload"]["profile_id"])
-                )
+                # Get load profile for baseload from local store or database
+                with self.timer.span("load_profile_fetch"):
+                    load_profile, source = self.get_load_profile(
+                        int(self.system_settings["baseload"]["profile_id"])
+                    )
                 # Create baseload device
                 bl: BaseLoad = BaseLoad(
-                    self.sim, self.system_settings["baseload"], load_profile
+                    self.sim, self.system_settings["baseload"], load_profile, source
                 )
                 house.add_component(bl, "baseload")
                 logger.info("Baseload added to the house.")
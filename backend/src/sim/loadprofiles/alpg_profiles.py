@@ -1,113 +1,187 @@
+import argparse
 import os
-import random
-from typing import Hashable, Union
 
-import certifi
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-from dotenv import load_dotenv
-from pymongo import MongoClient
-from pymongo.collection import Collection
-from pymongo.database import Database
-from pymongo.results import InsertManyResult
-from pymongo.server_api import ServerApi
-
-# Load dataset
-file_path = os.path.abspath(__file__)
-
-csv_name = "Electricity_Profile.csv"
-data_dir = os.path.join(os.path.dirname(file_path), "data", "alpg", csv_name)
-df_profiles = pd.read_csv(data_dir, delimiter=";", header=None)
-df_profiles.columns = pd.Index([f"{i}" for i in range(df_profiles.shape[1])])
-
-timestamp = pd.date_range(start="2023-01-01", end="2024-01-01", freq="min")[:-1]
-df_profiles.index = pd.Index(timestamp)
-
-# Get average profile
-df_profiles["mean_profile"] = df_profiles.mean(axis=1)
-
-# Resample to 1h
-df_profiles = df_profiles.resample("1h").mean()
-
-# Make every profile the mean of the profile and the mean profile
-for i in range(df_profiles.shape[1] - 1):
-    df_profiles[str(i)] = (df_profiles[str(i)] + df_profiles["mean_profile"]) / 2
-
-# Convert to kW
-df_profiles = df_profiles / 1000
-
-# Scale profiles to 1 kWh annual consumption
-annual_consumption = df_profiles.sum(axis=0)
-df_profiles = df_profiles.div(annual_consumption, axis=1)
-
+from pipeline_store import ArtifactStore, fingerprint
+from profile_publisher import DTYPE, publish_profiles_to_db
+
+# Timebase of the ALPG dataset in seconds
+ALPG_TIMEBASE = 60
+# Artifact of the ALPG stage: normalised annual profiles with shape (profiles,
+# timesteps), their annual consumption before normalisation and the mean profile
+ALPG_LOADPROFILES = "gold/alpg_loadprofiles"
+# Record of the ALPG profiles published to the database, has no columns
+PUBLISHED_ALPG_PROFILES = "gold/alpg_published"
+
+
+def alpg_file(data_dir: str) -> str:
+    """Path of the ALPG electricity profiles."""
+    return os.path.join(data_dir, "alpg", "Electricity_Profile.csv")
+
+
+def resample_profiles(
+    profiles: np.ndarray, timebase: int, source_timebase: int = ALPG_TIMEBASE
+) -> np.ndarray:
+    """Resample profiles to a coarser timebase by averaging the power of all
+    timesteps in an interval. The timesteps are reshaped to (intervals, timesteps
+    per interval, profiles) and averaged over the second axis.
+
+    Args:
+        profiles (np.ndarray): Power of the profiles with shape (timesteps, profiles)
+        timebase (int): Target timebase in seconds
+        source_timebase (int): Timebase of the profiles in seconds
+
+    Returns:
+        np.ndarray: Resampled profiles with shape (intervals, profiles)
+
+    Raises:
+        ValueError: If the target timebase is not a multiple of the source timebase
+            or doesn't divide the profiles into full intervals
+
+    """
+    if timebase % source_timebase != 0:
+        raise ValueError(
+            f"Timebase {timebase}s is not a multiple of {source_timebase}s."
+        )
+    steps = timebase // source_timebase
+    if len(profiles) % steps != 0:
+        raise ValueError(
+            f"{len(profiles)} timesteps can't be resampled to timebase {timebase}s."
+        )
+    return profiles.reshape(-1, steps, profiles.shape[1]).mean(axis=1)
+
+
+def create_alpg_profiles(
+    data_dir: str, timebase: int = 60 * 60, force: bool = False
+) -> None:
+    """Create normalised annual load profiles from the ALPG electricity profiles.
+    The profiles are resampled to the timebase and each profile is blended with
+    the mean profile of all houses to make it less peaky. The stage is skipped if
+    the dataset and the timebase haven't changed.
+
+    Args:
+        data_dir (str): Path to data directory
+        timebase (int): Timebase of the profiles in seconds
+        force (bool): Create the profiles even if they are up to date
+
+    """
+    print("\nALPG: Create annual load profiles")
+    store = ArtifactStore(data_dir)
+    csv_path = alpg_file(data_dir)
+    params = {"timebase": timebase}
+    inputs = {"alpg": store.hash_files([csv_path])}
+    stage_fingerprint = fingerprint(inputs, params)
+    if not force and store.is_fresh(ALPG_LOADPROFILES, stage_fingerprint):
+        print(f"ALPG load profiles in {ALPG_LOADPROFILES} are up to date.")
+        return
+
+    # Load dataset: power in W with shape (minutes of the year, profiles)
+    profiles = pd.read_csv(
+        csv_path, delimiter=";", header=None, dtype=np.float64
+    ).to_numpy()
+
+    # Resample to timebase and convert to kW
+    profiles = resample_profiles(profiles, timebase) / 1000
+
+    # Make every profile the mean of the profile and the mean profile
+    mean_profile = profiles.mean(axis=1)
+    profiles = (profiles + mean_profile[:, np.newaxis]) / 2
+
+    # Scale profiles to 1kWh annual consumption
+    annual_consumption = profiles.sum(axis=0) * timebase / (60 * 60)
+    profiles = (profiles / annual_consumption).T
+    mean_profile /= mean_profile.sum() * timebase / (60 * 60)
+
+    provenance = {"stage": "alpg", "inputs": inputs, "params": params}
+    with store.write(ALPG_LOADPROFILES, stage_fingerprint, provenance) as artifact:
+        artifact.save_column("profiles", profiles)
+        artifact.save_column("annual_consumption", annual_consumption)
+        artifact.save_column("mean_profile", mean_profile)
+    print(f"ALPG load profiles saved to {ALPG_LOADPROFILES}")
+    print(f"Timesteps: {profiles.shape[1]}, Num. profiles: {profiles.shape[0]}")
+
+
+def publish_alpg_profiles(
+    data_dir: str, timebase: int = 60 * 60, force: bool = False
+) -> None:
+    """Write the ALPG load profiles to the database. Their profile IDs start at the
+    ALPG offset, so they don't overwrite the generated profiles. The stage is
+    skipped if the same profiles have already been published.
+
+    Args:
+        data_dir (str): Path to data directory
+        timebase (int): Timebase of the profiles in seconds
+        force (bool): Publish the profiles even if they have already been published
+
+    """
+    print("\nALPG: Write load profiles to database")
+    store = ArtifactStore(data_dir)
+    content_hash = store.content_hash(ALPG_LOADPROFILES)
+    inputs = {ALPG_LOADPROFILES: content_hash}
+    params = {"timebase": timebase, "dtype": DTYPE}
+    stage_fingerprint = fingerprint(inputs, params)
+    if not force and store.is_fresh(PUBLISHED_ALPG_PROFILES, stage_fingerprint):
+        print(f"ALPG load profiles in {ALPG_LOADPROFILES} already published.")
+        return
+
+    profiles = store.read(ALPG_LOADPROFILES, ["profiles"])["profiles"]
+    publish_profiles_to_db(profiles, "alpg", f"alpg-{content_hash[:16]}", timebase)
+
+    # Record the published profiles
+    provenance = {"stage": "alpg-publish", "inputs": inputs, "params": params}
+    with store.write(PUBLISHED_ALPG_PROFILES, stage_fingerprint, provenance):
+        pass
+
+
+def plot_profiles(data_dir: str, timebase: int) -> None:
+    """Plot 5 ALPG load profiles and the mean profile for two random days."""
+    import matplotlib.pyplot as plt
+
+    store = ArtifactStore(data_dir)
+    columns = store.read(ALPG_LOADPROFILES, ["profiles", "mean_profile"])
+
+    timesteps_per_day = 24 * 60 * 60 // timebase
+    rng = np.random.default_rng()
+    start = int(rng.integers(0, 360)) * timesteps_per_day
+    window = slice(start, start + 2 * timesteps_per_day)
 
-def plot_profiles(df_profiles: pd.DataFrame) -> None:
-    """Plot load profiles for two random days."""
-    # Plot load profiles for two random days
     plt.figure(figsize=(30, 5))
     plt.title("Load Profiles")
-
-    rand_int = random.randint(0, 360)
-
-    for i in range(5):
-        plt.plot(
-            df_profiles[f"{i}"].iloc[24 * rand_int : 24 * (rand_int + 2)],
-            label=f"Profile {i}",
-        )
-
-    plt.plot(
-        df_profiles["mean_profile"].iloc[24 * rand_int : 24 * (rand_int + 2)],
-        label="Mean Profile",
-        color="black",
-    )
-    plt.xlabel("Time [h]")
+    for i in range(min(5, len(columns["profiles"]))):
+        plt.plot(columns["profiles"][i, window], label=f"Profile {i}")
+    plt.plot(columns["mean_profile"][window], label="Mean Profile", color="black")
+    plt.xlabel("Timestep")
     plt.ylabel("Power [kW]")
     plt.legend()
     plt.grid()
     plt.show()
 
 
-def write_profiles_to_db(df_profiles: pd.DataFrame) -> None:
-    """Write generated annual load profiles to MongoDB database."""
-    # Write generated annual load profiles to MongoDB database
-    # Use certifi to get the path of the CA file
-    ca: str = certifi.where()
-
-    # Load config from .env file:
-    scipt_dir: str = os.path.dirname(os.path.abspath(__file__))
-    env_path: str = os.path.join(scipt_dir, "../../.env")
-    load_dotenv(env_path)
-    MONGODB_URI: str = os.environ["MONGODB_URI"]
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
 
-    client: MongoClient = MongoClient(
-        MONGODB_URI, server_api=ServerApi("1"), tlsCAFile=ca
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Create normalised annual load profiles from the ALPG dataset."
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(script_dir, "data"),
+        help="path to data directory",
+    )
+    parser.add_argument(
+        "--timebase", type=int, default=60 * 60, help="timebase in seconds"
+    )
+    parser.add_argument("--force", action="store_true", help="recompute profiles")
+    parser.add_argument(
+        "--publish", action="store_true", help="write profiles to database"
     )
-    db: Database = client["ferntree_db"]
-    collection: Collection = db["loadprofiles"]
-
-    # Convert dataframe to dictionary
-    profiles_dict: dict[Hashable, list[float]] = df_profiles.to_dict(orient="list")
-
-    # Write each profile as a separate document to database
-    profile_docs: list[dict[str, Union[str, int, list[float]]]] = [
-        {
-            "type": "normalised annual loadprofile",
-            "profile_id": int(str(profile_id)),
-            "load_profile": profile,
-        }
-        for profile_id, profile in profiles_dict.items()
-    ]
-    doc_ids: InsertManyResult = collection.insert_many(profile_docs)
-    # Create an index on the 'profile_id' field
-    collection.create_index("profile_id")
-
-    if doc_ids:
-        print("Generated annual load profiles written to MongoDB database.")
-    else:
-        print("Error writing annual load profiles to MongoDB database.")
-
-    client.close()
-
-
-plot_profiles(df_profiles)
-write_profiles_to_db(df_profiles.drop(columns="mean_profile"))
+    parser.add_argument("--plot", action="store_true", help="plot profiles")
+    args = parser.parse_args()
+
+    create_alpg_profiles(args.data_dir, args.timebase, args.force)
+    if args.publish:
+        publish_alpg_profiles(args.data_dir, args.timebase, args.force)
+    if args.plot:
+        plot_profiles(args.data_dir, args.timebase)
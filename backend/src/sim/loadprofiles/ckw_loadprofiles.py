@@ -1,92 +1,165 @@
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-
-# Load dataset
-file_path = os.path.abspath(__file__)
-
-year = 2023
-months = range(1, 2)
-
-df_year = pd.DataFrame()
-
-for month in months:
-    # Load dataset
+from pipeline_store import ArtifactStore, fingerprint
+
+# Columns of the CKW smart meter dataset and their data types
+CKW_COLUMNS = ["area_code", "timestamp", "value_kwh", "num_meter"]
+CKW_DTYPES = {
+    "area_code": "category",
+    "timestamp": "string",
+    "value_kwh": "float64",
+    "num_meter": "float64",
+}
+# Local timezone of the dataset, intervals are aggregated in local time
+TIMEZONE = "Europe/Zurich"
+# Number of rows read at once from a monthly CSV file
+CHUNK_SIZE = 1_000_000
+
+
+def ckw_dataset(year: int) -> str:
+    """Artifact of the CKW stage for a year: normalised profile of each area code
+    with shape (areas, timesteps), their area codes, annual consumption and the
+    normalised profile of all areas.
+    """
+    return f"gold/ckw_loadprofiles_{year}"
+
+
+def ckw_file(data_dir: str, year: int, month: int) -> str:
+    """Path of the CKW open data CSV file of a month."""
     csv_name = f"ckw_opendata_smartmeter_dataset_b_{year}{month:02d}.csv"
-    data_dir = os.path.join(os.path.dirname(file_path), "data", "ckw", csv_name)
-    df_month = pd.read_csv(data_dir)
-
-    area_codes = df_month["area_code"].unique()
-
-    plt.figure(figsize=(30, 5))
-
-    for area_code in area_codes:
-        df_area = df_month[df_month["area_code"] == area_code]
-        df_area.index = pd.to_datetime(df_area["timestamp"], utc=True)
-        df_area = df_area.sort_index()
-        df_area.index = pd.DatetimeIndex(df_area.index).tz_convert("Europe/Zurich")
-        df_area = df_area.resample("1h").sum()
-        df_area["power_kw"] = df_area["value_kwh"] / df_area["num_meter"]
-
-        # print("Number of rows: ", len(df_area))
-        # print(f"Max power_kw: {df_area["power_kw"].max():.2f} kW")
-        # print(f"Min power_kw: {df_area["power_kw"].min():.2f} kW")
-
-        plt.plot(df_area["power_kw"].iloc[: 24 * 2], label=area_code)
-
-    plt.xlabel("Time")
-    plt.ylabel("power_kw")
-    # plt.legend()
-    plt.grid()
-    plt.show()
-
-    # Group and sort by timestamp and sum up all value_kwh and num_meter
-    df_month = df_month.groupby("timestamp").sum()
-
-    # Convert timestamp index to datetime and drop column area_code
-    df_month.index = pd.to_datetime(df_month.index, utc=True)
-    df_month = df_month.sort_index()
-
-    # Resample to 1h
-    df_month = df_month.resample("1h").sum()
+    return os.path.join(data_dir, "ckw", csv_name)
+
+
+def aggregate_month(path: str, freq: str = "1h") -> pd.DataFrame:
+    """Read a monthly CSV file in chunks and sum value_kwh and num_meter per area
+    code and interval.
+
+    Args:
+        path (str): Path of the CSV file
+        freq (str): Interval of the aggregation
+
+    Returns:
+        pd.DataFrame: Sums indexed by area code and local timestamp
+
+    """
+    print(f"Processing data from {os.path.basename(path)}")
+    partials = []
+    for chunk in pd.read_csv(
+        path, usecols=CKW_COLUMNS, dtype=CKW_DTYPES, chunksize=CHUNK_SIZE
+    ):
+        chunk["timestamp"] = pd.to_datetime(
+            chunk["timestamp"], utc=True, format="ISO8601"
+        ).dt.tz_convert(TIMEZONE)
+        partials.append(
+            chunk.groupby(
+                ["area_code", pd.Grouper(key="timestamp", freq=freq)], observed=True
+            )[["value_kwh", "num_meter"]].sum()
+        )
+
+    # Intervals may be split across chunks
+    return pd.concat(partials).groupby(level=[0, 1], observed=True).sum()
+
+
+def ingest_ckw_year(
+    data_dir: str,
+    year: int = 2023,
+    timebase: int = 60 * 60,
+    workers: int = 12,
+    force: bool = False,
+) -> None:
+    """Ingest the CKW smart meter dataset of a year and create a normalised load
+    profile for each area code and for all areas together. The months are read in
+    parallel worker processes. The stage is skipped if the content of the CSV files
+    and the parameters haven't changed.
+
+    Args:
+        data_dir (str): Path to data directory
+        year (int): Year of the dataset
+        timebase (int): Timebase of the profiles in seconds
+        workers (int): Number of worker processes
+        force (bool): Ingest the dataset even if the profiles are up to date
+
+    """
+    print(f"\nCKW: Ingesting dataset {year}")
+    store = ArtifactStore(data_dir)
+    dataset = ckw_dataset(year)
+
+    paths = [ckw_file(data_dir, year, month) for month in range(1, 13)]
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        raise FileNotFoundError(f"Datasets {missing} do not exist!")
+
+    params = {"year": year, "timebase": timebase}
+    inputs = {"ckw": store.hash_files(paths)}
+    stage_fingerprint = fingerprint(inputs, params)
+    if not force and store.is_fresh(dataset, stage_fingerprint):
+        print(f"CKW load profiles in {dataset} are up to date.")
+        return
+
+    freq = f"{timebase}s"
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        months = list(pool.map(aggregate_month, paths, [freq] * len(paths)))
+    df = pd.concat(months).groupby(level=[0, 1], observed=True).sum()
+
+    # Sums of each area with shape (timesteps, areas)
+    value_kwh = df["value_kwh"].unstack(level=0)
+    num_meter = df["num_meter"].unstack(level=0)
+    time = pd.date_range(
+        value_kwh.index.min(), value_kwh.index.max(), freq=freq, tz=TIMEZONE
+    )
+    value_kwh = value_kwh.reindex(time).fillna(0.0)
+    num_meter = num_meter.reindex(time).fillna(0.0)
 
     # power_kw = value_kwh / num_meter
-    df_month["power_kw"] = df_month["value_kwh"] / df_month["num_meter"]
-
-    # Drop columns value_kwh, num_meter and area_code
-    df_month = df_month.drop(columns=["value_kwh", "num_meter", "area_code"])
-
-    # Append to df_year
-    df_year = pd.concat([df_year, df_month])
-
-    # Delete df_month
-    del df_month
-
-# Set timestamp from UTC to Europe/Zurich
-df_year.index = pd.DatetimeIndex(df_year.index).tz_convert("Europe/Zurich")
-
-
-# Scale profile to 3000kWh annual consumption
-annual_consumption = df_year["power_kw"].sum()
-df_year["power_kw"] = df_year["power_kw"] / annual_consumption * 3000
-
-# print(df_year.head())
-# print("Number of rows: ", len(df_year))
-
-# print(f"Max power_kw: {df_year["power_kw"].max():.2f} kW")
-# print(f"Min power_kw: {df_year["power_kw"].min():.2f} kW")
-# print(f"Annual consumption: {df_year["power_kw"].sum():.2f} kWh")
-
-# # Print min and max timestamp
-# print("Min timestamp: ", df_year.index.min())
-# print("Max timestamp: ", df_year.index.max())
-
-# Plot power_kw
-# rand_int = random.randint(0, 360)
-# plt.figure(figsize=(30, 5))
-# plt.plot(df_year["power_kw"].iloc[24 * rand_int:24 * (rand_int + 1)])
-# plt.xlabel("Time")
-# plt.ylabel("Power [kW]")
-# plt.grid()
-# plt.show()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        power = (value_kwh / num_meter).to_numpy().T
+        power_total = (value_kwh.sum(axis=1) / num_meter.sum(axis=1)).to_numpy()
+    power = np.nan_to_num(power, nan=0.0, posinf=0.0)
+    power_total = np.nan_to_num(power_total, nan=0.0, posinf=0.0)
+
+    # Scale profiles to 1 kWh annual consumption
+    annual_consumption = power.sum(axis=1) * timebase / (60 * 60)
+    scale = np.where(annual_consumption > 0, annual_consumption, 1.0)
+    profiles = power / scale[:, np.newaxis]
+    profile_total = power_total / (power_total.sum() * timebase / (60 * 60))
+
+    provenance = {"stage": "ckw", "inputs": inputs, "params": params}
+    with store.write(dataset, stage_fingerprint, provenance) as artifact:
+        artifact.save_column("time", time.as_unit("s").asi8)
+        artifact.save_column("area_code", np.asarray(value_kwh.columns, dtype=str))
+        artifact.save_column("profiles", profiles)
+        artifact.save_column("annual_consumption", annual_consumption)
+        artifact.save_column("profile_total", profile_total)
+
+    print(f"CKW load profiles saved to {dataset}")
+    print(f"Timesteps: {len(time)}, Areas: {len(profiles)}")
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Create normalised load profiles from the CKW open data "
+        "smart meter dataset."
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(script_dir, "data"),
+        help="path to data directory",
+    )
+    parser.add_argument("--year", type=int, default=2023, help="year of the dataset")
+    parser.add_argument(
+        "--timebase", type=int, default=60 * 60, help="timebase in seconds"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=12, help="number of worker processes"
+    )
+    parser.add_argument("--force", action="store_true", help="recompute profiles")
+    args = parser.parse_args()
+
+    ingest_ckw_year(args.data_dir, args.year, args.timebase, args.workers, args.force)
@@ -1,41 +1,141 @@
+import argparse
 import os
 
-import matplotlib.pyplot as plt
+import alpg_profiles as alpg
+import ckw_loadprofiles as ckw
 import pandas as pd
 import pipeline_bronze as bronze
 import pipeline_gold as gold
 import pipeline_silver as silver
+from pipeline_runner import Stage, matches, run_pipeline
+from pipeline_store import ArtifactStore
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 data_dir = os.path.join(script_dir, "data")
-silver_dir = os.path.join(script_dir, "data", "silver")
-gold_dir = os.path.join(script_dir, "data", "gold")
-
-# BRONZE
-# If necessary ingest bronze datasets to create silver dataset
-if not os.path.isfile(os.path.join(silver_dir, "loadprofiles_sorted.csv")):
-    bronze.ingest_datasets(data_dir, verbose=True)
-
-# SILVER
-# Timebase of dataset
-timebase = 60 * 60  # 60 minutes
-# Process silver dataset containing loadprofiles and determine statistical models
-# for season-days
-silver.create_season_day_models(data_dir, timebase)
-
-# GOLD
-# Generate annual load profiles for 100 houses
-n_profiles = 10
-gold.generate_annual_load_profiles(data_dir, n_profiles, timebase)
-
-
-# VALIDATION
-VALIDATION = True
-if VALIDATION:
+
+# Stages of the pipeline: bronze (per year) -> silver -> gold -> publish
+STAGES = ["bronze", "silver", "gold", "publish"]
+# Optional stages, only run if selected
+OPTIONAL_STAGES = ["ckw", "alpg", "alpg-publish"]
+
+
+def build_stages(
+    data_dir: str,
+    timebase: int,
+    n_profiles: int,
+    seed: int,
+    force: list[str],
+    verbose: bool = False,
+) -> dict[str, Stage]:
+    """Build the stages of the load profile pipeline.
+    Each stage is skipped if its inputs and parameters haven't changed, unless it
+    is forced.
+
+    Args:
+        data_dir (str): Path to data directory
+        timebase (int): Timebase of dataset and profiles in seconds
+        n_profiles (int): Number of annual profiles to generate
+        seed (int): Seed of the random number generator for reproducible profiles
+        force (list[str]): Names of the stages to recompute
+        verbose (bool): Print the data availability of each house
+
+    Returns:
+        dict[str, Stage]: Stages of the pipeline by name
+
+    """
+    stages: dict[str, Stage] = {}
+
+    # BRONZE
+    # Ingest bronze datasets of each year to create silver datasets
+    for year in bronze.YEARS:
+        name = f"bronze:{year}"
+        stages[name] = Stage(
+            name,
+            bronze.ingest_year,
+            [],
+            data_dir=data_dir,
+            year=year,
+            verbose=verbose,
+            force=matches(name, force),
+        )
+
+    # SILVER
+    # Process silver datasets containing loadprofiles and determine statistical
+    # models for season-days
+    stages["silver"] = Stage(
+        "silver",
+        silver.create_season_day_models,
+        [f"bronze:{year}" for year in bronze.YEARS],
+        data_dir=data_dir,
+        timebase=timebase,
+        force=matches("silver", force),
+    )
+
+    # GOLD
+    # Generate annual load profiles
+    stages["gold"] = Stage(
+        "gold",
+        gold.generate_annual_load_profiles,
+        ["silver"],
+        data_dir=data_dir,
+        n_profiles=n_profiles,
+        timebase=timebase,
+        seed=seed,
+        force=matches("gold", force),
+    )
+
+    # PUBLISH
+    # Write annual load profiles to database
+    stages["publish"] = Stage(
+        "publish",
+        gold.publish_profiles,
+        ["gold"],
+        data_dir=data_dir,
+        timebase=timebase,
+        force=matches("publish", force),
+    )
+
+    # CKW
+    # Ingest the CKW smart meter dataset to create normalised profiles per area
+    stages["ckw"] = Stage(
+        "ckw",
+        ckw.ingest_ckw_year,
+        [],
+        data_dir=data_dir,
+        timebase=timebase,
+        force=matches("ckw", force),
+    )
+
+    # ALPG
+    # Create profiles from the ALPG dataset and write them to database
+    stages["alpg"] = Stage(
+        "alpg",
+        alpg.create_alpg_profiles,
+        [],
+        data_dir=data_dir,
+        timebase=timebase,
+        force=matches("alpg", force),
+    )
+    stages["alpg-publish"] = Stage(
+        "alpg-publish",
+        alpg.publish_alpg_profiles,
+        ["alpg"],
+        data_dir=data_dir,
+        timebase=timebase,
+        force=matches("alpg-publish", force),
+    )
+
+    return stages
+
+
+def plot_profiles(data_dir: str, timebase: int) -> None:
+    """Plot a week of 5 generated annual load profiles for validation."""
+    import matplotlib.pyplot as plt
+
     # Load gold dataset
-    gold_data = os.path.join(gold_dir, "annual_loadprofiles_gen.csv")
-    df_profiles = pd.read_csv(gold_data)
-    df_profiles = df_profiles * 3000
+    store = ArtifactStore(data_dir)
+    profiles = store.read(gold.ANNUAL_LOADPROFILES, ["profiles"])["profiles"]
+    profiles = profiles * 3000
 
     # Plot 5 random annual load profiles
     plt.figure(figsize=(30, 5))
@@ -47,11 +147,12 @@ if VALIDATION:
         start="2023-01-01", periods=timesteps_per_year, freq=f"{timebase}s"
     )
 
-    day = 100 * 24
-    for i in range(5):
+    day = 100 * timesteps_per_day
+    week = 7 * timesteps_per_day
+    for i in range(min(5, len(profiles))):
         plt.plot(
-            time[day : day + 24 * 7],
-            df_profiles[f"{i}"].iloc[day : day + 24 * 7],
+            time[day : day + week],
+            profiles[i, day : day + week],
             label=f"Profile {i}",
         )
 
@@ -60,3 +161,60 @@ if VALIDATION:
     plt.legend()
     plt.grid()
     plt.show()
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Load profile pipeline: bronze -> silver -> gold -> publish. "
+        "Stages are skipped if their inputs and parameters haven't changed."
+    )
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        default=STAGES,
+        help="stages to run incl. their dependencies, e.g. 'gold' or 'bronze:2019' "
+        f"(default: {' '.join(STAGES)}, optional: {' '.join(OPTIONAL_STAGES)})",
+    )
+    parser.add_argument("--data-dir", default=data_dir, help="path to data directory")
+    parser.add_argument(
+        "--timebase", type=int, default=60 * 60, help="timebase in seconds"
+    )
+    parser.add_argument(
+        "--n-profiles", type=int, default=10, help="number of annual profiles"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=42, help="seed for reproducible profiles"
+    )
+    parser.add_argument(
+        "--force",
+        nargs="*",
+        help="recompute these stages even if up to date (all selected if empty)",
+    )
+    parser.add_argument(
+        "--no-deps",
+        action="store_true",
+        help="only run the given stages, assume their dependencies are done",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=min(len(bronze.YEARS), os.cpu_count() or 1),
+        help="number of worker processes for independent stages",
+    )
+    parser.add_argument("--plot", action="store_true", help="plot generated profiles")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # "--force" without stages recomputes all given stages
+    force = args.stages if args.force == [] else args.force or []
+
+    stages = build_stages(
+        args.data_dir, args.timebase, args.n_profiles, args.seed, force, args.verbose
+    )
+    run_pipeline(stages, args.stages, args.workers, with_deps=not args.no_deps)
+
+    # VALIDATION
+    if args.plot:
+        plot_profiles(args.data_dir, args.timebase)
@@ -1,115 +1,190 @@
 import os
 
 import h5py
-import pandas as pd
-
-
-def ingest_datasets(data_dir: str, verbose: bool = False) -> None:
-    """Ingest datasets from bronze to silver directory."""
-    print("\nBRONZE: Ingesting datasets")
-    # Directory of raw datasets (bronze)
-    bronze_dir = os.path.join(data_dir, "bronze")
-    if not os.path.exists(bronze_dir):
-        raise FileNotFoundError(f"Bronze directory '{bronze_dir}' does not exist!")
-
-    # Years for which data is available
-    years = ["2018", "2019", "2020"]
-
-    # Define column names present in data
-    cols = [
-        "time",
-        "S_1",
-        "S_2",
-        "S_3",
-        "S_TOT",
-        "P_1",
-        "P_2",
-        "P_3",
-        "P_TOT",
-        "P_TOT_WITH_PV",
-        "Q_1",
-        "Q_2",
-        "Q_3",
-        "Q_TOT",
-        "U_1",
-        "U_2",
-        "U_3",
-        "I_1",
-        "I_2",
-        "I_3",
-        "PF_1",
-        "PF_2",
-        "PF_3",
-    ]
-
-    # Get data from all datasets and store in dataframe
-    df = pd.DataFrame()
-    for year in years:
-        # Load the dataset for the current year
-        data_file = f"{year}_data_60min.hdf5"
-        if not os.path.isfile(os.path.join(bronze_dir, data_file)):
-            raise FileNotFoundError(f"Dataset '{data_file}' does not exist!")
-
-        print(f"Processing data from {data_file}")
-        with h5py.File(os.path.join(bronze_dir, data_file), "r") as f:
-            # Choose only houses without pv system
-            data = f["NO_PV"]
-
-            # Create dataframe for current year
-            df_year = pd.DataFrame()
-
-            # Iterate over all houses in the dataset
-            for house in data.keys():
-                # Get measurements from household meter
-                data_sfh = data[house]["HOUSEHOLD"]["table"]
-
-                # Convert list of tuples into list of lists
-                data_sfh = [list(row) for row in data_sfh]
-
-                # Create dataframe from list of lists
-                df_tmp = pd.DataFrame(data_sfh, columns=cols)
-
-                # Only care about time and S_TOT --> P_TOT are shit values!!!
-                # USE S_TOT, values make more sense and actually resemble profiles
-                # in paper
-                if False:
-                    df_tmp = df_tmp[["time", "P_TOT"]]
-                    # Rename P_TOT to P_{house}
-                    df_tmp.rename(columns={"P_TOT": f"P_{house}"}, inplace=True)
-                else:
-                    df_tmp = df_tmp[["time", "S_TOT"]]
-                    # # Multiply "S_TOT" with mean of "PF_1", "PF_2", "PF_3"
-                    # df_tmp["S_TOT"] = df_tmp["S_TOT"] * df_tmp[["PF_1", "PF_2", "PF_3"
-                    # ]].mean(axis=1)
-                    # # Drop columns "PF_1", "PF_2", "PF_3"
-                    # df_tmp = df_tmp.drop(["PF_1", "PF_2", "PF_3"], axis=1)
-                    # Rename P_TOT to P_{house}
-                    df_tmp.rename(columns={"S_TOT": f"P_{house}"}, inplace=True)
-
-                # If df_year is empty, set it to df_tmp, else merge the two dataframes
-                if df_year.empty:
-                    df_year = df_tmp
-                else:
-                    df_year = pd.merge(df_year, df_tmp, on="time", how="outer")
-
-                if verbose:
-                    # Percentage of missing P_TOT values
-                    availability = (
-                        1 - df_tmp[f"P_{house}"].isna().sum() / len(df_tmp)
-                    ) * 100
-                    print(f"{year} {house}: {availability:.2f}% data availability")
-
-            # Append df_year to df
-            df = pd.concat([df, df_year])
-
-    # Silver directory for dataset
-    silver_dir = os.path.join(data_dir, "silver")
-    # Create dir if not exist
-    if not os.path.exists(silver_dir):
-        os.makedirs(silver_dir)
-
-    # Save silver dataset containing preprocessed loadprofiles to csv
-    output_file = os.path.join(silver_dir, "loadprofiles_sorted.csv")
-    df.to_csv(output_file, index=False)
-    print("Silver dataset saved to silver/loadprofiles_sorted.csv")
-    print(f"Timesteps: {len(df)}, Houses: {len(df.columns)}")
+import numpy as np
+from pipeline_store import ArtifactStore, fingerprint
+
+# Years for which data is available
+YEARS = ["2018", "2019", "2020"]
+
+# Column names present in data
+COLUMNS = [
+    "time",
+    "S_1",
+    "S_2",
+    "S_3",
+    "S_TOT",
+    "P_1",
+    "P_2",
+    "P_3",
+    "P_TOT",
+    "P_TOT_WITH_PV",
+    "Q_1",
+    "Q_2",
+    "Q_3",
+    "Q_TOT",
+    "U_1",
+    "U_2",
+    "U_3",
+    "I_1",
+    "I_2",
+    "I_3",
+    "PF_1",
+    "PF_2",
+    "PF_3",
+]
+
+# Only care about time and S_TOT --> P_TOT are shit values!!!
+# USE S_TOT, values make more sense and actually resemble profiles in paper
+VALUE_COLUMN = "S_TOT"
+
+
+def year_dataset(year: str) -> str:
+    """Artifact of the bronze stage for a year: time and loadprofile column of each
+    house, e.g. "silver/loadprofiles_2018".
+    """
+    return f"silver/loadprofiles_{year}"
+
+
+def ingest_datasets(data_dir: str, verbose: bool = False, force: bool = False) -> None:
+    """Ingest datasets of all years from bronze to silver directory.
+
+    Args:
+        data_dir (str): Path to data directory
+        verbose (bool): Print the data availability of each house
+        force (bool): Ingest the datasets even if the silver datasets are up to date
+
+    """
+    for year in YEARS:
+        ingest_year(data_dir, year, verbose, force)
+
+
+def ingest_year(
+    data_dir: str, year: str, verbose: bool = False, force: bool = False
+) -> None:
+    """Ingest the dataset of a year from bronze to silver directory.
+    The dataset is streamed house by house: only the time and value fields are
+    read from the HDF5 tables and written directly into memory-mapped columns of the
+    silver dataset, aligned on a precomputed time index. The time index is the union
+    of the timestamps of all houses. The stage is skipped if the content of the raw
+    dataset hasn't changed.
+
+    Args:
+        data_dir (str): Path to data directory
+        year (str): Year of the dataset
+        verbose (bool): Print the data availability of each house
+        force (bool): Ingest the dataset even if the silver dataset is up to date
+
+    """
+    print(f"\nBRONZE: Ingesting dataset {year}")
+    store = ArtifactStore(data_dir)
+    dataset = year_dataset(year)
+    # Raw dataset (bronze)
+    data_file = os.path.join(data_dir, "bronze", f"{year}_data_60min.hdf5")
+    if not os.path.isfile(data_file):
+        # Raw datasets may be removed once they are ingested
+        if not force and store.exists(dataset):
+            print(f"Dataset '{data_file}' not found, using existing {dataset}")
+            return
+        raise FileNotFoundError(f"Dataset '{data_file}' does not exist!")
+
+    params = {"year": year, "value_column": VALUE_COLUMN}
+    inputs = {"bronze": store.hash_files([data_file])}
+    stage_fingerprint = fingerprint(inputs, params)
+    if not force and store.is_fresh(dataset, stage_fingerprint):
+        print(f"Silver dataset {dataset} is up to date.")
+        return
+
+    print(f"Processing data from {os.path.basename(data_file)}")
+    provenance = {"stage": "bronze", "inputs": inputs, "params": params}
+    with (
+        h5py.File(data_file, "r") as f,
+        store.write(dataset, stage_fingerprint, provenance) as artifact,
+    ):
+        # Choose only houses without pv system
+        data = f["NO_PV"]
+        houses = list(data.keys())
+
+        # First pass: time index as union of the timestamps of all houses
+        time_index = np.unique(
+            np.concatenate(
+                [
+                    read_fields(data[house]["HOUSEHOLD"]["table"], ["time"])["time"]
+                    for house in houses
+                ]
+            )
+        )
+        artifact.save_column("time", time_index)
+
+        # Second pass: write values of each house into its column
+        for house in houses:
+            rows = read_fields(
+                data[house]["HOUSEHOLD"]["table"], ["time", VALUE_COLUMN]
+            )
+            values = artifact.create_column(
+                f"P_{house}", (len(time_index),), fill=np.nan
+            )
+            values[np.searchsorted(time_index, rows["time"])] = rows[VALUE_COLUMN]
+            values.flush()
+            del values
+
+            if verbose:
+                # Percentage of missing values
+                availability = (
+                    1 - np.isnan(rows[VALUE_COLUMN]).sum() / len(rows)
+                ) * 100
+                print(f"{year} {house}: {availability:.2f}% data availability")
+
+    print(f"Silver dataset saved to {dataset}")
+    print(f"Timesteps: {len(time_index)}, Houses: {len(houses)}")
+
+
+def load_silver_dataset(
+    store: ArtifactStore, years: list[str]
+) -> tuple[np.ndarray, list[str], np.ndarray]:
+    """Load and concatenate the silver datasets of several years. Houses missing
+    in a year are NaN for that year.
+
+    Args:
+        store (ArtifactStore): Artifact store of the pipeline
+        years (list[str]): Years of the datasets
+
+    Returns:
+        tuple[np.ndarray, list[str], np.ndarray]: Timestamps in seconds, names of
+        the houses' columns and loadprofiles with shape (timesteps, houses)
+
+    """
+    datasets = [store.read(year_dataset(year)) for year in years]
+    houses: list[str] = []
+    for columns in datasets:
+        houses.extend(name for name in columns if name != "time" and name not in houses)
+
+    time = np.concatenate([columns["time"] for columns in datasets])
+    values = np.full((len(time), len(houses)), np.nan)
+    offset = 0
+    for columns in datasets:
+        n_rows = len(columns["time"])
+        for i, house in enumerate(houses):
+            if house in columns:
+                values[offset : offset + n_rows, i] = columns[house]
+        offset += n_rows
+
+    return time, houses, values
+
+
+def read_fields(table: h5py.Dataset, columns: list[str]) -> np.ndarray:
+    """Read only the given columns of a HDF5 table.
+    The fields of the table are matched to the columns by their position in COLUMNS.
+
+    Args:
+        table (h5py.Dataset): HDF5 table with a compound datatype
+        columns (list[str]): Names of the columns to read
+
+    Returns:
+        np.ndarray: Structured array with the given columns
+
+    """
+    fields = [table.dtype.names[COLUMNS.index(column)] for column in columns]
+    rows = table.fields(fields)[:]
+    rows.dtype.names = columns
+    return rows
@@ -1,14 +1,20 @@
-import os
+from typing import Optional
 
-import certifi
 import numpy as np
 import pandas as pd
-from dotenv import load_dotenv
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
+from pipeline_silver import SEASON_DAYS_MODELS
+from pipeline_store import ArtifactStore, fingerprint
+from profile_publisher import DTYPE, publish_profiles_to_db
+from season_days import SEASON_DAYS, season_day_index
 
 # from sqlalchemy import URL, create_engine
 
+# Artifact of the gold stage: normalised annual profiles with shape (profiles,
+# timesteps) and their annual consumption before normalisation
+ANNUAL_LOADPROFILES = "gold/annual_loadprofiles_gen"
+# Record of the profiles published to the database, has no columns
+PUBLISHED_PROFILES = "gold/published"
+
 # Generate yearly load profiles
 # - Create 100 profiles & get mean annual consumption of all (will be default value if
 # user does not specify)
@@ -22,198 +28,156 @@ from pymongo.server_api import ServerApi
 
 
 def generate_annual_load_profiles(
-    data_dir: str, n_profiles: int, timebase: int
+    data_dir: str,
+    n_profiles: int,
+    timebase: int,
+    seed: Optional[int] = None,
+    force: bool = False,
 ) -> None:
     """Generate annual load profiles for n houses. For each day of the year,
     a load profile is generated based on the season-day model. The daily profiles
-    are concatenated to an annual profile.
+    are concatenated to an annual profile. The stage is skipped if the season-day
+    models and the parameters haven't changed and a seed is given.
 
     Args:
         data_dir (str): Path to data directory
         n_profiles (int): Number of annual profiles to generate
         timebase (int): Timebase of profiles in seconds
+        seed (int, optional): Seed of the random number generator for reproducible
+            profiles
+        force (bool): Generate the profiles even if they are up to date
 
     """
     print("\nGOLD: Generate annual load profiles")
-    # Load models of season-days
-    season_days_path = os.path.join(data_dir, "gold", "season_days_models.csv")
-    df_season_days = pd.read_csv(season_days_path)
-
-    # Create dataframe for annual load profiles
-    df_profiles = pd.DataFrame()
+    store = ArtifactStore(data_dir)
+    params = {"n_profiles": n_profiles, "timebase": timebase, "seed": seed}
+    inputs = {SEASON_DAYS_MODELS: store.content_hash(SEASON_DAYS_MODELS)}
+    stage_fingerprint = fingerprint(inputs, params)
+    if (
+        not force
+        and seed is not None
+        and store.is_fresh(ANNUAL_LOADPROFILES, stage_fingerprint)
+    ):
+        print(f"Annual load profiles in {ANNUAL_LOADPROFILES} are up to date.")
+        return
 
-    # Create time series for one year
-    timesteps_per_day = 24 * 60 * 60 // timebase
-    timesteps_per_year = 365 * timesteps_per_day
-    time = pd.date_range(
-        start="2023-01-01", periods=timesteps_per_year, freq=f"{timebase}s"
-    )
+    # Load models of season-days
+    df_season_days = store.read_frame(SEASON_DAYS_MODELS)
 
     print(f"Generating annual load profiles for {n_profiles} houses...")
-    for n in range(n_profiles):
-        annual_profile: list[float] = []
-
-        if n % 10 == 0:
-            print(f"Generating profile #{n}...")
-
-        i = 0
-        # Generate daily profiles for respective season-days and concatenate to
-        # annual profile
-        while i < len(time):  # - timesteps_per_day:
-            # Get weekday and month of current row
-            month = time[i].month
-            weekday = time[i].weekday()
-
-            # Spring
-            if month in [3, 4, 5]:
-                if weekday < 5:  # Weekday
-                    season_day = "spring_weekday"
-                else:  # Weekend
-                    season_day = "spring_weekend"
-
-            # Summer
-            elif month in [6, 7, 8]:
-                if weekday < 5:  # Weekday
-                    season_day = "summer_weekday"
-                else:  # Weekend
-                    season_day = "summer_weekend"
-
-            # Autumn
-            elif month in [9, 10, 11]:
-                if weekday < 5:  # Weekday
-                    season_day = "autumn_weekday"
-                else:  # Weekend
-                    season_day = "autumn_weekend"
-
-            # Winter
-            else:
-                if weekday < 5:  # Weekday
-                    season_day = "winter_weekday"
-                else:  # Weekend
-                    season_day = "winter_weekend"
-
-            # Generate daily profile with the current season-day model
-            mean = df_season_days[f"{season_day}_mean"]
-            std = df_season_days[f"{season_day}_std"]
-            p5 = df_season_days[f"{season_day}_5th"]
-            p95 = df_season_days[f"{season_day}_95th"]
-            # p25 = df_season_days[f"{season_day}_25th"]
-            # p75 = df_season_days[f"{season_day}_75th"]
-
-            daily_profile = generate_daily_profile(mean, std, p5, p95)
-            # Concatenate daily profiles to annual profile
-            annual_profile.extend(daily_profile)
-
-            # Increase i by one day
-            i += timesteps_per_day
-
-        # Add annual profile to dataframe
-        df_profiles[f"{n}"] = annual_profile
-
     # Set power values to kW
-    df_profiles = df_profiles / 1e3
+    profiles = generate_profiles(df_season_days, n_profiles, timebase, seed) / 1e3
     # Calculate annual consumption for each profile
-    annual_consumption = df_profiles.sum(axis=0) * timebase / (60 * 60)
+    annual_consumption = profiles.sum(axis=1) * timebase / (60 * 60)
     # Scale annual profiles to 1kWh annual consumption
-    df_profiles = df_profiles.div(annual_consumption, axis=1)
+    profiles /= annual_consumption[:, np.newaxis]
 
     print("Annual consumption:")
     print(f"Mean: {annual_consumption.mean():.2f} kWh")
     print(f"Max: {annual_consumption.max():.2f} kWh")
     print(f"Min: {annual_consumption.min():.2f} kWh")
-    print(f"Scaled to 1kWh: {df_profiles.sum(axis=0).mean():.2f}")
+    print(f"Scaled to 1kWh: {profiles.sum(axis=1).mean():.2f}")
+
+    # Save generated annual profiles and their annual consumption
+    provenance = {"stage": "gold", "inputs": inputs, "params": params}
+    with store.write(ANNUAL_LOADPROFILES, stage_fingerprint, provenance) as artifact:
+        artifact.save_column("profiles", profiles)
+        artifact.save_column("annual_consumption", annual_consumption)
+    print(f"Generated annual load profiles saved to {ANNUAL_LOADPROFILES}")
+    print(f"Timesteps: {profiles.shape[1]}, Num. profiles: {profiles.shape[0]}")
+
+
+def generate_profiles(
+    df_season_days: pd.DataFrame,
+    n_profiles: int,
+    timebase: int,
+    seed: Optional[int] = None,
+    chunk_size: int = 256,
+) -> np.ndarray:
+    """Generate annual load profiles from the season-day models.
+    The models of the season-day of each day of the year are gathered into arrays
+    with shape (365, timesteps per day). Then the noise for a chunk of profiles is
+    drawn at once with shape (profiles, 365, timesteps per day). The profiles are
+    normally distributed around the mean with half the standard deviation to make
+    them smoother, truncated to the 5th and 95th percentile (at least 0).
 
-    # Save annual consumption to csv
-    output_file = os.path.join(data_dir, "gold", "annual_consumption_gen.csv")
-    annual_consumption.to_csv(output_file, index=False)
-    print("Annual consumption saved to gold/annual_consumption_gen.csv")
+    Args:
+        df_season_days (pd.DataFrame): Season-day models of the silver stage
+        n_profiles (int): Number of annual profiles to generate
+        timebase (int): Timebase of profiles in seconds
+        seed (int, optional): Seed of the random number generator
+        chunk_size (int): Number of profiles generated at once, limits the memory
 
-    # Save generated annual profiles to csv
-    output_file = os.path.join(data_dir, "gold", "annual_loadprofiles_gen.csv")
-    df_profiles.to_csv(output_file, index=False)
-    print("Generated annual load profiles saved to gold/annual_loadprofiles_gen.csv")
-    print(f"Timesteps: {len(df_profiles)}, Num. profiles: {len(df_profiles.columns)}")
+    Returns:
+        np.ndarray: Annual load profiles in W with shape (profiles, timesteps)
 
-    # Write generated annual load profiles to database
-    write_profiles_to_db(df_profiles)
+    """
+    rng = np.random.default_rng(seed)
 
+    # Season-day of each day of the year
+    timesteps_per_day = 24 * 60 * 60 // timebase
+    days = pd.date_range(start="2023-01-01", periods=365, freq="D")
+    season_day = season_day_index(days)
+
+    # Models of the season-day of each day with shape (365, timesteps per day)
+    def gather(stat: str) -> np.ndarray:
+        models = np.stack(
+            [df_season_days[f"{label}_{stat}"].to_numpy() for label in SEASON_DAYS]
+        )
+        return models[season_day]
+
+    if len(df_season_days) != timesteps_per_day:
+        raise ValueError(
+            f"Season-day models have {len(df_season_days)} timesteps per day, "
+            f"expected {timesteps_per_day} for timebase {timebase}s."
+        )
+
+    mean = gather("mean")
+    # Reduce standard deviation to make profiles smoother
+    std = gather("std") / 2.0
+    lb = np.maximum(gather("5th"), 0)
+    ub = gather("95th")
+
+    profiles = np.empty((n_profiles, 365 * timesteps_per_day))
+    for start in range(0, n_profiles, chunk_size):
+        stop = min(start + chunk_size, n_profiles)
+        # Generate profiles with normal distribution
+        noise = rng.standard_normal((stop - start, 365, timesteps_per_day))
+        chunk = mean + std * noise
+        # Truncate profiles to min and max values
+        chunk = np.maximum(np.minimum(chunk, ub), lb)
+        profiles[start:stop] = chunk.reshape(stop - start, -1)
+
+    return profiles
+
+
+def publish_profiles(
+    data_dir: str, timebase: int = 60 * 60, force: bool = False
+) -> None:
+    """Write the generated annual load profiles to the database. The profiles are
+    published with the content hash of the gold dataset as dataset version. The
+    stage is skipped if the same profiles have already been published.
 
-def generate_daily_profile(
-    mean: float, std: float, lb: float, ub: float
-) -> list[float]:
-    """Generate daily load profile for each season-day
     Args:
-        mean (float): Array of means for n timesteps
-        std (float): Array of standard deviations for n timesteps
-        lb (float): Array of lower bound values (e.g. 25th perc.) for n timesteps
-        ub (float): Array of upper bound values (e.g. 75th perc.) for n timesteps
-    Returns:
-        profile (list[float]): Load profile with n-timesteps.
+        data_dir (str): Path to data directory
+        timebase (int): Timebase of profiles in seconds
+        force (bool): Publish the profiles even if they have already been published
+
     """
-    # Reduce standard deviation to make profiles smoother
-    std = std / 2.0
-    # Generate profile with normal distribution
-    profile: list[float] = np.random.normal(mean, std)
-    # Truncate profile to min and max values
-    lb = np.maximum(lb, 0)
-    profile = np.maximum(np.minimum(profile, ub), lb)
-
-    return profile
-
-
-def write_profiles_to_db(df_profiles: pd.DataFrame) -> None:
-    """Write generated annual load profiles to MongoDB database."""
-    # Write generated annual load profiles to MongoDB database
-    # Use certifi to get the path of the CA file
-    ca = certifi.where()
-
-    # Load config from .env file:
-    scipt_dir = os.path.dirname(os.path.abspath(__file__))
-    env_path = os.path.join(scipt_dir, "../../.env")
-    load_dotenv(env_path)
-    MONGODB_URI = os.environ["MONGODB_URI"]
-
-    client = MongoClient(MONGODB_URI, server_api=ServerApi("1"), tlsCAFile=ca)
-    db = client["ferntree_db"]
-    collection = db["loadprofiles"]
-
-    # Convert dataframe to dictionary
-    profiles_dict = df_profiles.to_dict(orient="list")
-
-    # Write each profile as a separate document to database
-    profile_docs = [
-        {
-            "type": "normalised annual loadprofile",
-            "profile_id": int(profile_id),
-            "load_profile": profile,
-        }
-        for profile_id, profile in profiles_dict.items()
-    ]
-    doc_ids = collection.insert_many(profile_docs)
-    # Create an index on the 'profile_id' field
-    collection.create_index("profile_id")
-
-    if doc_ids:
-        print("Generated annual load profiles written to MongoDB database.")
-    else:
-        print("Error writing annual load profiles to MongoDB database.")
-
-    client.close()
-
-    # host = "localhost"
-    # port = "5432"
-    # db_name = "sim_db"
-    # db_url = URL.create(
-    #     "postgresql+psycopg2",
-    #     host=host,
-    #     port=port,
-    #     database=db_name,
-    # )
-
-    # engine = create_engine(db_url)
-
-    # # Export to database
-    # df_profiles.to_sql(
-    #     "annual_loadprofiles", con=engine, if_exists="replace", index=False
-    # )
-    # print(f"Exported generated annual load profiles to database at {db_url}")
+    print("\nPUBLISH: Write annual load profiles to database")
+    store = ArtifactStore(data_dir)
+    content_hash = store.content_hash(ANNUAL_LOADPROFILES)
+    inputs = {ANNUAL_LOADPROFILES: content_hash}
+    params = {"timebase": timebase, "dtype": DTYPE}
+    stage_fingerprint = fingerprint(inputs, params)
+    if not force and store.is_fresh(PUBLISHED_PROFILES, stage_fingerprint):
+        print(f"Annual load profiles in {ANNUAL_LOADPROFILES} already published.")
+        return
+
+    profiles = store.read(ANNUAL_LOADPROFILES, ["profiles"])["profiles"]
+    publish_profiles_to_db(profiles, "gen", f"gen-{content_hash[:16]}", timebase)
+
+    # Record the published profiles
+    provenance = {"stage": "publish", "inputs": inputs, "params": params}
+    with store.write(PUBLISHED_PROFILES, stage_fingerprint, provenance):
+        pass
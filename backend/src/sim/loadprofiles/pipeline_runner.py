@@ -0,0 +1,127 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable
+
+
+class Stage:
+    """A stage of the load profile pipeline: a function producing artifacts and the
+    stages it depends on. The function decides itself whether its artifacts are up
+    to date (see ArtifactStore.is_fresh), so running a fresh stage is cheap.
+    """
+
+    def __init__(
+        self, name: str, func: Callable[..., None], deps: list[str], **kwargs: Any
+    ) -> None:
+        """Initializes a new instance of the Stage class.
+
+        Args:
+            name (str): Name of the stage, e.g. "bronze:2018" or "silver"
+            func (Callable[..., None]): Module-level function of the stage, it is
+                pickled to run in a worker process
+            deps (list[str]): Names of the stages this stage depends on
+            **kwargs (Any): Keyword arguments of the function
+
+        """
+        self.name = name
+        self.func = func
+        self.deps = deps
+        self.kwargs = kwargs
+
+
+def matches(name: str, selectors: list[str]) -> bool:
+    """Check if a stage is selected, e.g. "bronze" selects all "bronze:<year>"."""
+    return any(name == sel or name.startswith(f"{sel}:") for sel in selectors)
+
+
+def select_stages(
+    stages: dict[str, Stage], targets: list[str], with_deps: bool = True
+) -> list[str]:
+    """Select the target stages and, if requested, all stages they depend on.
+
+    Args:
+        stages (dict[str, Stage]): All stages of the pipeline by name
+        targets (list[str]): Names of the target stages
+        with_deps (bool): Also select the dependencies of the targets
+
+    Returns:
+        list[str]: Names of the selected stages in the order of the pipeline
+
+    Raises:
+        ValueError: If a target doesn't match any stage
+
+    """
+    unknown = [target for target in targets if not matches_any(stages, target)]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown}, available: {list(stages)}")
+
+    selected = {name for name in stages if matches(name, targets)}
+    if with_deps:
+        queue = list(selected)
+        while queue:
+            for dep in stages[queue.pop()].deps:
+                if dep not in selected:
+                    selected.add(dep)
+                    queue.append(dep)
+
+    return [name for name in stages if name in selected]
+
+
+def matches_any(stages: dict[str, Stage], selector: str) -> bool:
+    """Check if a selector matches any stage."""
+    return any(matches(name, [selector]) for name in stages)
+
+
+def run_stage(func: Callable[..., None], kwargs: dict[str, Any]) -> None:
+    """Run the function of a stage, executed in a worker process."""
+    func(**kwargs)
+
+
+def run_pipeline(
+    stages: dict[str, Stage],
+    targets: list[str],
+    workers: int = 1,
+    with_deps: bool = True,
+) -> None:
+    """Run the selected stages of the pipeline in the order of their dependencies.
+    Stages whose dependencies are done run in parallel in worker processes, e.g.
+    the ingestion of several years. Dependencies that are not selected are assumed
+    to be done, which allows partial reruns of downstream stages.
+
+    Args:
+        stages (dict[str, Stage]): All stages of the pipeline by name
+        targets (list[str]): Names of the target stages
+        workers (int): Number of worker processes, 1 runs all stages in this process
+        with_deps (bool): Also run the dependencies of the targets
+
+    """
+    selected = select_stages(stages, targets, with_deps)
+    print(f"Running stages: {', '.join(selected)}")
+
+    if workers <= 1:
+        for name in selected:
+            run_stage(stages[name].func, stages[name].kwargs)
+        return
+
+    pending = list(selected)
+    done: set[str] = set()
+    running: dict[Future[None], str] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            # Submit all stages whose selected dependencies are done
+            for name in list(pending):
+                deps = [dep for dep in stages[name].deps if dep in selected]
+                if all(dep in done for dep in deps):
+                    stage = stages[name]
+                    running[pool.submit(run_stage, stage.func, stage.kwargs)] = name
+                    pending.remove(name)
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except Exception:
+                    print(f"Stage {name} failed, cancelling remaining stages.")
+                    for other in running:
+                        other.cancel()
+                    raise
+                done.add(name)
@@ -1,133 +1,137 @@
-import os
+import warnings
 
+import numpy as np
 import pandas as pd
+import pipeline_bronze as bronze
+from pipeline_store import ArtifactStore, fingerprint
+from season_days import SEASON_DAYS, season_day_index
 
+# Percentiles of the season-day models
+PERCENTILES = [5, 25, 75, 95]
 
-def create_season_day_models(data_dir: str, timebase: int) -> None:
+# Artifact of the silver stage: statistical models of the season-days
+SEASON_DAYS_MODELS = "gold/season_days_models"
+
+
+def create_season_day_models(data_dir: str, timebase: int, force: bool = False) -> None:
     """Process silver data to create gold data:
     First, loadprofiles of all houses are sorted into seasons and weekday/weekend.
-    Then, statistical models for the season-days are determined and saved to a csv file.
-    The models will be used to generate synthetic load profiles in next step. They
-    describe for each timestep of a season-day the mean, standard deviation, 5th, 25th,
-    75th and 95th percentile.
+    Then, statistical models for the season-days are determined and saved to the
+    artifact store. The models will be used to generate synthetic load profiles in
+    next step. They describe for each timestep of a season-day the mean, standard
+    deviation, 5th, 25th, 75th and 95th percentile. The stage is skipped if the
+    silver datasets and the timebase haven't changed.
 
     Args:
         data_dir (str): Path to data directory
         timebase (int): Timebase of dataset in seconds
+        force (bool): Determine the models even if they are up to date
 
     """
     print("\nSILVER: Create season-day models")
-    # Load the preprocessed data
-    silver_data = os.path.join(data_dir, "silver", "loadprofiles_sorted.csv")
-    print(f"Loading data from {silver_data}")
-    df_raw = pd.read_csv(silver_data)
-    df_raw["time"] = pd.to_datetime(df_raw["time"], unit="s")
+    store = ArtifactStore(data_dir)
+    params = {"timebase": timebase, "percentiles": PERCENTILES}
+    inputs = {
+        bronze.year_dataset(year): store.content_hash(bronze.year_dataset(year))
+        for year in bronze.YEARS
+    }
+    stage_fingerprint = fingerprint(inputs, params)
+    if not force and store.is_fresh(SEASON_DAYS_MODELS, stage_fingerprint):
+        print(f"Season-day models in {SEASON_DAYS_MODELS} are up to date.")
+        return
 
-    # Create pandas time series for one day with only the time
-    timesteps_per_day = 24 * 60 * 60 // timebase
-    time = pd.date_range(
-        start="2023-01-01", periods=timesteps_per_day, freq=f"{timebase}s"
-    ).time
-
-    # Sort data into seasons (spring, summer, autumn, winter) and weekday/weekend
-    df_spring_wd = pd.DataFrame(time, columns=["time"])
-    df_spring_we = pd.DataFrame(time, columns=["time"])
-    df_summer_wd = pd.DataFrame(time, columns=["time"])
-    df_summer_we = pd.DataFrame(time, columns=["time"])
-    df_autumn_wd = pd.DataFrame(time, columns=["time"])
-    df_autumn_we = pd.DataFrame(time, columns=["time"])
-    df_winter_wd = pd.DataFrame(time, columns=["time"])
-    df_winter_we = pd.DataFrame(time, columns=["time"])
+    # Load the preprocessed data
+    print(f"Loading data from {', '.join(inputs)}")
+    seconds, _, values = bronze.load_silver_dataset(store, bronze.YEARS)
+    time = pd.DatetimeIndex(pd.to_datetime(seconds, unit="s"))
 
     print("Sorting data into seasons and weekday/weekend...")
-    i = 0
-    while i < len(df_raw):
-        # Get weekday and month of current row
-        month = df_raw["time"].iloc[i].month
-        weekday = df_raw["time"].iloc[i].weekday()
-
-        # print(f"{i}: Month: {month}, Weekday: {weekday}")
-
-        batch = df_raw.iloc[i : i + timesteps_per_day].copy()
-        batch["time"] = batch["time"].dt.time
-        # Rename columns to avoid duplicate column names
-        batch.columns = [
-            f"{col}_{i}" if col != "time" else col for col in batch.columns
-        ]
-
-        # Sort daily battches of rows into seasons and weekday/weekend
-        # Merge rows with respective dataframe
-
-        # Spring
-        if month in [3, 4, 5]:
-            if weekday < 5:  # Weekday
-                df_spring_wd = pd.merge(df_spring_wd, batch, on="time", how="outer")
-            else:  # Weekend
-                df_spring_we = pd.merge(df_spring_we, batch, on="time", how="outer")
-
-        # Summer
-        elif month in [6, 7, 8]:
-            if weekday < 5:  # Weekday
-                df_summer_wd = pd.merge(df_summer_wd, batch, on="time", how="outer")
-            else:  # Weekend
-                df_summer_we = pd.merge(df_summer_we, batch, on="time", how="outer")
-
-        # Autumn
-        elif month in [9, 10, 11]:
-            if weekday < 5:  # Weekday
-                df_autumn_wd = pd.merge(df_autumn_wd, batch, on="time", how="outer")
-            else:  # Weekend
-                df_autumn_we = pd.merge(df_autumn_we, batch, on="time", how="outer")
-
-        # Winter
-        else:
-            if weekday < 5:  # Weekday
-                df_winter_wd = pd.merge(df_winter_wd, batch, on="time", how="outer")
-            else:  # Weekend
-                df_winter_we = pd.merge(df_winter_we, batch, on="time", how="outer")
-
-        i += timesteps_per_day
+    days, labels = reshape_to_days(time, values, timebase)
 
     # Create dataframe with statistical models for each timestep of each season-day
     print("Determining statistical models for each season-day...")
-    df_season_days = pd.DataFrame()
-    season_days = [
-        df_spring_wd,
-        df_spring_we,
-        df_summer_wd,
-        df_summer_we,
-        df_autumn_wd,
-        df_autumn_we,
-        df_winter_wd,
-        df_winter_we,
-    ]
-    season_days_labels = [
-        "spring_weekday",
-        "spring_weekend",
-        "summer_weekday",
-        "summer_weekend",
-        "autumn_weekday",
-        "autumn_weekend",
-        "winter_weekday",
-        "winter_weekend",
-    ]
-    for df, label in zip(season_days, season_days_labels):
-        df.drop(columns=["time"], inplace=True)
-        mean = df.mean(axis=1)
-        std = df.std(axis=1)
-        percentile95 = df.quantile(0.95, axis=1)
-        percentile5 = df.quantile(0.05, axis=1)
-        percentile75 = df.quantile(0.75, axis=1)
-        percentile25 = df.quantile(0.25, axis=1)
-
-        df_season_days[f"{label}_mean"] = mean
-        df_season_days[f"{label}_std"] = std
-        df_season_days[f"{label}_95th"] = percentile95
-        df_season_days[f"{label}_5th"] = percentile5
-        df_season_days[f"{label}_75th"] = percentile75
-        df_season_days[f"{label}_25th"] = percentile25
-
-    # Save df_season_day to csv
-    season_days_path = os.path.join(data_dir, "gold", "season_days_models.csv")
-    df_season_days.to_csv(season_days_path, index=False)
-    print("Season days saved to gold/season_days_models.csv")
+    df_season_days = season_day_models(days, labels)
+
+    # Save season-day models
+    provenance = {"stage": "silver", "inputs": inputs, "params": params}
+    with store.write(SEASON_DAYS_MODELS, stage_fingerprint, provenance) as artifact:
+        for column in df_season_days.columns:
+            artifact.save_column(column, df_season_days[column].to_numpy())
+    print(f"Season days saved to {SEASON_DAYS_MODELS}")
+
+
+def reshape_to_days(
+    time: pd.DatetimeIndex, values: np.ndarray, timebase: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Reshape the loadprofiles of all houses into daily blocks.
+    The rows are split into consecutive blocks of one day, each labelled with the
+    season-day of its first row. Within a block, each row is placed at the timestep
+    of its time of day. Missing timesteps, e.g. of a partial last day, are NaN.
+
+    Args:
+        time (pd.DatetimeIndex): Timestamps of the rows
+        values (np.ndarray): Loadprofiles with shape (timesteps, houses)
+        timebase (int): Timebase of dataset in seconds
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Loadprofiles with shape (days, timesteps per
+        day, houses) and the season-day index of each day
+
+    """
+    timesteps_per_day = 24 * 60 * 60 // timebase
+    n_rows, n_houses = values.shape
+    n_days = -(-n_rows // timesteps_per_day)
+
+    # Day of each row and timestep of its time of day
+    day = np.arange(n_rows) // timesteps_per_day
+    seconds_of_day = (
+        np.asarray(time.hour) * 3600
+        + np.asarray(time.minute) * 60
+        + np.asarray(time.second)
+    )
+    timestep = seconds_of_day // timebase
+
+    days = np.full((n_days, timesteps_per_day, n_houses), np.nan)
+    days[day, timestep] = values
+
+    labels = season_day_index(time[::timesteps_per_day])
+
+    return days, labels
+
+
+def season_day_models(days: np.ndarray, labels: np.ndarray) -> pd.DataFrame:
+    """Determine statistical models for each timestep of each season-day.
+    All days and houses of a season-day are samples of the model. Missing values
+    are ignored.
+
+    Args:
+        days (np.ndarray): Loadprofiles with shape (days, timesteps per day, houses)
+        labels (np.ndarray): Season-day index of each day
+
+    Returns:
+        pd.DataFrame: Mean, standard deviation, 95th, 5th, 75th and 25th percentile
+        for each timestep of each season-day
+
+    """
+    timesteps_per_day = days.shape[1]
+    models = {}
+    with warnings.catch_warnings():
+        # Season-days without data result in NaN models
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for i, label in enumerate(SEASON_DAYS):
+            # Samples with shape (timesteps per day, days * houses)
+            samples = (
+                days[labels == i].transpose(1, 0, 2).reshape(timesteps_per_day, -1)
+            )
+            if samples.shape[1] == 0:
+                samples = np.full((timesteps_per_day, 1), np.nan)
+            p5, p25, p75, p95 = np.nanpercentile(samples, PERCENTILES, axis=1)
+
+            models[f"{label}_mean"] = np.nanmean(samples, axis=1)
+            models[f"{label}_std"] = np.nanstd(samples, axis=1, ddof=1)
+            models[f"{label}_95th"] = p95
+            models[f"{label}_5th"] = p5
+            models[f"{label}_75th"] = p75
+            models[f"{label}_25th"] = p25
+
+    return pd.DataFrame(models)
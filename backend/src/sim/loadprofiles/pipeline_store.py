@@ -0,0 +1,358 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+# Metadata file of an artifact
+META_FILE = "meta.json"
+# Archive with all columns of a compressed artifact
+COMPRESSED_FILE = "columns.npz"
+# Cache of the content hashes of input files
+HASH_CACHE_FILE = ".hash_cache.json"
+
+
+def hash_files(paths: list[str], chunk_size: int = 1 << 20) -> str:
+    """Compute the sha256 content hash of files, e.g. the raw datasets of a stage.
+
+    Args:
+        paths (list[str]): Paths of the files, the order matters
+        chunk_size (int): Number of bytes read at once
+
+    Returns:
+        str: Hex digest of the content hash
+
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(inputs: dict[str, Any], params: dict[str, Any]) -> str:
+    """Compute the fingerprint of a stage from the content hashes of its inputs and
+    its parameters. A stage has to be recomputed when its fingerprint changes.
+
+    Args:
+        inputs (dict[str, Any]): Content hashes of the inputs by name
+        params (dict[str, Any]): Parameters of the stage, must be JSON serializable
+
+    Returns:
+        str: Hex digest of the fingerprint
+
+    """
+    payload = json.dumps({"inputs": inputs, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactWriter:
+    """Writes the columns of an artifact into a temporary directory. Created by
+    ArtifactStore.write, which publishes the artifact when all columns are written.
+    """
+
+    def __init__(self, tmp_dir: str, compress: bool) -> None:
+        """Initializes a new instance of the ArtifactWriter class.
+
+        Args:
+            tmp_dir (str): Temporary directory of the artifact
+            compress (bool): Store all columns in one compressed archive
+
+        """
+        self.tmp_dir = tmp_dir
+        self.compress = compress
+        self.columns: dict[str, Any] = {}
+        self.pending: dict[str, np.ndarray] = {}
+
+    def save_column(self, name: str, values: np.ndarray) -> None:
+        """Save a column of the artifact.
+
+        Args:
+            name (str): Name of the column
+            values (np.ndarray): Values of the column, 1D or 2D
+
+        """
+        values = np.asarray(values)
+        if self.compress:
+            self.pending[name] = values
+        else:
+            np.save(os.path.join(self.tmp_dir, f"{name}.npy"), values)
+        self.columns[name] = {"dtype": values.dtype.str, "shape": list(values.shape)}
+
+    def create_column(
+        self, name: str, shape: tuple[int, ...], dtype: Any = np.float64, fill: Any = 0
+    ) -> np.ndarray:
+        """Create a memory-mapped column that can be filled chunk by chunk.
+        Not available for compressed artifacts.
+
+        Args:
+            name (str): Name of the column
+            shape (tuple[int, ...]): Shape of the column
+            dtype (Any): Data type of the column
+            fill (Any): Initial value of the column
+
+        Returns:
+            np.ndarray: Writable memory-mapped column
+
+        """
+        if self.compress:
+            raise RuntimeError("Compressed artifacts can't be written chunk by chunk.")
+        values = open_memmap(
+            os.path.join(self.tmp_dir, f"{name}.npy"),
+            mode="w+",
+            dtype=dtype,
+            shape=shape,
+        )
+        values[...] = fill
+        self.columns[name] = {"dtype": values.dtype.str, "shape": list(shape)}
+        return values
+
+    def open_column(self, name: str) -> np.ndarray:
+        """Open a column created before for writing.
+
+        Args:
+            name (str): Name of the column
+
+        Returns:
+            np.ndarray: Writable memory-mapped column
+
+        """
+        return np.load(os.path.join(self.tmp_dir, f"{name}.npy"), mmap_mode="r+")
+
+    def finish(self) -> str:
+        """Write the pending columns of a compressed artifact and compute the
+        content hash of all column files.
+
+        Returns:
+            str: Hex digest of the content hash
+
+        """
+        if self.compress:
+            np.savez_compressed(
+                os.path.join(self.tmp_dir, COMPRESSED_FILE), **self.pending
+            )
+            return hash_files([os.path.join(self.tmp_dir, COMPRESSED_FILE)])
+        return hash_files(
+            [os.path.join(self.tmp_dir, f"{name}.npy") for name in self.columns]
+        )
+
+
+class ArtifactStore:
+    """Storage of the intermediate datasets (artifacts) of the load profile pipeline.
+
+    Each artifact is a directory with one memory-mappable .npy file per column (or
+    one compressed .npz archive) and a meta.json with the schema, the provenance
+    and the content hash of the data. Readers can load a subset of the columns.
+    The fingerprint of the stage's inputs and parameters is stored as well, so a
+    stage can be skipped if its inputs haven't changed.
+    """
+
+    def __init__(self, root: str) -> None:
+        """Initializes a new instance of the ArtifactStore class.
+
+        Args:
+            root (str): Root directory of the artifacts, e.g. the data directory
+
+        """
+        self.root = root
+
+    def hash_files(self, paths: list[str]) -> str:
+        """Content hash of input files, e.g. raw datasets. Hashes are cached by path,
+        size and modification time, so large files are only read once.
+
+        Args:
+            paths (list[str]): Paths of the files, the order matters
+
+        Returns:
+            str: Hex digest of the content hash
+
+        """
+        cache_path = os.path.join(self.root, HASH_CACHE_FILE)
+        cache: dict[str, Any] = {}
+        if os.path.isfile(cache_path):
+            with open(cache_path) as f:
+                cache = json.load(f)
+
+        digests = []
+        for path in paths:
+            stat = os.stat(path)
+            key = os.path.abspath(path)
+            entry = cache.get(key)
+            if entry is None or entry[:2] != [stat.st_size, stat.st_mtime_ns]:
+                entry = [stat.st_size, stat.st_mtime_ns, hash_files([path])]
+                cache[key] = entry
+            digests.append(entry[2])
+
+        # Replace the cache atomically, concurrent stages may lose an entry at worst
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, cache_path)
+
+        return hashlib.sha256("".join(digests).encode()).hexdigest()
+
+    def path(self, name: str) -> str:
+        """Directory of an artifact, e.g. "silver/loadprofiles_sorted"."""
+        return os.path.join(self.root, name)
+
+    def meta(self, name: str) -> Optional[dict[str, Any]]:
+        """Metadata of an artifact, None if the artifact doesn't exist."""
+        meta_path = os.path.join(self.path(name), META_FILE)
+        if not os.path.isfile(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta: dict[str, Any] = json.load(f)
+        return meta
+
+    def exists(self, name: str) -> bool:
+        """Check if an artifact exists."""
+        return self.meta(name) is not None
+
+    def content_hash(self, name: str) -> str:
+        """Content hash of an artifact, used as input hash of downstream stages.
+
+        Raises:
+            FileNotFoundError: If the artifact doesn't exist
+
+        """
+        meta = self.meta(name)
+        if meta is None:
+            raise FileNotFoundError(f"Artifact '{name}' does not exist!")
+        return str(meta["content_hash"])
+
+    def is_fresh(self, name: str, stage_fingerprint: str) -> bool:
+        """Check if an artifact was created from the same inputs and parameters.
+
+        Args:
+            name (str): Name of the artifact
+            stage_fingerprint (str): Fingerprint of the stage's inputs and parameters
+
+        Returns:
+            bool: True if the artifact is up to date and the stage can be skipped
+
+        """
+        meta = self.meta(name)
+        return meta is not None and meta["fingerprint"] == stage_fingerprint
+
+    @contextmanager
+    def write(
+        self,
+        name: str,
+        stage_fingerprint: str,
+        provenance: dict[str, Any],
+        compress: bool = False,
+    ) -> Iterator[ArtifactWriter]:
+        """Context manager to write an artifact. The columns are written into a
+        temporary directory, which replaces the previous artifact only if all
+        columns were written successfully.
+
+        Args:
+            name (str): Name of the artifact
+            stage_fingerprint (str): Fingerprint of the stage's inputs and parameters
+            provenance (dict[str, Any]): Stage, inputs and parameters of the artifact
+            compress (bool): Store all columns in one compressed archive instead of
+                memory-mappable .npy files
+
+        """
+        output_dir = self.path(name)
+        tmp_dir = f"{output_dir}.tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        writer = ArtifactWriter(tmp_dir, compress)
+        try:
+            yield writer
+            content_hash = writer.finish()
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        meta = {
+            "name": name,
+            "format": "npz" if compress else "npy",
+            "schema": writer.columns,
+            "content_hash": content_hash,
+            "fingerprint": stage_fingerprint,
+            "provenance": {
+                **provenance,
+                "created": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+            },
+        }
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        # Replace the previous artifact
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+
+    def read(
+        self,
+        name: str,
+        columns: Optional[list[str]] = None,
+        mmap_mode: Optional[str] = "r",
+    ) -> dict[str, np.ndarray]:
+        """Read columns of an artifact.
+
+        Args:
+            name (str): Name of the artifact
+            columns (list[str], optional): Names of the columns to read, all columns
+                if None
+            mmap_mode (str, optional): Memory-map the .npy columns instead of
+                loading them, ignored for compressed artifacts
+
+        Returns:
+            dict[str, np.ndarray]: Columns by name
+
+        Raises:
+            FileNotFoundError: If the artifact doesn't exist
+            KeyError: If a column doesn't exist in the artifact
+
+        """
+        meta = self.meta(name)
+        if meta is None:
+            raise FileNotFoundError(f"Artifact '{name}' does not exist!")
+
+        names = list(meta["schema"]) if columns is None else columns
+        missing = [column for column in names if column not in meta["schema"]]
+        if missing:
+            raise KeyError(f"Columns {missing} not found in artifact '{name}'")
+
+        if meta["format"] == "npz":
+            with np.load(os.path.join(self.path(name), COMPRESSED_FILE)) as archive:
+                return {column: archive[column] for column in names}
+
+        return {
+            column: np.load(
+                os.path.join(self.path(name), f"{column}.npy"), mmap_mode=mmap_mode
+            )
+            for column in names
+        }
+
+    def read_frame(
+        self, name: str, columns: Optional[list[str]] = None
+    ) -> pd.DataFrame:
+        """Read 1D columns of an artifact into a dataframe.
+
+        Args:
+            name (str): Name of the artifact
+            columns (list[str], optional): Names of the columns to read, all columns
+                if None
+
+        Returns:
+            pd.DataFrame: Dataframe with the columns
+
+        """
+        return pd.DataFrame(self.read(name, columns, mmap_mode=None))
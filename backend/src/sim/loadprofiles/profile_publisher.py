@@ -0,0 +1,180 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+import certifi
+import numpy as np
+from bson.binary import Binary
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+from pymongo.collection import Collection
+from pymongo.server_api import ServerApi
+
+# Collection of the normalised annual load profiles
+COLLECTION = "loadprofiles"
+# Data type of the packed profiles, float32 is precise enough for normalised
+# profiles and halves the size compared to float64
+DTYPE = "<f4"
+# Number of profiles written in one bulk write
+CHUNK_SIZE = 500
+# Fields that are only written when a profile is inserted. The publication time
+# orders the dataset versions, so republishing a version must not change it.
+INSERT_ONLY_FIELDS = ("type", "published_at")
+# Fields set by the filter of the upsert
+KEY_FIELDS = ("profile_id", "dataset_version")
+# First profile ID of each dataset. All datasets share the collection and profiles
+# are resolved by ID, so each dataset gets a disjoint range of PROFILE_ID_RANGE IDs.
+PROFILE_ID_OFFSETS = {"gen": 0, "alpg": 100_000}
+PROFILE_ID_RANGE = 100_000
+
+
+def encode_profile(profile: np.ndarray, dtype: str = DTYPE) -> tuple[bytes, str]:
+    """Pack a load profile into little-endian binary.
+
+    Args:
+        profile (np.ndarray): Load profile with shape (timesteps,)
+        dtype (str): Data type of the packed values, "<f4" or "<f8"
+
+    Returns:
+        tuple[bytes, str]: Packed profile and its sha256 checksum
+
+    """
+    data = np.ascontiguousarray(profile, dtype=dtype).tobytes()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def profile_document(
+    profile_id: int,
+    profile: np.ndarray,
+    dataset_version: str,
+    timebase: int,
+    dtype: str = DTYPE,
+) -> dict[str, Any]:
+    """Create the database document of a load profile.
+
+    Args:
+        profile_id (int): ID of the load profile
+        profile (np.ndarray): Normalised load profile with shape (timesteps,)
+        dataset_version (str): Version of the dataset the profile belongs to
+        timebase (int): Timebase of the profile in seconds
+        dtype (str): Data type of the packed values
+
+    Returns:
+        dict[str, Any]: Document of the load profile
+
+    """
+    data, checksum = encode_profile(profile, dtype)
+    return {
+        "type": "normalised annual loadprofile",
+        "profile_id": profile_id,
+        "dataset_version": dataset_version,
+        "timebase": timebase,
+        "timesteps": len(profile),
+        "dtype": dtype,
+        "checksum": checksum,
+        "load_profile": Binary(data),
+        "published_at": datetime.now(timezone.utc),
+    }
+
+
+def get_collection(client: MongoClient) -> Collection:
+    """Get the load profile collection and ensure its indexes.
+    Each profile is unique per dataset version, the newest version of a profile is
+    found via its publication time.
+    """
+    collection: Collection = client["ferntree_db"][COLLECTION]
+    collection.create_index(
+        [("profile_id", ASCENDING), ("dataset_version", ASCENDING)], unique=True
+    )
+    collection.create_index([("profile_id", ASCENDING), ("published_at", DESCENDING)])
+    return collection
+
+
+def publish_profiles_to_db(
+    profiles: np.ndarray,
+    dataset: str,
+    dataset_version: str,
+    timebase: int = 60 * 60,
+    dtype: str = DTYPE,
+    chunk_size: int = CHUNK_SIZE,
+) -> None:
+    """Write normalised annual load profiles to the MongoDB database.
+    The profiles are upserted by profile ID and dataset version in unordered bulk
+    writes, so publishing is idempotent and can be restarted after a failure. The
+    publication time is only set on insert, so republishing a version leaves its
+    documents unchanged and doesn't make an older version the newest again.
+    The profile IDs start at the offset of the dataset, so datasets published to
+    the same collection don't overwrite each other's profiles.
+
+    Args:
+        profiles (np.ndarray): Normalised load profiles with shape (profiles,
+            timesteps), the row index plus the dataset offset is the profile ID
+        dataset (str): Name of the dataset, a key of PROFILE_ID_OFFSETS
+        dataset_version (str): Version of the dataset, e.g. its content hash
+        timebase (int): Timebase of the profiles in seconds
+        dtype (str): Data type of the packed values, "<f4" or "<f8"
+        chunk_size (int): Number of profiles written in one bulk write
+
+    Raises:
+        ValueError: If the dataset is unknown or has too many profiles for its
+            range of profile IDs
+
+    """
+    if dataset not in PROFILE_ID_OFFSETS:
+        raise ValueError(
+            f"Unknown dataset {dataset}, expected one of {PROFILE_ID_OFFSETS}"
+        )
+    if len(profiles) > PROFILE_ID_RANGE:
+        raise ValueError(
+            f"{len(profiles)} profiles of dataset {dataset} exceed its range of "
+            f"{PROFILE_ID_RANGE} profile IDs"
+        )
+    id_offset = PROFILE_ID_OFFSETS[dataset]
+
+    # Load config from .env file:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    env_path = os.path.join(script_dir, "../../.env")
+    load_dotenv(env_path)
+    MONGODB_URI = os.environ["MONGODB_URI"]
+
+    # Use certifi to get the path of the CA file
+    client: MongoClient = MongoClient(
+        MONGODB_URI, server_api=ServerApi("1"), tlsCAFile=certifi.where()
+    )
+    try:
+        collection = get_collection(client)
+
+        n_profiles = len(profiles)
+        upserted = modified = 0
+        for start in range(0, n_profiles, chunk_size):
+            stop = min(start + chunk_size, n_profiles)
+            requests = []
+            for row in range(start, stop):
+                profile_id = id_offset + row
+                doc = profile_document(
+                    profile_id, profiles[row], dataset_version, timebase, dtype
+                )
+                on_insert = {field: doc.pop(field) for field in INSERT_ONLY_FIELDS}
+                query = {field: doc.pop(field) for field in KEY_FIELDS}
+                requests.append(
+                    UpdateOne(
+                        query,
+                        {"$set": doc, "$setOnInsert": on_insert},
+                        upsert=True,
+                    )
+                )
+            result = collection.bulk_write(requests, ordered=False)
+            upserted += result.upserted_count
+            modified += result.modified_count
+            print(
+                f"Published profiles {id_offset + start}-{id_offset + stop - 1} "
+                f"of dataset {dataset}"
+            )
+
+        print(
+            f"Annual load profiles of version {dataset_version} written to MongoDB "
+            f"database: {upserted} inserted, {modified} updated."
+        )
+    finally:
+        client.close()
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+# Season-days in the order of their index: season * 2 + (1 if weekend else 0)
+SEASON_DAYS = [
+    "spring_weekday",
+    "spring_weekend",
+    "summer_weekday",
+    "summer_weekend",
+    "autumn_weekday",
+    "autumn_weekend",
+    "winter_weekday",
+    "winter_weekend",
+]
+
+# Season of each month (index 0 = January): 0 spring, 1 summer, 2 autumn, 3 winter
+SEASON_OF_MONTH = np.array([3, 3, 0, 0, 0, 1, 1, 1, 2, 2, 2, 3])
+
+
+def season_day_index(time: pd.DatetimeIndex) -> np.ndarray:
+    """Determine the season-day of each timestamp with array operations.
+    Spring: March - May, summer: June - August, autumn: September - November,
+    winter: December - February. Weekends are Saturday and Sunday.
+
+    Args:
+        time (pd.DatetimeIndex): Timestamps, e.g. the first timestamp of each day
+
+    Returns:
+        np.ndarray: Index of the season-day in SEASON_DAYS for each timestamp
+
+    """
+    season = SEASON_OF_MONTH[np.asarray(time.month) - 1]
+    weekend = np.asarray(time.weekday) >= 5
+    return season * 2 + weekend
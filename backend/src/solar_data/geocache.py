@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from src.solar_data import geolocator
+from src.utils.metrics import record_cache_lookup, track_mongodb_operation
+
+# Set up logger
+LOGGERNAME = "fastapi_logger"
+logger = logging.getLogger(LOGGERNAME)
+
+# Collection of the cached geocodes
+GEOCODE_COLLECTION: str = "geocodes"
+# Seconds until a cached geocode expires and is removed by the TTL index
+GEOCODE_TTL: int = int(os.environ.get("GEOCODE_TTL_DAYS", 90)) * 24 * 3600
+
+
+def normalize_address(address: str) -> str:
+    """Normalize an address, so different spellings of the same address share a
+    cache entry: Unicode normalization, case folding, no punctuation other than
+    commas and single spaces.
+
+    Args:
+        address (str): The address entered by the user.
+
+    Returns:
+        str: The normalized address.
+
+    """
+    normalized: str = unicodedata.normalize("NFKC", address).casefold()
+    normalized = re.sub(r"[^\w\s,]", " ", normalized)
+    parts: list[str] = [" ".join(part.split()) for part in normalized.split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+class GeocodingCache:
+    """Cache of the coordinates of addresses in the database.
+
+    Geocodes are stored by normalized address with the coordinates and the display
+    name, and expire after GEOCODE_TTL. Repeated addresses are served without a
+    request to Nominatim, which is limited to 1 request per second.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase) -> None:
+        """Initialize the cache.
+
+        Args:
+            db (AsyncIOMotorDatabase): The database of the cache.
+
+        """
+        self.collection: AsyncIOMotorCollection = db[GEOCODE_COLLECTION]
+
+    def is_valid(self, doc: dict[str, Any]) -> bool:
+        """Whether a cached geocode has not expired yet. The TTL index removes
+        expired documents only periodically.
+        """
+        updated_at: datetime = doc["updated_at"].replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - updated_at < timedelta(seconds=GEOCODE_TTL)
+
+    @track_mongodb_operation("get_geocodes")
+    async def get_many(self, addresses: list[str]) -> dict[str, dict[str, str]]:
+        """Get the cached coordinates of addresses.
+
+        Args:
+            addresses (list[str]): The addresses.
+
+        Returns:
+            dict[str, dict[str, str]]: Coordinates (lat, lon and display name) by
+                normalized address, only for cached addresses.
+
+        """
+        keys: list[str] = list({normalize_address(address) for address in addresses})
+        cached: dict[str, dict[str, str]] = {}
+        async for doc in self.collection.find({"_id": {"$in": keys}}):
+            if self.is_valid(doc):
+                cached[doc["_id"]] = {
+                    key: doc[key] for key in ["lat", "lon", "display_name"]
+                }
+        return cached
+
+    async def get(self, address: str) -> Optional[dict[str, str]]:
+        """Get the cached coordinates of an address.
+
+        Args:
+            address (str): The address.
+
+        Returns:
+            Optional[dict[str, str]]: Coordinates (lat, lon and display name), None
+                if the address is not cached.
+
+        """
+        cached: dict[str, dict[str, str]] = await self.get_many([address])
+        return cached.get(normalize_address(address))
+
+    @track_mongodb_operation("put_geocode")
+    async def put(
+        self, address: str, coordinates: dict[str, str], source: str = "nominatim"
+    ) -> None:
+        """Store the coordinates of an address.
+
+        Args:
+            address (str): The address.
+            coordinates (dict[str, str]): Coordinates (lat, lon and display name).
+            source (str, optional): Origin of the coordinates, e.g. "frontend" if
+                they were geocoded by the frontend. Defaults to "nominatim".
+
+        """
+        await self.collection.replace_one(
+            {"_id": normalize_address(address)},
+            {
+                "address": address,
+                "lat": str(coordinates["lat"]),
+                "lon": str(coordinates["lon"]),
+                "display_name": str(coordinates.get("display_name", address)),
+                "source": source,
+                "updated_at": datetime.now(timezone.utc),
+            },
+            upsert=True,
+        )
+
+    async def geocode(self, address: str) -> Optional[dict[str, str]]:
+        """Get the coordinates of an address from the cache, or from Nominatim if
+        the address is not cached.
+
+        Args:
+            address (str): The address.
+
+        Returns:
+            Optional[dict[str, str]]: Coordinates (lat, lon and display name), None
+                if the address can't be geocoded.
+
+        """
+        results: dict[str, Optional[dict[str, str]]] = await self.geocode_many(
+            [address]
+        )
+        return results[address]
+
+    async def geocode_many(
+        self, addresses: list[str]
+    ) -> dict[str, Optional[dict[str, str]]]:
+        """Geocode many addresses. Cached addresses are fetched at once, the others
+        are requested one after another from Nominatim, which allows 1 request per
+        second, and stored in the cache.
+
+        Args:
+            addresses (list[str]): The addresses.
+
+        Returns:
+            dict[str, Optional[dict[str, str]]]: Coordinates (lat, lon and display
+                name) by address, None for addresses that can't be geocoded.
+
+        """
+        cached: dict[str, dict[str, str]] = await self.get_many(addresses)
+
+        results: dict[str, Optional[dict[str, str]]] = {}
+        for address in addresses:
+            key: str = normalize_address(address)
+            coordinates: Optional[dict[str, str]] = cached.get(key)
+            record_cache_lookup("geocode", coordinates is not None)
+            if coordinates is None:
+                coordinates = await geolocator.get_location_coordinates(address)
+                if coordinates is not None:
+                    await self.put(address, coordinates)
+                    # Duplicates of the address in the batch are served from cache
+                    cached[key] = coordinates
+            results[address] = coordinates
+
+        failed: int = sum(coordinates is None for coordinates in results.values())
+        logger.info(f"Geocoding: {len(results)} addresses, {failed} failed.")
+        return results
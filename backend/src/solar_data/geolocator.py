@@ -1,14 +1,36 @@
 import asyncio
 import logging
+import os
 from typing import Any, Optional
 
-import aiohttp
+from src.solar_data.outbound import Params, get_json
+from src.utils.metrics import (
+    EXTERNAL_API_DURATION,
+    EXTERNAL_API_FAILURES,
+    record_cache_lookup,
+    track_latency,
+)
 
 # Set up logger
 LOGGERNAME = "fastapi_logger"
 logger = logging.getLogger(LOGGERNAME)
 
+# Account of the GeoNames API, only used if the timezone can't be resolved offline.
+# Without an account, the GeoNames API is not requested.
+GEONAMES_USERNAME: Optional[str] = os.environ.get("GEONAMES_USERNAME")
 
+# Decimals of the coordinates in the timezone cache, 2 decimals are ~1 km
+TIMEZONE_PRECISION: int = 2
+# Maximum number of cached timezones
+TIMEZONE_CACHE_SIZE: int = 4096
+
+# Timezones by rounded coordinates, oldest first
+_timezones: dict[tuple[float, float], str] = {}
+# Offline timezone finder, loaded on first use. False if it is not available.
+_finder: Any = None
+
+
+@track_latency(EXTERNAL_API_DURATION, service="nominatim")
 async def get_location_coordinates(location: str) -> Optional[dict[str, str]]:
     """Convert address from user input to lat/lon coordinates using aiohttp library
     with Nominatim geocoder. The coordinates are required to obtain the solar
@@ -22,47 +44,31 @@ async def get_location_coordinates(location: str) -> Optional[dict[str, str]]:
                                     and the display name.
 
     """
-    # Create a rate limiter
-    rate_limit: asyncio.Semaphore = asyncio.Semaphore(1)  # Allow 1 request at a time
-    last_request_time: float = 0.0
-
     logger.info(f"\nGeolocator: Requesting coordinates for address: {location}")
 
-    url: str = f"https://nominatim.openstreetmap.org/search?format=json&q={location}"
+    url: str = "https://nominatim.openstreetmap.org/search"
+    params: Params = {"format": "json", "q": location}
     headers: dict[str, str] = {"User-Agent": "Ferntree/1.0 (contact@ferntree.dev)"}
 
-    async with rate_limit:
-        # Ensure at least 1 second between requests
-        current_time = asyncio.get_event_loop().time()
-        if current_time - last_request_time < 1:
-            await asyncio.sleep(1 - (current_time - last_request_time))
-
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=headers) as response:
-                    last_request_time = asyncio.get_event_loop().time()
-                    logger.info(f"Geolocator: Response code: {response.status}")
-                    if response.status != 200:
-                        logger.error(
-                            f"Geolocator: Failed to get coordinates for loc. {location}"
-                        )
-                        return None
-                    data: list[dict[str, Any]] = await response.json()
-                    if not data:
-                        logger.error(
-                            f"Geolocator: No results found for address: {location}"
-                        )
-                        return None
-                    coordinates: dict[str, str] = {
-                        key: data[0][key] for key in ["lat", "lon", "display_name"]
-                    }
-                    logger.info(f"Geolocator: Coordinates: {coordinates}")
-                    return coordinates
-            except Exception as ex:
-                logger.error(f"Geolocator: An error occurred: {ex}")
-                return None
-
-
+    # Requests are limited to 1 per second by the shared outbound layer
+    try:
+        data: list[dict[str, Any]] = await get_json(url, params, headers)
+    except Exception as ex:
+        EXTERNAL_API_FAILURES.labels(service="nominatim").inc()
+        logger.error(f"Geolocator: Failed to get coordinates for loc. {location}: {ex}")
+        return None
+
+    if not data:
+        logger.error(f"Geolocator: No results found for address: {location}")
+        return None
+    coordinates: dict[str, str] = {
+        key: data[0][key] for key in ["lat", "lon", "display_name"]
+    }
+    logger.info(f"Geolocator: Coordinates: {coordinates}")
+    return coordinates
+
+
+@track_latency(EXTERNAL_API_DURATION, EXTERNAL_API_FAILURES, service="geonames")
 async def get_timezone(coordinates: dict[str, str]) -> str:
     """Get the timezone for the specified coordinates using the GeoNames API.
     Important limits for the free GeoNames API:
@@ -76,30 +82,113 @@ async def get_timezone(coordinates: dict[str, str]) -> str:
     Returns:
         str: A string representing the timezone for the coordinates.
 
+    Raises:
+        RuntimeError: If GEONAMES_USERNAME is not set or the request fails.
+
     """
+    if GEONAMES_USERNAME is None:
+        raise RuntimeError("GeoNames API: GEONAMES_USERNAME is not set")
     logger.info(f"\nGeoNames API: Requesting timezone for coordinates: {coordinates}")
 
     lat: str = coordinates["lat"]
     lon: str = coordinates["lon"]
-    USERNAME: str = "felixtgd"
 
-    url: str = (
-        f"http://api.geonames.org/timezoneJSON?lat={lat}&lng={lon}&username={USERNAME}"
-    )
+    url: str = "http://api.geonames.org/timezoneJSON"
+    params: Params = {"lat": lat, "lng": lon, "username": GEONAMES_USERNAME}
+
+    try:
+        data: dict[str, Any] = await get_json(url, params)
+        timezone: str = data["timezoneId"]
+        logger.info(f"GeoNames API: Timezone: {timezone}")
+        return timezone
+    except Exception as ex:
+        logger.error(f"GeoNames API: An error occurred: {ex}")
+        raise RuntimeError("Failed to get timezone")
 
-    async with aiohttp.ClientSession() as session:
+
+def get_timezone_finder() -> Any:
+    """Load the offline timezone finder on first use. It looks up the timezone in
+    the polygons of the timezone boundaries bundled with the timezonefinder package.
+
+    Returns:
+        Any: The TimezoneFinder instance, None if the package is not installed.
+
+    """
+    global _finder
+    if _finder is None:
         try:
-            async with session.get(url) as response:
-                logger.info(f"GeoNames API: Response code: {response.status}")
-                if response.status != 200:
-                    logger.error(
-                        f"GeoNames API Error: {response.status} {response.reason}"
-                    )
-                    raise RuntimeError("Failed to get timezone")
-                data: dict[str, Any] = await response.json()
-                timezone: str = data["timezoneId"]
-                logger.info(f"GeoNames API: Timezone: {timezone}")
-                return timezone
-        except Exception as ex:
-            logger.error(f"GeoNames API: An error occurred: {ex}")
-            raise RuntimeError("Failed to get timezone")
+            from timezonefinder import TimezoneFinder
+
+            _finder = TimezoneFinder(in_memory=True)
+            logger.info("Timezone: Offline timezone finder loaded.")
+        except ImportError:
+            logger.warning(
+                "Timezone: timezonefinder is not installed, only GeoNames is available."
+            )
+            _finder = False
+    return _finder or None
+
+
+def find_timezone_offline(lat: float, lon: float) -> Optional[str]:
+    """Find the timezone of coordinates without a network request.
+
+    Args:
+        lat (float): Latitude in decimal degrees.
+        lon (float): Longitude in decimal degrees.
+
+    Returns:
+        Optional[str]: The timezone, None if it can't be resolved offline.
+
+    """
+    finder: Any = get_timezone_finder()
+    if finder is None:
+        return None
+    timezone: Optional[str] = finder.timezone_at(lng=lon, lat=lat)
+    return timezone
+
+
+async def resolve_timezone(coordinates: dict[str, str]) -> str:
+    """Resolve the timezone of coordinates. The timezone is looked up offline and
+    cached by the rounded coordinates, the GeoNames API is only requested if the
+    offline lookup fails.
+
+    Args:
+        coordinates (dict[str, str]): A dictionary with lat and lon coordinates
+
+    Returns:
+        str: A string representing the timezone for the coordinates.
+
+    Raises:
+        RuntimeError: If the timezone can't be resolved.
+
+    """
+    lat: float = float(coordinates["lat"])
+    lon: float = float(coordinates["lon"])
+    key: tuple[float, float] = (
+        round(lat, TIMEZONE_PRECISION),
+        round(lon, TIMEZONE_PRECISION),
+    )
+
+    timezone: Optional[str] = _timezones.get(key)
+    record_cache_lookup("timezone", timezone is not None)
+    if timezone is not None:
+        return timezone
+
+    # Loading the timezone polygons on first use takes a while, keep it off the
+    # event loop so concurrent requests (e.g. prefetches) aren't stalled
+    timezone = await asyncio.to_thread(find_timezone_offline, lat, lon)
+    if timezone is None:
+        if GEONAMES_USERNAME is None:
+            logger.error(
+                "Timezone: Offline lookup failed and GEONAMES_USERNAME is not set, "
+                "skipping the GeoNames API."
+            )
+            raise RuntimeError("Failed to resolve timezone")
+        timezone = await get_timezone(coordinates)
+    else:
+        logger.info(f"Timezone: {timezone} (offline)")
+
+    _timezones[key] = timezone
+    if len(_timezones) > TIMEZONE_CACHE_SIZE:
+        del _timezones[next(iter(_timezones))]
+    return timezone
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Optional, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from src.utils.metrics import EXTERNAL_API_COALESCED, EXTERNAL_API_RETRIES
+
+# Set up logger
+LOGGERNAME = "fastapi_logger"
+logger = logging.getLogger(LOGGERNAME)
+
+# Connection pool of the shared session
+HTTP_POOL_SIZE: int = int(os.environ.get("HTTP_POOL_SIZE", 100))
+HTTP_POOL_SIZE_PER_HOST: int = int(os.environ.get("HTTP_POOL_SIZE_PER_HOST", 10))
+# Seconds an idle connection is kept open for reuse
+HTTP_KEEPALIVE_TIMEOUT: float = float(os.environ.get("HTTP_KEEPALIVE_TIMEOUT", 30))
+# Seconds resolved host names are cached
+HTTP_DNS_CACHE_TTL: int = int(os.environ.get("HTTP_DNS_CACHE_TTL", 300))
+# Total timeout of a request in seconds, PVGIS can take a while for a full year
+HTTP_TIMEOUT: float = float(os.environ.get("HTTP_TIMEOUT", 60))
+
+# Rate limits of the external APIs by host: (requests per second, burst size)
+# - Nominatim: 1 request per second (usage policy)
+# - GeoNames: 1 request per second (free account)
+# - PVGIS: 30 requests per second per IP, keep a margin
+RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "nominatim.openstreetmap.org": (1.0, 1),
+    "api.geonames.org": (1.0, 1),
+    "re.jrc.ec.europa.eu": (25.0, 5),
+}
+# Rate limit of all other hosts
+DEFAULT_RATE_LIMIT: tuple[float, int] = (10.0, 10)
+
+# Retries of failed requests: attempts incl. the first one and backoff in seconds
+MAX_ATTEMPTS: int = int(os.environ.get("HTTP_MAX_ATTEMPTS", 3))
+BACKOFF_BASE: float = 0.5
+BACKOFF_MAX: float = 8.0
+# Status codes that are worth retrying
+RETRY_STATUS: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+Params = dict[str, Union[str, float, int]]
+
+# Session shared by all outbound requests of this process
+_session: Optional[aiohttp.ClientSession] = None
+# Rate limiters by host
+_buckets: dict[str, "TokenBucket"] = {}
+# In-flight requests by request key, shared by identical concurrent requests
+_inflight: dict[str, asyncio.Task[Any]] = {}
+
+
+class OutboundError(RuntimeError):
+    """Request to an external API failed."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        """Initialize the error.
+
+        Args:
+            message (str): Description of the failure.
+            status (int, optional): HTTP status code, None for network errors.
+
+        """
+        super().__init__(message)
+        self.status: Optional[int] = status
+
+
+class TokenBucket:
+    """Token bucket rate limiter for the requests to one host.
+
+    The bucket holds up to burst tokens and is refilled with rate tokens per second.
+    Each request takes one token and waits until one is available, so the requests
+    of all coroutines of the process together stay below the rate limit.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (int): Capacity of the bucket.
+
+        """
+        self.rate: float = rate
+        self.burst: int = burst
+        self.tokens: float = float(burst)
+        self.updated: float = time.monotonic()
+        self.lock: asyncio.Lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Take a token, wait until one is available. Waiting coroutines are served
+        in order of arrival.
+        """
+        async with self.lock:
+            now: float = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+
+
+def get_bucket(host: str) -> TokenBucket:
+    """Get the rate limiter of a host, shared within the process.
+
+    Args:
+        host (str): Host name of the external API.
+
+    Returns:
+        TokenBucket: Rate limiter of the host.
+
+    """
+    if host not in _buckets:
+        rate, burst = RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+        _buckets[host] = TokenBucket(rate, burst)
+    return _buckets[host]
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Delay before retrying a request: exponential backoff with full jitter, so
+    retries of concurrent requests don't hit the API at the same time. A
+    Retry-After header of the response takes precedence.
+
+    Args:
+        attempt (int): Number of the failed attempt, starting at 1.
+        retry_after (str, optional): Value of the Retry-After header.
+
+    Returns:
+        float: Delay in seconds.
+
+    """
+    if retry_after is not None and retry_after.isdigit():
+        return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def open_session() -> aiohttp.ClientSession:
+    """Open the shared HTTP session, if it isn't open yet. The session keeps the
+    connections to the external APIs (PVGIS, Nominatim, GeoNames) alive and caches
+    their DNS lookups, so requests don't pay for a new TCP and TLS handshake.
+
+    Returns:
+        aiohttp.ClientSession: The shared session.
+
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+        logger.info("Outbound: Opened shared HTTP session.")
+    return _session
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Get the shared HTTP session. It is opened at startup of the API, or on first
+    use outside of the API, e.g. in scripts.
+
+    Returns:
+        aiohttp.ClientSession: The shared session.
+
+    """
+    return open_session()
+
+
+async def close_session() -> None:
+    """Close the shared HTTP session and its connections."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("Outbound: Closed shared HTTP session.")
+    _session = None
+
+
+def request_key(url: str, params: Optional[Params]) -> str:
+    """Key of a request, identical requests have the same key."""
+    return json.dumps([url, sorted((params or {}).items())], default=str)
+
+
+async def fetch_json(
+    url: str,
+    params: Optional[Params] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> Any:
+    """Send a GET request to an external API and return the JSON response.
+    The request is rate limited per host and retried with jittered backoff if it
+    fails with a network error or a retryable status code.
+
+    Args:
+        url (str): URL of the request.
+        params (Params, optional): Query parameters.
+        headers (dict[str, str], optional): Request headers.
+
+    Returns:
+        Any: Parsed JSON response.
+
+    Raises:
+        OutboundError: If the request fails after all attempts or with a status
+            code that is not retried.
+
+    """
+    host: str = urlsplit(url).hostname or ""
+    bucket: TokenBucket = get_bucket(host)
+
+    attempt: int = 1
+    while True:
+        await bucket.acquire()
+        retry_after: Optional[str] = None
+        try:
+            async with get_session().get(
+                url, params=params, headers=headers
+            ) as response:
+                logger.info(f"Outbound: {host} response code: {response.status}")
+                if response.status == 200:
+                    return await response.json()
+                error: OutboundError = OutboundError(
+                    f"{host}: {response.status} {response.reason}", response.status
+                )
+                if response.status not in RETRY_STATUS:
+                    raise error
+                retry_after = response.headers.get("Retry-After")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            error = OutboundError(f"{host}: {type(ex).__name__}: {ex}")
+
+        if attempt >= MAX_ATTEMPTS:
+            raise error
+        delay: float = backoff_delay(attempt, retry_after)
+        logger.warning(
+            f"Outbound: Attempt {attempt} failed ({error}), retry in {delay:.2f}s."
+        )
+        EXTERNAL_API_RETRIES.labels(host=host).inc()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def get_json(
+    url: str,
+    params: Optional[Params] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> Any:
+    """Send a GET request to an external API, see fetch_json(). Concurrent identical
+    requests are coalesced: they share the response of one in-flight request.
+
+    Args:
+        url (str): URL of the request.
+        params (Params, optional): Query parameters.
+        headers (dict[str, str], optional): Request headers.
+
+    Returns:
+        Any: Parsed JSON response, shared by the coalesced requests.
+
+    Raises:
+        OutboundError: If the request fails.
+
+    """
+    key: str = request_key(url, params)
+    task: Optional[asyncio.Task[Any]] = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(fetch_json(url, params, headers))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        EXTERNAL_API_COALESCED.labels(host=urlsplit(url).hostname or "").inc()
+
+    # Cancelling one caller doesn't cancel the request of the others
+    return await asyncio.shield(task)
@@ -1,16 +1,29 @@
 import logging
-from typing import Any, Optional, Union
+from typing import TYPE_CHECKING, Any, Optional
 
-import aiohttp
-
-# from backend.solar_data.geolocator import get_location_coordinates
+from src.solar_data.outbound import Params, get_json
+from src.utils.metrics import (
+    EXTERNAL_API_DURATION,
+    EXTERNAL_API_FAILURES,
+    track_latency,
+)
 
+if TYPE_CHECKING:
+    from src.solar_data.solar_tiles import SolarTileCache
 
 # Set up logger
 LOGGERNAME = "fastapi_logger"
 logger = logging.getLogger(LOGGERNAME)
 
+# Fallback location if an address can't be geocoded
+DEFAULT_COORDINATES: dict[str, str] = {
+    "lat": "47.9960901",
+    "lon": "7.8494005",
+    "display_name": "Freiburg im Breisgau, Baden-Württemberg, Germany",
+}
+
 
+@track_latency(EXTERNAL_API_DURATION, EXTERNAL_API_FAILURES, service="pvgis")
 async def api_request_solar_irr(
     lat: str,
     lon: str,
@@ -52,9 +65,7 @@ async def api_request_solar_irr(
     )
 
     # INPUTS Hourly radiation (minum example: https://re.jrc.ec.europa.eu/api/seriescalc?lat=45&lon=8)
-    params: dict[
-        str, Union[str, float, int]
-    ] = {  # type, obligatory, default, default, comment
+    params: Params = {  # type, obligatory, default, default, comment
         "lat": lat,
         # float, y, - , Latitude, in decimal degrees, south is negative.
         "lon": lon,
@@ -105,24 +116,62 @@ async def api_request_solar_irr(
 
     url: str = "https://re.jrc.ec.europa.eu/api/v5_2/seriescalc"
 
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, params=params) as response:
-                logger.info(f"PVGIS API: Response code: {response.status}")
-                if response.status != 200:
-                    logger.error(
-                        f"PVGIS API Error: {response.status} {response.reason}"
-                    )
-                    raise RuntimeError("PVGIS API request failed")
-                data: dict[str, Any] = await response.json()
-                return data
-        except Exception as ex:
-            logger.error(f"PVGIS API: An error occurred: {ex}")
-            raise RuntimeError("PVGIS API request failed")
+    try:
+        data: dict[str, Any] = await get_json(url, params)
+        return data
+    except Exception as ex:
+        logger.error(f"PVGIS API: An error occurred: {ex}")
+        raise RuntimeError("PVGIS API request failed")
+
+
+async def fetch_solar_data(
+    lat: str, lon: str, angle: float, aspect: float, year: int = 2019
+) -> tuple[list[float], list[float]]:
+    """Fetch hourly ambient temperature and irradiance of a year from PVGIS.
+
+    Args:
+        lat (str): Latitude in decimal degrees (south is negative).
+        lon (str): Longitude in decimal degrees (west is negative).
+        angle (float): Inclination angle from horizontal plane.
+        aspect (float): Orient. angle (0=south, 90=west, -90=east).
+        year (int, optional): Year for which data is required. Default = 2019.
+
+    Returns:
+        tuple[list[float], list[float]]: Ambient temperatures (T_amb) in degrees
+            Celsius and global irradiance values (G_i) in W/m2.
+
+    Raises:
+        RuntimeError: If the PVGIS API request fails.
+
+    """
+    try:
+        response_data: Optional[dict[str, Any]] = await api_request_solar_irr(
+            lat=lat, lon=lon, year=year, angle=angle, aspect=aspect
+        )
+    except Exception as ex:
+        logger.error(f"Get Solar Data: An error occurred: {ex}")
+        raise RuntimeError("Failed to get solar data")
+
+    if response_data is None:
+        logger.error("No data returned from PVGIS API request")
+        raise RuntimeError("No data returned from PVGIS API request")
+
+    hourly_data: list[dict[str, float]] = response_data["outputs"]["hourly"]
+
+    T_amb: list[float] = [item["T2m"] for item in hourly_data]
+    G_i: list[float] = [item["G(i)"] for item in hourly_data]
+
+    logger.info(f"Solar Data: {len(hourly_data)} data points\n")
+
+    return T_amb, G_i
 
 
 async def get_solar_data_for_location(
-    location: str, roof_azimuth: float, roof_incl: float
+    location: str,
+    roof_azimuth: float,
+    roof_incl: float,
+    coordinates: Optional[dict[str, str]] = None,
+    tiles: Optional["SolarTileCache"] = None,
 ) -> tuple[list[float], list[float], dict[str, str]]:
     """Retrieve solar irradiance data from PVGIS API for a specified location.
 
@@ -133,6 +182,11 @@ async def get_solar_data_for_location(
         location (str): The address of the location.
         roof_azimuth (float): The azimuth angle of the roof.
         roof_incl (float): The inclination angle of the roof.
+        coordinates (Optional[dict[str, str]]): Coordinates of the location, e.g.
+            from the geocoding cache. DEFAULT_COORDINATES are used if None.
+        tiles (Optional[SolarTileCache]): Tile cache of solar data. The data is
+            interpolated from cached grid points if possible, instead of fetching
+            it from PVGIS.
 
     Returns:
         tuple[list[float], list[float], dict[str, str]]: A tuple containing:
@@ -141,40 +195,26 @@ async def get_solar_data_for_location(
             - Dictionary with location coordinates and display name.
 
     Raises:
-        RuntimeError: If coordinates cannot be found for the location or
-                        if the PVGIS API request fails.
+        RuntimeError: If the PVGIS API request fails.
 
     """
-    # coordinates: Optional[dict[str, str]] = await get_location_coordinates(location)
-    coordinates: Optional[dict[str, str]] = {
-        "lat": "47.9960901",
-        "lon": "7.8494005",
-        "display_name": "Freiburg im Breisgau, Baden-Württemberg, Germany",
-    }  # TODO: temporaray fix, Render currently blocks Nominatim requests for locations
     if coordinates is None:
-        logger.error("No coordinates found for location")
-        raise RuntimeError("No coordinates found for location")
+        # Render blocks Nominatim requests, so the address may not be geocoded
+        logger.warning(
+            f"No coordinates found for location {location}, using default location."
+        )
+        coordinates = DEFAULT_COORDINATES
 
     lat: str = coordinates["lat"]
     lon: str = coordinates["lon"]
 
-    try:
-        response_data: Optional[dict[str, Any]] = await api_request_solar_irr(
-            lat=lat, lon=lon, angle=roof_incl, aspect=roof_azimuth
+    T_amb: list[float]
+    G_i: list[float]
+    if tiles is not None:
+        T_amb, G_i = await tiles.get_solar_data(
+            float(lat), float(lon), angle=roof_incl, aspect=roof_azimuth
         )
-    except Exception as ex:
-        logger.error(f"Get Solar Data: An error occurred: {ex}")
-        raise RuntimeError("Failed to get solar data")
-
-    if response_data is None:
-        logger.error("No data returned from PVGIS API request")
-        raise RuntimeError("No data returned from PVGIS API request")
-
-    hourly_data: list[dict[str, float]] = response_data["outputs"]["hourly"]
-
-    T_amb: list[float] = [item["T2m"] for item in hourly_data]
-    G_i: list[float] = [item["G(i)"] for item in hourly_data]
-
-    logger.info(f"Solar Data: {len(hourly_data)} data points\n")
+    else:
+        T_amb, G_i = await fetch_solar_data(lat, lon, roof_incl, roof_azimuth)
 
     return T_amb, G_i, coordinates
@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import numpy as np
+from bson.binary import Binary
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from src.solar_data import pvgis_api
+from src.utils.metrics import record_cache_lookup, track_mongodb_operation
+
+# Set up logger
+LOGGERNAME = "fastapi_logger"
+logger = logging.getLogger(LOGGERNAME)
+
+# Collection of the solar data of the grid points
+TILE_COLLECTION: str = "solar_tiles"
+# Spacing of the grid points in degrees, 0.1° is ~11 km north-south
+TILE_RESOLUTION: float = float(os.environ.get("SOLAR_TILE_RESOLUTION", 0.1))
+# Opt-in nearest-neighbour snapping: distance in km within which a location uses the
+# uninterpolated data of the nearest grid point. 0 disables it, so locations are
+# always interpolated between the four corners of their grid cell.
+TILE_SNAP_KM: float = float(os.environ.get("SOLAR_TILE_SNAP_KM", 0.0))
+# Weather year of the solar data
+TILE_YEAR: int = 2019
+# Data type of the packed hourly arrays
+DTYPE: str = "<f4"
+# Concurrent PVGIS requests of a region prefetch, the rate limiter of the
+# outbound layer applies on top
+PREFETCH_CONCURRENCY: int = 4
+
+# Kilometers per degree of latitude
+KM_PER_DEGREE: float = 111.2
+
+GridPoint = tuple[int, int]
+
+
+def grid_distance_km(lat: float, lon: float, point: GridPoint) -> float:
+    """Approximate distance in km of a location to a grid point."""
+    dlat: float = lat - point[0] * TILE_RESOLUTION
+    dlon: float = (lon - point[1] * TILE_RESOLUTION) * math.cos(math.radians(lat))
+    return KM_PER_DEGREE * math.hypot(dlat, dlon)
+
+
+class SolarTileCache:
+    """Tiled store of the hourly solar data of a year on a lat/lon grid.
+
+    Each grid point has the hourly ambient temperature and irradiance for a roof
+    angle and aspect, packed as float32 arrays in a document. The data of a location
+    is interpolated bilinearly between the four corners of its grid cell, as it
+    varies smoothly in space. Corners that aren't cached yet are fetched from PVGIS,
+    so the grid is filled on demand. If fetching a corner fails, the exact location
+    is fetched instead. With TILE_SNAP_KM > 0, a location close to a grid point uses
+    the data of that grid point without interpolation.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase) -> None:
+        """Initialize the cache.
+
+        Args:
+            db (AsyncIOMotorDatabase): The database of the cache.
+
+        """
+        self.collection: AsyncIOMotorCollection = db[TILE_COLLECTION]
+
+    @staticmethod
+    def tile_key(point: GridPoint, angle: int, aspect: int, year: int) -> str:
+        """Key of the solar data of a grid point."""
+        return f"{TILE_RESOLUTION}:{point[0]}:{point[1]}:{angle}:{aspect}:{year}"
+
+    @track_mongodb_operation("get_solar_tiles")
+    async def get_tiles(
+        self, points: list[GridPoint], angle: int, aspect: int, year: int
+    ) -> dict[GridPoint, np.ndarray]:
+        """Get the cached solar data of grid points.
+
+        Args:
+            points (list[GridPoint]): Grid points as (lat index, lon index).
+            angle (int): Inclination angle of the roof in degrees.
+            aspect (int): Orientation angle of the roof in degrees.
+            year (int): Weather year.
+
+        Returns:
+            dict[GridPoint, np.ndarray]: Solar data with shape (2, hours), T_amb and
+                G_i, by grid point, only for cached grid points.
+
+        """
+        keys: list[str] = [self.tile_key(p, angle, aspect, year) for p in points]
+        tiles: dict[GridPoint, np.ndarray] = {}
+        async for doc in self.collection.find({"_id": {"$in": keys}}):
+            tiles[(doc["lat_idx"], doc["lon_idx"])] = np.stack(
+                [
+                    np.frombuffer(doc["T_amb"], dtype=DTYPE),
+                    np.frombuffer(doc["G_i"], dtype=DTYPE),
+                ]
+            )
+        return tiles
+
+    @track_mongodb_operation("put_solar_tile")
+    async def put_tile(
+        self,
+        point: GridPoint,
+        angle: int,
+        aspect: int,
+        year: int,
+        T_amb: list[float],
+        G_i: list[float],
+    ) -> np.ndarray:
+        """Store the solar data of a grid point.
+
+        Args:
+            point (GridPoint): Grid point as (lat index, lon index).
+            angle (int): Inclination angle of the roof in degrees.
+            aspect (int): Orientation angle of the roof in degrees.
+            year (int): Weather year.
+            T_amb (list[float]): Hourly ambient temperatures in degrees Celsius.
+            G_i (list[float]): Hourly global irradiance in W/m2.
+
+        Returns:
+            np.ndarray: Stored solar data with shape (2, hours).
+
+        """
+        data: np.ndarray = np.array([T_amb, G_i], dtype=DTYPE)
+        await self.collection.replace_one(
+            {"_id": self.tile_key(point, angle, aspect, year)},
+            {
+                "resolution": TILE_RESOLUTION,
+                "lat_idx": point[0],
+                "lon_idx": point[1],
+                "angle": angle,
+                "aspect": aspect,
+                "year": year,
+                "T_amb": Binary(data[0].tobytes()),
+                "G_i": Binary(data[1].tobytes()),
+                "fetched_at": datetime.now(timezone.utc),
+            },
+            upsert=True,
+        )
+        return data
+
+    async def fetch_tile(
+        self, point: GridPoint, angle: int, aspect: int, year: int
+    ) -> np.ndarray:
+        """Fetch the solar data of a grid point from PVGIS and store it.
+
+        Args:
+            point (GridPoint): Grid point as (lat index, lon index).
+            angle (int): Inclination angle of the roof in degrees.
+            aspect (int): Orientation angle of the roof in degrees.
+            year (int): Weather year.
+
+        Returns:
+            np.ndarray: Solar data with shape (2, hours).
+
+        Raises:
+            RuntimeError: If the PVGIS API request fails.
+
+        """
+        T_amb, G_i = await pvgis_api.fetch_solar_data(
+            f"{point[0] * TILE_RESOLUTION:.4f}",
+            f"{point[1] * TILE_RESOLUTION:.4f}",
+            angle,
+            aspect,
+            year,
+        )
+        return await self.put_tile(point, angle, aspect, year, T_amb, G_i)
+
+    async def get_solar_data(
+        self,
+        lat: float,
+        lon: float,
+        angle: float,
+        aspect: float,
+        year: int = TILE_YEAR,
+    ) -> tuple[list[float], list[float]]:
+        """Get the hourly solar data of a location from the tiles, interpolated
+        between the corners of its grid cell.
+
+        Args:
+            lat (float): Latitude in decimal degrees.
+            lon (float): Longitude in decimal degrees.
+            angle (float): Inclination angle of the roof, rounded to full degrees.
+            aspect (float): Orientation angle of the roof, rounded to full degrees.
+            year (int, optional): Weather year. Defaults to TILE_YEAR.
+
+        Returns:
+            tuple[list[float], list[float]]: Ambient temperatures (T_amb) in degrees
+                Celsius and global irradiance values (G_i) in W/m2.
+
+        Raises:
+            RuntimeError: If the PVGIS API request fails.
+
+        """
+        angle_key: int = round(angle)
+        aspect_key: int = round(aspect)
+
+        # Corners of the grid cell of the location and position inside the cell
+        y: float = lat / TILE_RESOLUTION
+        x: float = lon / TILE_RESOLUTION
+        lat0: int = math.floor(y)
+        lon0: int = math.floor(x)
+        corners: list[GridPoint] = [
+            (lat0, lon0),
+            (lat0, lon0 + 1),
+            (lat0 + 1, lon0),
+            (lat0 + 1, lon0 + 1),
+        ]
+        tiles: dict[GridPoint, np.ndarray] = await self.get_tiles(
+            corners, angle_key, aspect_key, year
+        )
+
+        # Opt-in: use the nearest grid point if the location is close enough
+        if TILE_SNAP_KM > 0:
+            nearest: GridPoint = min(
+                corners, key=lambda p: grid_distance_km(lat, lon, p)
+            )
+            if grid_distance_km(lat, lon, nearest) <= TILE_SNAP_KM:
+                snapped: Optional[np.ndarray] = tiles.get(nearest)
+                record_cache_lookup("solar_tiles", snapped is not None)
+                if snapped is None:
+                    snapped = await self.fetch_tile(
+                        nearest, angle_key, aspect_key, year
+                    )
+                logger.info(f"Solar Tiles: Snapped ({lat}, {lon}) to {nearest}.")
+                return snapped[0].tolist(), snapped[1].tolist()
+
+        # Fetch the missing corners, they fill the grid for later locations
+        missing: list[GridPoint] = [p for p in corners if p not in tiles]
+        record_cache_lookup("solar_tiles", not missing)
+        if missing:
+            fetched: list[Any] = await asyncio.gather(
+                *[self.fetch_tile(p, angle_key, aspect_key, year) for p in missing],
+                return_exceptions=True,
+            )
+            errors: list[BaseException] = [
+                r for r in fetched if isinstance(r, BaseException)
+            ]
+            if errors:
+                logger.error(
+                    f"Solar Tiles: Failed to fetch grid points {missing}: {errors[0]}"
+                )
+                # Fall back to the exact location
+                return await pvgis_api.fetch_solar_data(
+                    str(lat), str(lon), angle, aspect, year
+                )
+            tiles.update(zip(missing, fetched))
+            logger.info(f"Solar Tiles: Fetched grid points {missing}.")
+
+        # Bilinear interpolation of all hours at once
+        wy: float = y - lat0
+        wx: float = x - lon0
+        weights: np.ndarray = np.array(
+            [(1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx]
+        )
+        stacked: np.ndarray = np.stack([tiles[p] for p in corners])
+        data: np.ndarray = np.tensordot(weights, stacked.astype(np.float64), axes=1)
+        logger.info(f"Solar Tiles: Interpolated data for ({lat}, {lon}).")
+
+        return data[0].tolist(), data[1].tolist()
+
+    async def prefetch_region(
+        self,
+        lat_min: float,
+        lat_max: float,
+        lon_min: float,
+        lon_max: float,
+        angle: float,
+        aspect: float,
+        year: int = TILE_YEAR,
+    ) -> int:
+        """Fetch the solar data of all grid points of a region that are not cached
+        yet, e.g. of the service area before users sign up.
+
+        Args:
+            lat_min (float): Southern bound in decimal degrees.
+            lat_max (float): Northern bound in decimal degrees.
+            lon_min (float): Western bound in decimal degrees.
+            lon_max (float): Eastern bound in decimal degrees.
+            angle (float): Inclination angle of the roof in degrees.
+            aspect (float): Orientation angle of the roof in degrees.
+            year (int, optional): Weather year. Defaults to TILE_YEAR.
+
+        Returns:
+            int: Number of fetched grid points.
+
+        """
+        angle_key: int = round(angle)
+        aspect_key: int = round(aspect)
+        points: list[GridPoint] = [
+            (lat_idx, lon_idx)
+            for lat_idx in range(
+                math.floor(lat_min / TILE_RESOLUTION),
+                math.ceil(lat_max / TILE_RESOLUTION) + 1,
+            )
+            for lon_idx in range(
+                math.floor(lon_min / TILE_RESOLUTION),
+                math.ceil(lon_max / TILE_RESOLUTION) + 1,
+            )
+        ]
+        cached: dict[GridPoint, np.ndarray] = await self.get_tiles(
+            points, angle_key, aspect_key, year
+        )
+        missing: list[GridPoint] = [p for p in points if p not in cached]
+        logger.info(
+            f"Solar Tiles: Prefetching {len(missing)} of {len(points)} grid points."
+        )
+
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+        async def fetch(point: GridPoint) -> bool:
+            async with semaphore:
+                try:
+                    await self.fetch_tile(point, angle_key, aspect_key, year)
+                    return True
+                except Exception as ex:
+                    logger.error(f"Solar Tiles: Failed to fetch {point}: {ex}")
+                    return False
+
+        results: list[bool] = await asyncio.gather(*[fetch(p) for p in missing])
+        return sum(results)
+
+
+async def main(args: Any) -> None:
+    """Prefetch the solar data of a region."""
+    # Imported here, the client reads the connection settings at import time
+    from src.database.mongodb import MongoClient
+    from src.solar_data import outbound
+
+    db_client: MongoClient = MongoClient()
+    try:
+        tiles: SolarTileCache = SolarTileCache(db_client.db)
+        for angle, aspect in zip(args.angle, args.aspect):
+            fetched: int = await tiles.prefetch_region(
+                args.lat_min, args.lat_max, args.lon_min, args.lon_max, angle, aspect
+            )
+            logger.info(
+                f"Fetched {fetched} grid points (angle {angle}, aspect {aspect})"
+            )
+    finally:
+        await outbound.close_session()
+        db_client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(
+        description="Prefetch the solar data of all grid points of a region."
+    )
+    parser.add_argument("lat_min", type=float, help="southern bound in degrees")
+    parser.add_argument("lat_max", type=float, help="northern bound in degrees")
+    parser.add_argument("lon_min", type=float, help="western bound in degrees")
+    parser.add_argument("lon_max", type=float, help="eastern bound in degrees")
+    parser.add_argument(
+        "--angle", type=float, nargs="+", default=[35.0], help="roof inclinations"
+    )
+    parser.add_argument(
+        "--aspect",
+        type=float,
+        nargs="+",
+        default=[0.0],
+        help="roof orientations, one per inclination",
+    )
+    args = parser.parse_args()
+    if len(args.angle) != len(args.aspect):
+        parser.error("--angle and --aspect need the same number of values")
+
+    asyncio.run(main(args))
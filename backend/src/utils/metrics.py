@@ -0,0 +1,521 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import wraps
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Define a type variable for the instrumented functions
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE_LATEST: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default histogram buckets in seconds (same as the Prometheus client libraries)
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the text exposition format."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape backslashes, double quotes and newlines of a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...]) -> str:
+    """Format the labels of a sample for the text exposition format."""
+    if not label_names:
+        return ""
+    pairs: list[str] = [
+        f'{name}="{_escape_label_value(value)}"'
+        for name, value in zip(label_names, label_values)
+    ]
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric(ABC):
+    """Base class of a metric family with optional labels.
+
+    The metrics are kept in memory of the API process and exported by the /metrics
+    endpoint, no external service is required. Each worker process has its own
+    registry, so with multiple workers every worker has to be scraped.
+    """
+
+    metric_type: str = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, label_names: tuple[str, ...] = ()
+    ) -> None:
+        """Initializes a new metric family.
+
+        Args:
+            name (str): Name of the metric
+            documentation (str): Help text of the metric
+            label_names (tuple[str, ...]): Names of the labels of the metric
+
+        """
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: tuple[str, ...] = label_names
+        self._lock: threading.Lock = threading.Lock()
+        self._children: dict[tuple[str, ...], Any] = {}
+
+    def labels(self, **labels: str) -> Any:
+        """Returns the child metric for the given label values.
+
+        Args:
+            **labels (str): Values of all labels of the metric
+
+        Returns:
+            Any: The child metric for the label values
+
+        Raises:
+            ValueError: If the label names don't match the metric's label names
+
+        """
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.label_names}, "
+                f"got {tuple(labels)}"
+            )
+        key: tuple[str, ...] = tuple(str(labels[name]) for name in self.label_names)
+        child: Any = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> Any:
+        """Creates the child metric of a new combination of label values."""
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        """Returns the sample lines of all children in the exposition format."""
+
+    def render(self) -> str:
+        """Renders the metric family in the Prometheus text exposition format."""
+        lines: list[str] = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only be incremented.")
+        self.value += amount
+
+
+class Counter(Metric):
+    """Monotonically increasing counter, e.g. number of requests or failures."""
+
+    metric_type: str = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increments the counter of a metric without labels."""
+        self.labels().inc(amount)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.label_names, key)} "
+            f"{_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self.value: float = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(Metric):
+    """Value that can go up and down, e.g. number of requests in progress."""
+
+    metric_type: str = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increments the gauge of a metric without labels."""
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        """Decrements the gauge of a metric without labels."""
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        """Sets the gauge of a metric without labels."""
+        self.labels().set(value)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} "
+            f"{_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets: tuple[float, ...] = buckets
+        self.counts: list[int] = [0] * len(buckets)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies."""
+
+    metric_type: str = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initializes a new histogram family.
+
+        Args:
+            name (str): Name of the metric
+            documentation (str): Help text of the metric
+            label_names (tuple[str, ...]): Names of the labels of the metric
+            buckets (tuple[float, ...]): Upper bounds of the buckets, +Inf is added
+
+        """
+        super().__init__(name, documentation, label_names)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets)) + (math.inf,)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Observes a value of a metric without labels."""
+        self.labels().observe(value)
+
+    def _samples(self) -> list[str]:
+        lines: list[str] = []
+        for key, child in list(self._children.items()):
+            cumulative: int = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                labels: str = _format_labels(
+                    self.label_names + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of all metrics exported by the API."""
+
+    def __init__(self) -> None:
+        """Initializes an empty registry."""
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        """Registers a metric and returns it.
+
+        Args:
+            metric (Metric): The metric to register
+
+        Returns:
+            Any: The registered metric
+
+        Raises:
+            ValueError: If a metric with the same name is already registered
+
+        """
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered.")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY: MetricsRegistry = MetricsRegistry()
+
+# HTTP requests
+HTTP_REQUESTS: Counter = REGISTRY.register(
+    Counter(
+        "ferntree_http_requests",
+        "Number of HTTP requests by route and status code.",
+        ("method", "route", "status"),
+    )
+)
+HTTP_REQUEST_DURATION: Histogram = REGISTRY.register(
+    Histogram(
+        "ferntree_http_request_duration_seconds",
+        "Latency of HTTP requests by route.",
+        ("method", "route"),
+        buckets=DEFAULT_BUCKETS + (30.0, 60.0),
+    )
+)
+HTTP_REQUESTS_IN_PROGRESS: Gauge = REGISTRY.register(
+    Gauge(
+        "ferntree_http_requests_in_progress",
+        "Number of HTTP requests in progress by route.",
+        ("method", "route"),
+    )
+)
+
+# Database operations
+MONGODB_OPERATION_DURATION: Histogram = REGISTRY.register(
+    Histogram(
+        "ferntree_mongodb_operation_duration_seconds",
+        "Latency of MongoDB operations of the API.",
+        ("operation",),
+    )
+)
+MONGODB_OPERATION_FAILURES: Counter = REGISTRY.register(
+    Counter(
+        "ferntree_mongodb_operation_failures",
+        "Number of failed MongoDB operations of the API.",
+        ("operation",),
+    )
+)
+
+# External APIs: PVGIS, GeoNames, Nominatim
+EXTERNAL_API_DURATION: Histogram = REGISTRY.register(
+    Histogram(
+        "ferntree_external_api_duration_seconds",
+        "Latency of requests to external APIs.",
+        ("service",),
+        buckets=DEFAULT_BUCKETS + (30.0, 60.0),
+    )
+)
+EXTERNAL_API_FAILURES: Counter = REGISTRY.register(
+    Counter(
+        "ferntree_external_api_failures",
+        "Number of failed requests to external APIs.",
+        ("service",),
+    )
+)
+EXTERNAL_API_RETRIES: Counter = REGISTRY.register(
+    Counter(
+        "ferntree_external_api_retries",
+        "Number of retried requests to external APIs by host.",
+        ("host",),
+    )
+)
+EXTERNAL_API_COALESCED: Counter = REGISTRY.register(
+    Counter(
+        "ferntree_external_api_coalesced",
+        "Number of requests to external APIs served by an identical in-flight "
+        "request, by host.",
+        ("host",),
+    )
+)
+
+# Simulations
+SIM_QUEUE_DEPTH: Gauge = REGISTRY.register(
+    Gauge(
+        "ferntree_sim_queue_depth",
+        "Number of simulations that are waiting or running.",
+    )
+)
+SIM_QUEUE_DEPTH.set(0)
+SIM_RUN_DURATION: Histogram = REGISTRY.register(
+    Histogram(
+        "ferntree_sim_run_duration_seconds",
+        "Duration of simulation runs by result.",
+        ("result",),
+        buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0),
+    )
+)
+
+# Caches of evaluated results: hit ratio = hits / (hits + misses)
+CACHE_REQUESTS: Counter = REGISTRY.register(
+    Counter(
+        "ferntree_cache_requests",
+        "Number of cache lookups by cache and result (hit or miss).",
+        ("cache", "result"),
+    )
+)
+
+
+def track_latency(
+    histogram: Histogram, failures: Optional[Counter] = None, **labels: str
+) -> Callable[[F], F]:
+    """A decorator that observes the latency of an async function in a histogram
+    and counts the calls that raise an exception.
+
+    Args:
+        histogram (Histogram): Histogram for the latency in seconds
+        failures (Counter, optional): Counter for the failed calls
+        **labels (str): Label values of the histogram and the counter
+
+    Returns:
+        Callable[[F], F]: A decorator function that wraps the original function.
+
+    Usage:
+        @track_latency(EXTERNAL_API_DURATION, EXTERNAL_API_FAILURES, service="pvgis")
+        async def api_request():
+            # Function implementation
+
+    """
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start_time: float = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if failures is not None:
+                    failures.labels(**labels).inc()
+                raise
+            finally:
+                histogram.labels(**labels).observe(time.perf_counter() - start_time)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def track_mongodb_operation(operation: str) -> Callable[[F], F]:
+    """A decorator that observes the latency and failures of a MongoDB operation.
+
+    Args:
+        operation (str): Name of the operation
+
+    Returns:
+        Callable[[F], F]: A decorator function that wraps the original function.
+
+    """
+    return track_latency(
+        MONGODB_OPERATION_DURATION, MONGODB_OPERATION_FAILURES, operation=operation
+    )
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Counts a lookup of a cache.
+
+    Args:
+        cache (str): Name of the cache
+        hit (bool): Whether the lookup was a hit
+
+    """
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def get_route_path(scope: Scope) -> str:
+    """Returns the path template of the route matching a request, so that
+    requests are grouped by route instead of by URL.
+
+    Args:
+        scope (Scope): ASGI scope of the request
+
+    Returns:
+        str: Path template of the route, or "unmatched" for unknown paths
+
+    """
+    app: Any = scope.get("app")
+    router: Any = getattr(app, "router", None)
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return str(route.path)
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the number, latency and status codes of HTTP
+    requests and the number of requests in progress per route.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """Initializes the middleware.
+
+        Args:
+            app (ASGIApp): The wrapped ASGI application
+
+        """
+        self.app: ASGIApp = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handles a request and records its metrics."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method: str = scope["method"]
+        route: str = get_route_path(scope)
+        status_code: int = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress: Any = HTTP_REQUESTS_IN_PROGRESS.labels(method=method, route=route)
+        in_progress.inc()
+        start_time: float = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(method=method, route=route).observe(
+                time.perf_counter() - start_time
+            )
+            HTTP_REQUESTS.labels(
+                method=method, route=route, status=str(status_code)
+            ).inc()
+            in_progress.dec()
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Optional
+
+from src.database.mongodb import MongoClient
+from src.database.schema import apply_schema
+from src.solar_data import geolocator, outbound
+from src.solar_data.geocache import GeocodingCache
+from src.solar_data.solar_tiles import SolarTileCache
+from src.utils.sim_funcs import sync_profile_store
+
+logger: logging.Logger = logging.getLogger("fastapi_logger")
+
+# Seconds the startup waits for the database
+STARTUP_TIMEOUT: float = 10.0
+
+
+class Resources:
+    """Resources shared by all requests of the API, opened at startup and closed at
+    shutdown in the lifespan of the FastAPI application:
+    - MongoDB client with a pool of open connections.
+    - HTTP session with a pool of keep-alive connections to the external APIs.
+    - Geocoding cache of the addresses of the models and tile cache of solar data.
+    - Warm-up of the offline timezone finder and the local profile store of the
+      simulation.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the resources. The MongoDB client is created right away, as
+        the route decorators need it at import time, but it doesn't connect yet.
+        """
+        self.db_client: MongoClient = MongoClient()
+        self.geocoder: GeocodingCache = GeocodingCache(self.db_client.db)
+        self.solar_tiles: SolarTileCache = SolarTileCache(self.db_client.db)
+        self.warmup: Optional[asyncio.Task[None]] = None
+
+    async def start(self) -> None:
+        """Open the resources at startup of the API. Failures are logged, so the API
+        still starts if the database is unreachable.
+        """
+        outbound.open_session()
+
+        try:
+            await asyncio.wait_for(self.db_client.connect(), STARTUP_TIMEOUT)
+            await apply_schema(self.db_client.db)
+        except Exception as e:
+            logger.error(f"Failed to prepare the database: {e}")
+
+        # Warm up the profile store in the background, the API serves requests
+        # meanwhile
+        self.warmup = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self) -> None:
+        """Warm up the offline timezone finder and the caches of the simulation."""
+        await asyncio.to_thread(geolocator.get_timezone_finder)
+        try:
+            await sync_profile_store()
+            logger.info("Resources: Profile store warmed up.")
+        except Exception as e:
+            logger.error(f"Failed to warm up the profile store: {e}")
+
+    async def close(self) -> None:
+        """Close the resources at shutdown of the API."""
+        if self.warmup is not None and not self.warmup.done():
+            self.warmup.cancel()
+            try:
+                await self.warmup
+            except asyncio.CancelledError:
+                pass
+        self.warmup = None
+
+        await outbound.close_session()
+        self.db_client.close()
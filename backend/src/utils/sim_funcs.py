@@ -1,7 +1,11 @@
+import asyncio
+import hashlib
+import json
 import logging
-import subprocess
+import os
+import time
 from datetime import datetime
-from subprocess import CompletedProcess
+from functools import lru_cache
 from typing import Any, Hashable, Optional, Union
 
 import pandas as pd
@@ -20,69 +24,244 @@ from src.database.models import (
     FinKPIs,
     FinResults,
     FinYearlyData,
+    ModelDataIn,
     ModelDataOut,
     PVMonthlyGen,
     SimDataIn,
+    SimInputs,
     SimResultsEval,
     SystemSettings,
 )
 from src.solar_data import geolocator, pvgis_api
+from src.solar_data.geocache import GeocodingCache, normalize_address
+from src.solar_data.solar_tiles import SolarTileCache
+from src.utils.metrics import SIM_QUEUE_DEPTH, SIM_RUN_DURATION, record_cache_lookup
 
 logger: logging.Logger = logging.getLogger("ferntree")
 
+# Supported time steps of the simulation in seconds: 1h, 15min, 5min, 1min
+SIM_TIMEBASES: tuple[int, ...] = (3600, 900, 300, 60)
 
-async def get_sim_input_data(model_data: ModelDataOut) -> SimDataIn:
+# Sources of the simulation engine, a change invalidates the memoized results
+ENGINE_DIR: str = os.path.join(os.path.dirname(__file__), "../sim/ferntree")
+# Fields of the simulation inputs that don't affect the results
+MEMO_EXCLUDE: set[str] = {"model_id", "run_time", "memo_key"}
+
+# Seconds until an incomplete simulation claimed by another run is considered
+# abandoned (e.g. its API worker crashed) and is taken over
+SIM_STALE_AFTER: float = float(os.environ.get("SIM_STALE_AFTER", 1800))
+# Seconds between checks of a simulation that is run by another API worker
+SIM_POLL_INTERVAL: float = 1.0
+
+# Running simulations by memo key, shared by identical concurrent requests
+_running_sims: dict[str, asyncio.Task[str]] = {}
+
+
+async def get_sim_input_data(
+    model_data: ModelDataOut,
+    timebase: int = 3600,
+    geocoder: Optional[GeocodingCache] = None,
+    tiles: Optional[SolarTileCache] = None,
+    db_client: Optional[mongodb.MongoClient] = None,
+) -> SimDataIn:
     """Fetch and prepare simulation input data based on the provided model data.
 
     This function retrieves solar data for the given location, determines the timezone,
-    and defines the energy system settings based on the model data.
+    and defines the energy system settings based on the model data. The hourly solar
+    data is resampled to the timebase by the simulation. The location data is taken
+    from the inputs prefetched on model submission, if they are ready.
 
     Args:
         model_data (ModelDataOut): The model data containing location and
                                     system specifications.
+        timebase (int, optional): The time step of the simulation in seconds, one of
+                                    SIM_TIMEBASES. Defaults to 3600.
+        geocoder (GeocodingCache, optional): Cache of the coordinates of addresses.
+                                    Without it, only coordinates from the frontend
+                                    are used.
+        tiles (SolarTileCache, optional): Tile cache of solar data. Without it, the
+                                    solar data is fetched from PVGIS.
+        db_client (MongoClient, optional): Client of the prefetched inputs. Without
+                                    it, the location data is always fetched.
 
     Returns:
         SimDataIn: The prepared simulation input data.
 
+    Raises:
+        ValueError: If the timebase is not supported or there's an error fetching
+                    solar data.
+
+    """
+    if timebase not in SIM_TIMEBASES:
+        raise ValueError(f"Timebase {timebase}s not supported, use {SIM_TIMEBASES}.")
+
+    sim_inputs: Optional[SimInputs] = None
+    if db_client is not None:
+        sim_inputs = await db_client.fetch_sim_inputs(
+            sim_inputs_fingerprint(model_data)
+        )
+        record_cache_lookup("sim_inputs", sim_inputs is not None)
+    if sim_inputs is None:
+        sim_inputs = await prepare_sim_inputs(model_data, geocoder, tiles)
+        if db_client is not None:
+            await db_client.insert_sim_inputs(sim_inputs)
+
+    # Define energy system settings based on model data
+    system_settings: SystemSettings = await def_system_settings(model_data)
+
+    sim_input_data: SimDataIn = SimDataIn(
+        model_id=model_data.model_id,
+        run_time=datetime.now().isoformat(),
+        T_amb=sim_inputs.T_amb,
+        G_i=sim_inputs.G_i,
+        coordinates=sim_inputs.coordinates,
+        timezone=sim_inputs.timezone,
+        timebase=timebase,
+        planning_horizon=1,
+        system_settings=system_settings,
+    )
+
+    return sim_input_data
+
+
+def sim_inputs_fingerprint(model_data: ModelDataIn) -> str:
+    """Fingerprint of the model fields the location data of a simulation depends
+    on: the address, the coordinates from the frontend and the roof angles.
+
+    Args:
+        model_data (ModelDataIn): The model data.
+
+    Returns:
+        str: SHA-256 hex digest of the fields.
+
+    """
+    fields: dict[str, Any] = {
+        "location": normalize_address(model_data.location),
+        "coordinates": (
+            model_data.coordinates.model_dump() if model_data.coordinates else None
+        ),
+        "roof_azimuth": model_data.roof_azimuth,
+        "roof_incl": model_data.roof_incl,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+async def prepare_sim_inputs(
+    model_data: ModelDataIn,
+    geocoder: Optional[GeocodingCache] = None,
+    tiles: Optional[SolarTileCache] = None,
+) -> SimInputs:
+    """Fetch the location data of a simulation: coordinates, solar data and timezone.
+
+    Args:
+        model_data (ModelDataIn): The model data containing the location and the
+                                    roof angles.
+        geocoder (GeocodingCache, optional): Cache of the coordinates of addresses.
+        tiles (SolarTileCache, optional): Tile cache of solar data.
+
+    Returns:
+        SimInputs: The prepared location data.
+
     Raises:
         ValueError: If there's an error fetching solar data.
 
     """
+    # Coordinates geocoded by the frontend take precedence (querying Nominatim in
+    # backend is not working on Render), then the geocoding cache
+    location_coordinates: Optional[dict[str, str]] = await get_coordinates(
+        model_data, geocoder
+    )
+
     # Pass parameters to pvgis_api to query solar data for sim input
     try:
         T_amb: list[float]
         G_i: list[float]
         coordinates: dict[str, str]
         T_amb, G_i, coordinates = await pvgis_api.get_solar_data_for_location(
-            model_data.location, model_data.roof_azimuth, model_data.roof_incl
+            model_data.location,
+            model_data.roof_azimuth,
+            model_data.roof_incl,
+            location_coordinates,
+            tiles,
         )
     except Exception as ex:
         raise ValueError(f"Error fetching solar data: {ex}")
 
-    # TODO: overwrite coordinates with data fetched in frontend
-    # (querying Nominatim in backend is not working on Render)
-    if model_data.coordinates:
-        coordinates = model_data.coordinates.model_dump()
-
-    # Determine timezone based on coordinates
-    timezone: str = await geolocator.get_timezone(coordinates)
-
-    # Define energy system settings based on model data
-    system_settings: SystemSettings = await def_system_settings(model_data)
+    # Determine timezone based on coordinates, offline if possible
+    timezone: str = await geolocator.resolve_timezone(coordinates)
 
-    sim_input_data: SimDataIn = SimDataIn(
-        model_id=model_data.model_id,
-        run_time=datetime.now().isoformat(),
+    return SimInputs(
+        fingerprint=sim_inputs_fingerprint(model_data),
         T_amb=T_amb,
         G_i=G_i,
         coordinates=coordinates,
         timezone=timezone,
-        timebase=3600,
-        planning_horizon=1,
-        system_settings=system_settings,
+        created_at=datetime.now(),
     )
 
-    return sim_input_data
+
+async def prefetch_sim_inputs(
+    db_client: mongodb.MongoClient,
+    model_data: ModelDataIn,
+    geocoder: Optional[GeocodingCache] = None,
+    tiles: Optional[SolarTileCache] = None,
+) -> None:
+    """Prefetch the location data of a simulation in the background after a model
+    is submitted, so the first simulation run doesn't wait for the external APIs.
+    Nothing is fetched if the data for the same location and roof is ready. Errors
+    are logged, the simulation run fetches the data again.
+
+    Args:
+        db_client (MongoClient): Client of the prefetched inputs.
+        model_data (ModelDataIn): The submitted model data.
+        geocoder (GeocodingCache, optional): Cache of the coordinates of addresses.
+        tiles (SolarTileCache, optional): Tile cache of solar data.
+
+    """
+    try:
+        fingerprint: str = sim_inputs_fingerprint(model_data)
+        if await db_client.fetch_sim_inputs(fingerprint) is not None:
+            logger.info(f"Prefetch: Simulation inputs {fingerprint[:12]} are ready.")
+            return
+        sim_inputs: SimInputs = await prepare_sim_inputs(model_data, geocoder, tiles)
+        await db_client.insert_sim_inputs(sim_inputs)
+        logger.info(f"Prefetch: Simulation inputs {fingerprint[:12]} prepared.")
+    except Exception as ex:
+        logger.warning(f"Prefetch: Failed to prepare simulation inputs: {ex}")
+
+
+async def get_coordinates(
+    model_data: ModelDataIn, geocoder: Optional[GeocodingCache] = None
+) -> Optional[dict[str, str]]:
+    """Get the coordinates of the location of a model. Coordinates geocoded by the
+    frontend are stored in the geocoding cache, otherwise the address is geocoded
+    via the cache.
+
+    Args:
+        model_data (ModelDataIn): The model data containing the location.
+        geocoder (GeocodingCache, optional): Cache of the coordinates of addresses.
+
+    Returns:
+        Optional[dict[str, str]]: Coordinates (lat, lon and display name), None if
+                                    the location can't be geocoded.
+
+    """
+    if model_data.coordinates:
+        coordinates: dict[str, str] = model_data.coordinates.model_dump()
+        if geocoder is not None:
+            try:
+                await geocoder.put(model_data.location, coordinates, source="frontend")
+            except Exception as ex:
+                logger.warning(f"Failed to cache coordinates of location: {ex}")
+        return coordinates
+
+    if geocoder is None:
+        return None
+    try:
+        return await geocoder.geocode(model_data.location)
+    except Exception as ex:
+        logger.warning(f"Failed to geocode location {model_data.location}: {ex}")
+        return None
 
 
 async def def_system_settings(model_data: ModelDataOut) -> SystemSettings:
@@ -132,6 +311,149 @@ async def def_system_settings(model_data: ModelDataOut) -> SystemSettings:
     return system_settings
 
 
+@lru_cache(maxsize=1)
+def engine_version() -> str:
+    """Version of the simulation engine: hash of the sources and the configuration
+    of Ferntree, so memoized results are not reused after the engine changed.
+
+    Returns:
+        str: SHA-256 hex digest of the engine files.
+
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(ENGINE_DIR):
+        dirs[:] = sorted(d for d in dirs if d not in {"__pycache__", "data"})
+        for file in sorted(files):
+            if file.endswith((".py", ".json")):
+                path: str = os.path.join(root, file)
+                digest.update(os.path.relpath(path, ENGINE_DIR).encode())
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def sim_memo_key(sim_input_data: SimDataIn, profile_version: Optional[str]) -> str:
+    """Memo key of a simulation: hash of the canonicalized inputs, without the
+    fields that don't affect the results, of the engine version and of the version
+    of the load profile. The load profile is read by its ID at run time, so the
+    results aren't reused after a new version of the profile was published.
+    Simulations with the same memo key have the same results.
+
+    Args:
+        sim_input_data (SimDataIn): The simulation input data.
+        profile_version (Optional[str]): Version of the baseload profile.
+
+    Returns:
+        str: SHA-256 hex digest of the inputs, the engine and the profile version.
+
+    """
+    fields: dict[str, Any] = {
+        "engine": engine_version(),
+        "profile": profile_version,
+        "inputs": sim_input_data.model_dump(exclude=MEMO_EXCLUDE),
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+async def run_memoized_simulation(
+    db_client: mongodb.MongoClient, model_id: str, sim_input_data: SimDataIn
+) -> str:
+    """Get the simulation with the given inputs. The results of a completed
+    simulation with the same memo key are reused, otherwise the simulation is run.
+    Concurrent requests with the same inputs share one simulation run: within the
+    process via a shared task, across API workers via the claim of the memo key.
+
+    Args:
+        db_client (mongodb.MongoClient): The MongoDB client.
+        model_id (str): The ID of the model requesting the simulation.
+        sim_input_data (SimDataIn): The simulation input data.
+
+    Returns:
+        str: The ID of the completed simulation.
+
+    Raises:
+        RuntimeError: If the simulation fails.
+
+    """
+    profile_version: Optional[str] = await db_client.fetch_profile_version(
+        sim_input_data.system_settings.baseload.profile_id
+    )
+    memo_key: str = sim_memo_key(sim_input_data, profile_version)
+    sim_input_data.memo_key = memo_key
+
+    task: Optional[asyncio.Task[str]] = _running_sims.get(memo_key)
+    if task is None:
+        task = asyncio.create_task(
+            claim_or_await_simulation(db_client, model_id, sim_input_data)
+        )
+        _running_sims[memo_key] = task
+        task.add_done_callback(lambda _: _running_sims.pop(memo_key, None))
+    else:
+        record_cache_lookup("sim_memo", True)
+
+    # Cancelling one request doesn't cancel the simulation of the others
+    return await asyncio.shield(task)
+
+
+async def claim_or_await_simulation(
+    db_client: mongodb.MongoClient, model_id: str, sim_input_data: SimDataIn
+) -> str:
+    """Reuse the completed simulation with the memo key of the inputs, or claim and
+    run it. If another run holds the claim, wait until it completes; take it over
+    if it fails or is older than SIM_STALE_AFTER.
+
+    Args:
+        db_client (mongodb.MongoClient): The MongoDB client.
+        model_id (str): The ID of the model requesting the simulation.
+        sim_input_data (SimDataIn): The simulation input data with memo key.
+
+    Returns:
+        str: The ID of the completed simulation.
+
+    Raises:
+        RuntimeError: If the simulation fails.
+
+    """
+    memo_key: str = str(sim_input_data.memo_key)
+    while True:
+        state: Optional[dict[str, Any]] = await db_client.fetch_simulation_state(
+            memo_key
+        )
+
+        if state is None:
+            sim_id: Optional[str] = await db_client.claim_simulation(sim_input_data)
+            if sim_id is None:
+                # Claimed by another run in the meantime
+                continue
+            record_cache_lookup("sim_memo", False)
+            try:
+                await run_ferntree_simulation(model_id, sim_id)
+            except BaseException:
+                # Let the next request run the simulation again
+                await asyncio.shield(db_client.release_simulation(sim_id))
+                raise
+            await db_client.complete_simulation(sim_id)
+            return sim_id
+
+        sim_id = str(state["_id"])
+        if "completed_at" in state:
+            record_cache_lookup("sim_memo", True)
+            logger.info(f"Reusing results of sim {sim_id} for model {model_id}.")
+            return sim_id
+
+        # Simulations without claim time were started before claims were recorded
+        claimed_at: datetime = datetime.fromisoformat(
+            state.get("claimed_at", datetime.min.isoformat())
+        )
+        if (datetime.now() - claimed_at).total_seconds() > SIM_STALE_AFTER:
+            # Only one of the waiting runs releases it, all of them claim again
+            if await db_client.release_simulation(sim_id):
+                logger.warning(f"Taking over stale simulation {sim_id}.")
+            continue
+
+        await asyncio.sleep(SIM_POLL_INTERVAL)
+
+
 async def run_ferntree_simulation(
     model_id: str,
     sim_id: str,
@@ -139,7 +461,8 @@ async def run_ferntree_simulation(
     """Start the Ferntree simulation with the given simulation ID and model ID.
 
     This function runs the Ferntree simulation as a subprocess and checks if it
-    completed successfully.
+    completed successfully. The subprocess is awaited, so the event loop keeps
+    serving other requests (and the metrics) while the simulation runs.
 
     Args:
         model_id (str): The model ID.
@@ -162,17 +485,51 @@ async def run_ferntree_simulation(
     ]
 
     logger.info(f"Running Ferntree simulation with command: {command}")
-    completed_process: CompletedProcess[Any] = subprocess.run(command)
+    SIM_QUEUE_DEPTH.inc()
+    start_time: float = time.perf_counter()
+    try:
+        process: asyncio.subprocess.Process = await asyncio.create_subprocess_exec(
+            *command
+        )
+        try:
+            returncode: int = await process.wait()
+        except asyncio.CancelledError:
+            # Shutdown of the API, don't leave the simulation running
+            process.terminate()
+            raise
+    finally:
+        SIM_QUEUE_DEPTH.dec()
+    SIM_RUN_DURATION.labels(result="success" if returncode == 0 else "failure").observe(
+        time.perf_counter() - start_time
+    )
 
     # Check if the simulation has finished successfully
-    if completed_process.returncode != 0:
-        raise RuntimeError(
-            f"Ferntree Simulation failed. Return code: {completed_process.returncode}"
-        )
+    if returncode != 0:
+        raise RuntimeError(f"Ferntree Simulation failed. Return code: {returncode}")
 
     return True
 
 
+async def sync_profile_store() -> None:
+    """Sync the local profile store of the simulation with the database, so the
+    first simulation after startup doesn't fetch its load profile from the database.
+
+    Raises:
+        RuntimeError: If the sync fails.
+
+    """
+    command: list[str] = ["python", "src/sim/ferntree/ferntree.py", "--sync-profiles"]
+    process: asyncio.subprocess.Process = await asyncio.create_subprocess_exec(*command)
+    try:
+        returncode: int = await process.wait()
+    except asyncio.CancelledError:
+        # Shutdown of the API, the store stays consistent as it is written atomically
+        process.terminate()
+        raise
+    if returncode != 0:
+        raise RuntimeError(f"Profile store sync failed. Return code: {returncode}")
+
+
 async def eval_sim_results(
     db_client: mongodb.MongoClient, model_id: str
 ) -> SimResultsEval:
@@ -192,9 +549,13 @@ async def eval_sim_results(
         RuntimeError: If fetching simulation results fails.
 
     """
-    # Fetch sim results timeseries data
-    doc: Optional[dict[str, Any]] = await db_client.fetch_document(
-        "sim_results_ts", model_id
+    # Fetch sim results timeseries data of the simulation of the model, which may be
+    # shared with other models
+    model_data: ModelDataOut = await db_client.fetch_model_by_id(model_id)
+    doc: Optional[dict[str, Any]] = (
+        await db_client.fetch_sim_timeseries(model_data.sim_id)
+        if model_data.sim_id
+        else None
     )
     if doc is None:
         raise RuntimeError(
@@ -214,6 +575,21 @@ async def eval_sim_results(
     return sim_results_eval
 
 
+def timestep_hours(time: pd.DatetimeIndex) -> float:
+    """Infer the duration of a simulation timestep from the time index.
+
+    Args:
+        time (pd.DatetimeIndex): The time index of the simulation results.
+
+    Returns:
+        float: The duration of a timestep in hours, 1 if it can't be inferred.
+
+    """
+    if len(time) < 2:
+        return 1.0
+    return float((time[1:] - time[:-1]).median().total_seconds() / 3600)
+
+
 async def calc_energy_kpis(sim_results: list[dict[str, float]]) -> EnergyKPIs:
     """Calculate energy Key Performance Indicators (KPIs) from simulation results.
 
@@ -242,20 +618,23 @@ async def calc_energy_kpis(sim_results: list[dict[str, float]]) -> EnergyKPIs:
     # Calculate total power profile of house with net load and battery power
     sim_results_df["P_total"] = sim_results_df["P_net_load"] + sim_results_df["P_bat"]
 
+    # Duration of a timestep to convert power [kW] to energy [kWh]
+    dt_h: float = timestep_hours(sim_results_df.index)
+
     # Calculate energy KPIs of system simulation
     # Annual electricity consumption from baseload demand
-    annual_baseload_demand: float = sim_results_df["P_base"].sum()  # [kWh]
+    annual_baseload_demand: float = sim_results_df["P_base"].sum() * dt_h  # [kWh]
     # Annaul PV generation
     annual_pv_generation: float = (
-        abs(sim_results_df["P_pv"].sum()) + sim_results_df["Soc_bat"].iloc[-1]
+        abs(sim_results_df["P_pv"].sum()) * dt_h + sim_results_df["Soc_bat"].iloc[-1]
     )  # [kWh]
     # Annaul electricity consumed fron grid
-    annual_grid_consumption: float = sim_results_df["P_total"][
-        sim_results_df["P_total"] > 0.0
-    ].sum()  # [kWh]
+    annual_grid_consumption: float = (
+        sim_results_df["P_total"][sim_results_df["P_total"] > 0.0].sum() * dt_h
+    )  # [kWh]
     # Annual electricity fed into grid
     annual_grid_feed_in: float = abs(
-        sim_results_df["P_total"][sim_results_df["P_total"] < 0.0].sum()
+        sim_results_df["P_total"][sim_results_df["P_total"] < 0.0].sum() * dt_h
     )  # [kWh]
     # Annual amount of energy consumption covered by PV generation
     annual_self_consumption: float = annual_baseload_demand - annual_grid_consumption
@@ -306,9 +685,10 @@ async def calc_pv_monthly_gen(sim_results: list[dict[str, Any]]) -> list[PVMonth
     if not isinstance(df.index, pd.DatetimeIndex):
         raise ValueError("Index is not a datetime index")
 
-    # Group by month and sum P_pv values
+    # Group by month and sum P_pv values, converted to energy [kWh]
     df["month"] = df.index.month
-    monthly_pv_df: Series[float] = df.groupby("month")["P_pv"].sum()
+    dt_h: float = timestep_hours(df.index)
+    monthly_pv_df: Series[float] = df.groupby("month")["P_pv"].sum() * dt_h
 
     month_mapping: dict[Hashable, str] = {
         1: "Jan",